@@ -54,7 +54,9 @@ if os.path.exists(src_dbfile):
 
 
 datamodel = DataModel()
-datamodel.ConnectDatabase(config.get_DBfilepath(False), config.get_DBfilepath(True))
+#scratch copy on the node (source database is kept intact until copy back): WAL journal, no need to sync each transaction
+datamodel.ConnectDatabase(config.get_DBfilepath(False), config.get_DBfilepath(True), wal=True)
+datamodel.dbhelper.tune(synchronous='OFF')
 datamodel.RestoreHDLModels(config.parconf)
 datamodel.RestoreEntity(DataDescriptors.InjTarget)
 datamodel.SaveHdlModels()
@@ -70,6 +72,8 @@ else:
         process_dumps(config, toolconf,conf, datamodel)               
 
 
+#back to the rollback journal (WAL merged into the file) before the copy to the report directory
+datamodel.dbhelper.tune(journal_mode='DELETE')
 datamodel.SyncAndDisconnectDB()
 #copy back
 if os.path.exists(dst_dbfile):
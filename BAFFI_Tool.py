@@ -29,7 +29,7 @@ def run_zynq_injector(davosconf, modelconf):
                             davosconf.FFI.injector_app,
                             davosconf.FFI.serial_port)
 
-    hashing = False
+    hashing = davosconf.FFI.design_cache
     if davosconf.FFI.injector_phase:
         if davosconf.FFI.pblock is not None:
             pb = Pblock('TILE' in davosconf.FFI.pblock['notation'].upper(),
@@ -66,7 +66,7 @@ def run_microblaze_injector(davosconf, modelconf):
     Injector = FFIHostMicroblaze(modelconf.work_dir, davosconf.FFI.device_part, davosconf.FFI.dut_script)
     Injector.FmodesToReset += davosconf.FFI.failure_modes_to_reset
 
-    hashing = False
+    hashing = davosconf.FFI.design_cache
     
     if davosconf.FFI.injector_phase:
         if davosconf.FFI.pblock is not None:
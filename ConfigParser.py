@@ -51,6 +51,7 @@ class ToolOptions:
             self.rtl_parse_script = "modelsim_rtl_nodes.do"
             self.finish_flag = "Sampling/FinishFlag"
             self.exp_desc_file = "_summary.csv"
+            self.simulator = "vsim"
         else:
             self.build_from_xml(xnode)            
      
@@ -70,6 +71,7 @@ class ToolOptions:
         self.rtl_parse_script = xnode.get('rtl_parse_script', "dadse_rtl_nodes.do")
         self.finish_flag = xnode.get('finish_flag', "Sampling/FinishFlag")
         self.exp_desc_file = xnode.get('exp_desc_file', "_summary.csv")
+        self.simulator = xnode.get('simulator', "vsim")
         return(0)
 
 
@@ -332,6 +334,11 @@ class SBFIConfigAnalyzer:
             self.time_window = None
             self.max_time_violation = int(0)
             self.threads = int(1)
+            self.parallel_mode = "THREADS"
+            self.streaming = False
+            self.raw_dumps = "KEEP"
+            self.early_exit = False
+            self.result_pack = "ZIP"
             self.domain_mode = ""
             self.check_range_columns = []
         else:
@@ -348,6 +355,11 @@ class SBFIConfigAnalyzer:
         self.time_window = None if match_desc is None else (int(match_desc.group(1)), int(match_desc.group(2)))
         self.max_time_violation = int(xnode.get('max_time_violation','0'))
         self.threads = int(xnode.get('threads','1'))
+        self.parallel_mode = xnode.get('parallel_mode', 'THREADS').upper()
+        self.streaming = True if xnode.get('streaming', '') == 'on' else False
+        self.raw_dumps = xnode.get('raw_dumps', 'KEEP').upper()
+        self.early_exit = True if xnode.get('early_exit', '') == 'on' else False
+        self.result_pack = xnode.get('result_pack', 'ZIP').upper()
         tag = xnode.findall('join_groups')
         if len(tag) > 0: self.join_group_list.init_from_tag(tag[0])
         tag = xnode.findall('rename_list')
@@ -405,6 +417,15 @@ class SBFIConfiguration:
         self.analyzer = None
         self.workload_split_factor = 10
         self.faultload_mode = 0
+        self.simulator_pool = False
+        self.sim_timeout = 0
+        self.early_stop = False
+        self.sequential_sampling = False
+        self.batch_size = 100
+        self.confidence_level = 0.95
+        self.error_margin = 0.05
+        self.script_bundle = False
+        self.pipeline = False
         if xnode != None:
             self.build_from_xml(xnode)
 
@@ -417,6 +438,15 @@ class SBFIConfiguration:
         self.analyzer_phase = True if xnode.get('analyzer', '') == 'on' else False                                                                        
         self.reportbuilder_phase = True if xnode.get('reportbuilder', '') == 'on' else False
         self.time_quota = xnode.get('time_quota', '20:00:00')
+        self.simulator_pool = True if xnode.get('simulator_pool', '') == 'on' else False
+        self.sim_timeout = int(xnode.get('sim_timeout', '0'))
+        self.early_stop = True if xnode.get('early_stop', '') == 'on' else False
+        self.sequential_sampling = True if xnode.get('sequential_sampling', '') == 'on' else False
+        self.batch_size = int(xnode.get('batch_size', '100'))
+        self.confidence_level = float(xnode.get('confidence_level', '0.95'))
+        self.error_margin = float(xnode.get('error_margin', '0.05'))
+        self.script_bundle = True if xnode.get('script_bundle', '') == 'on' else False
+        self.pipeline = True if xnode.get('pipeline', '') == 'on' else False
         self.fault_dictionary = xnode.get('fault_dictionary')
         for i in xnode.findall('InjectionScope'):
             self.injection_scopes.append(InjectionScope(i))
@@ -803,6 +833,9 @@ class FFIConfiguration:
         self.fsbl_file = ""
         self.injector_app = ""
         self.serial_port = ""
+        self.design_cache = False
+        self.sample_without_replacement = False
+        self.stratify = ""
         if xnode != None:
             self.build_from_xml(xnode)
 
@@ -841,6 +874,9 @@ class FFIConfiguration:
         self.fsbl_file = xnode.get('fsbl_file', '')
         self.injector_app = xnode.get('injector_app', '')
         self.serial_port = xnode.get('serial_port', '')
+        self.design_cache = True if xnode.get('design_cache', '') == 'on' else False
+        self.sample_without_replacement = True if xnode.get('sample_without_replacement', '') == 'on' else False
+        self.stratify = xnode.get('stratify', '').lower()
         cp = xnode.get('post_injection_recovery_nodes', '')
         if cp != '': self.post_injection_recovery_nodes = ast.literal_eval(cp)
         self.hdf_path = xnode.get('hdf_path', '')
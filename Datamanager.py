@@ -53,7 +53,8 @@ class DataModel:
         self.HdlModel_lst = []
         #self.HdlModel_dict = dict() #key = label
         self.Target_lst = []
-        self.Target_dict = dict() #key = {NodeFullPath,Macrocell,InjectionCase}
+        self.Target_dict = dict() #key = (NodeFullPath, Macrocell, InjectionCase)
+        self.TargetIdCnt = 0      #next ID to be allocated for a new target
         self.Profiling_lst = []
         self.LaunchedInjExp_dict = dict()
         self.dbhelper = None
@@ -62,8 +63,9 @@ class DataModel:
 
 
 
-    def ConnectDatabase(self, dbfile, backupfile):
-        self.dbhelper = SqlHelper(dbfile, backupfile)
+    def ConnectDatabase(self, dbfile, backupfile, wal=False):
+        self.dbhelper = SqlHelper(dbfile, backupfile, wal)
+        self.SeedTargetCounter()
 
     def GetHdlModel(self, label):
         for m in self.HdlModel_lst:
@@ -115,8 +117,8 @@ class DataModel:
         elif EntityName == DataDescriptors.InjTarget:
             self.Target_lst = self.dbhelper.Targets_load()
             for i in self.Target_lst:
-                key = i.NodeFullPath + ',' + i.Macrocell + ',' + i.InjectionCase
-                self.Target_dict[key] = i
+                self.Target_dict[(i.NodeFullPath, i.Macrocell, i.InjectionCase)] = i
+            self.SeedTargetCounter()
         elif EntityName == DataDescriptors.Profiling:
             pass
         elif EntityName == DataDescriptors.InjectionExp:
@@ -124,19 +126,29 @@ class DataModel:
             self.LaunchedInjExp_dict = dict((desc.ID, desc) for desc in injdesc)
 
 
+    def SeedTargetCounter(self):
+        """Sets the target ID counter next to the maximal key among stored (database) and registered (Target_lst) targets"""
+        with self.lock:
+            keys = [c[0] for c in self.dbhelper.execute_for_result('SELECT MAX(ID) FROM Targets', None) if c[0] != None]
+            if len(self.Target_lst) > 0:
+                keys.append(max(t.ID for t in self.Target_lst))
+            self.TargetIdCnt = int(max(keys)) + 1 if len(keys) > 0 else 0
+
     def GetOrAppendTarget(self, NodeFullPath, Macrocell, InjectionCase):
+        key = (NodeFullPath, Macrocell, InjectionCase)
+        #lookup of registered targets does not lock: a single dict read is atomic, and entries are never removed
+        res = self.Target_dict.get(key)
+        if res != None:
+            return(res)
         with self.lock:
-            res = None
-            key = NodeFullPath + ',' + Macrocell + ',' + InjectionCase
-            if key in self.Target_dict:
-                res = self.Target_dict[key]
-            else:
+            res = self.Target_dict.get(key)
+            if res == None:
                 res = InjectionTargetDescriptor()
                 res.NodeFullPath = NodeFullPath
                 res.Macrocell = Macrocell
                 res.InjectionCase = InjectionCase
-                if len(self.Target_lst) > 0: res.ID = max(node.ID for node in self.Target_lst) + 1
-                else: res.ID = 0
+                res.ID = self.TargetIdCnt
+                self.TargetIdCnt += 1
                 self.Target_lst.append(res)
                 self.Target_dict[key] = res
         return(res)
@@ -157,7 +169,7 @@ class DataModel:
         self.dbhelper.InjectionDesc_save(injDesc_lst)
 
     def SyncAndDisconnectDB(self):
-        self.dbhelper.connection.commit()
+        self.dbhelper.checkpoint()
         self.dbhelper.connection.close()
 
 
@@ -432,13 +444,28 @@ CreateDBquery = {
 
     }
 
+#Indexes created (if missing) on every connection to the database
+#Injections_Stat covers the grouped aggregation of Reportbuilder.compute_stat (FaultToFailureLatency is appended to avoid table lookups)
+CreateIndexQuery = {
+    "Injections_Stat" : "CREATE INDEX IF NOT EXISTS Injections_Stat ON Injections (ModelID, TargetID, FaultModel, FailureMode, Status, FaultToFailureLatency);"
+    }
+
 
 class SqlHelper:
-    def __init__(self, dbfile, dbbackup):
+    # rows per executemany call within a bulk transaction
+    BulkChunkSize = 50000
+
+    def __init__(self, dbfile, dbbackup, wal=False):
         self.dbfile = dbfile
         self.dbbackup = dbbackup
         self.connection = None
         self.cursor = None
+        self.columns = dict()   #cached schema: table name -> list of column names
+        #rollback journal by default: the database file is copied as is (backups, grid nodes) and may reside on NFS,
+        #WAL (wal=True) only for local scratch databases, checkpoint() before copying the file
+        self.pragmas = {'journal_mode': 'DELETE', 'cache_size': -65536, 'temp_store': 'MEMORY'}
+        if wal:
+            self.pragmas.update({'journal_mode': 'WAL', 'synchronous': 'NORMAL'})
         self.createdb()
         self.last_backup_time = datetime.datetime.now().replace(microsecond=0)
 
@@ -462,32 +489,97 @@ class SqlHelper:
         self.robust_db_exec(query, datatuple, False)
         return self.cursor.fetchall()
 
+    def connect(self):
+        #used by one thread at a time, not necessarily the one that connected (non-isolated pipeline tasks)
+        self.connection = sqlite3.connect(self.dbfile, check_same_thread=False)
+        self.cursor = self.connection.cursor()
+        for k, v in self.pragmas.items():
+            self.robust_db_exec('PRAGMA {0} = {1}'.format(k, str(v)), None)
+
+    def tune(self, **pragmas):
+        """Overrides the SQLite pragmas of the connection, e.g. tune(synchronous='OFF') for scratch copies of the database
+        cache_size is given in pages (positive) or KiB (negative), as in SQLite"""
+        self.connection.commit()
+        self.pragmas.update(pragmas)
+        for k, v in pragmas.items():
+            self.robust_db_exec('PRAGMA {0} = {1}'.format(k, str(v)), None)
+
+    def checkpoint(self):
+        """Commits and moves the WAL journal (if any) into dbfile, so that the file can be copied"""
+        self.connection.commit()
+        if str(self.pragmas.get('journal_mode', '')).upper() == 'WAL':
+            self.robust_db_exec('PRAGMA wal_checkpoint(TRUNCATE)', None)
+
     def createdb(self):
-        self.connection = sqlite3.connect(self.dbfile)
+        self.connect()
         os.chmod(self.dbfile, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
-        self.cursor = self.connection.cursor()
         for tablename, sqlcode in CreateDBquery.items():
             query = 'SELECT name FROM sqlite_master WHERE type=\'table\' AND name=\'{0}\';'.format(tablename)
             self.robust_db_exec(query, None)
             if len(self.cursor.fetchall()) == 0:
                 self.robust_db_exec(sqlcode, None, True)
+        for indexname, sqlcode in CreateIndexQuery.items():
+            self.robust_db_exec(sqlcode, None, True)
 
 
     def BackupDB(self, Immediate = True):
         timestamp = datetime.datetime.now().replace(microsecond=0)
         if Immediate or (time_to_seconds(timestamp - self.last_backup_time) > 3600):
             print('....Doing database backup....')
-            self.connection.commit()
-            self.connection.close()
+            self.checkpoint()
             shutil.copy(self.dbfile, self.dbbackup)
-            self.connection = sqlite3.connect(self.dbfile)
-            self.cursor = self.connection.cursor()
             self.last_backup_time = timestamp
 
 
     def close(self):
         self.connection.close()
 
+    def bulk_insert(self, table, columns, rows, replace=False, report=True):
+        """Inserts a sequence of row tuples in a single transaction (executemany by chunks of BulkChunkSize)
+        The transaction is rolled back and repeated if the database is locked/busy (OperationalError),
+        on constraint violations (IntegrityError) the rows are inserted one by one, skipping the failed ones
+        Returns the number of inserted rows"""
+        query = '{0} INTO {1} ({2}) VALUES ({3})'.format('INSERT OR REPLACE' if replace else 'INSERT', table,
+                                                         ', '.join(columns), ','.join(['?'] * len(columns)))
+        if not isinstance(rows, list):
+            rows = list(rows)
+        timestart = time.time()
+        self.connection.commit()
+        inserted = len(rows)
+        for attempt in range(0, 5):
+            try:
+                for i in range(0, len(rows), self.BulkChunkSize):
+                    self.cursor.executemany(query, rows[i:i + self.BulkChunkSize])
+                self.connection.commit()
+            except sqlite3.IntegrityError as e:
+                self.connection.rollback()
+                print 'DB bulk insert error: ' + str(e) + ', inserting row by row\nQuery: ' + query
+                inserted = self.insert_rows(query, rows)
+            except sqlite3.OperationalError as e:
+                self.connection.rollback()
+                print 'DB bulk insert error: ' + str(e) + '\nQuery: ' + query
+                if attempt == 4:
+                    raise
+                time.sleep(0.5)
+                continue
+            break
+        if report and inserted > 0:
+            dt = time.time() - timestart
+            print('Saved {0} rows into {1}: {2:.3f} s, {3:.0f} rows/s'.format(inserted, table, dt, inserted / max(dt, 1e-6)))
+        return(inserted)
+
+    def insert_rows(self, query, rows):
+        """Row by row insert in a single transaction: rows violating a constraint are reported and skipped"""
+        inserted = 0
+        for row in rows:
+            try:
+                self.cursor.execute(query, row)
+                inserted += 1
+            except sqlite3.IntegrityError as e:
+                print 'DB execute error: ' + str(e) + '\nQuery: ' + query + '\nRow: ' + str(row)
+        self.connection.commit()
+        return(inserted)
+
     def HdlModels_load(self):
         model_lst = []
         self.robust_db_exec('SELECT * FROM Models', None)
@@ -518,22 +610,29 @@ class SqlHelper:
 
 
     def get_columnsintable(self, Tablename):
-        columndesc = self.execute_for_result('PRAGMA table_info({0})'.format(Tablename), None)
-        res = []
-        for c in columndesc:
-            res.append(str(c[1]))
-        return(res)
+        if Tablename not in self.columns:
+            columndesc = self.execute_for_result('PRAGMA table_info({0})'.format(Tablename), None)
+            self.columns[Tablename] = [str(c[1]) for c in columndesc]
+        return(list(self.columns[Tablename]))
 
-    def HdlModels_save(self, HdlModel_lst):        
+    def HdlModels_save(self, HdlModel_lst):
+        coldesc = self.get_columnsintable('Models')
         for m in HdlModel_lst:
-            coldesc = self.get_columnsintable('Models')
             for k,v in m.Metrics.iteritems():
                 if not k in coldesc:
                     T = 'REAL' if type(v) is float else 'VARCHAR(10000)'
                     self.robust_db_exec('ALTER TABLE Models ADD COLUMN {0} {1}'.format(k, T), None, True)
-            query = "\nINSERT OR REPLACE INTO Models (ID, Label, ReportPath, FactorConfig {0}) VALUES ({1}, \"{2}\", \"{3}\", \"{4}\" {5})".format(''.join([','+str(k) for k in m.Metrics.keys()]), m.ID, m.Label, m.ReportPath, ';'.join([c.serialize(SerializationFormats.PYTHON_DICT) for c in  m.Factors]), ''.join([',{0:.4f}'.format(x) if type(x) is float else ',\"{0}\"'.format(str(x)) for x in m.Metrics.values()]) )
-            self.robust_db_exec(query, None)
-        self.connection.commit()
+                    coldesc.append(k)
+                    self.columns.pop('Models', None)
+        #models sharing the same set of metrics are saved by a single statement
+        groups = dict()
+        for m in HdlModel_lst:
+            keys = tuple(m.Metrics.keys())
+            row = (m.ID, m.Label, m.ReportPath, ';'.join([c.serialize(SerializationFormats.PYTHON_DICT) for c in m.Factors])) + \
+                  tuple(round(x, 4) if type(x) is float else str(x) for x in m.Metrics.values())
+            groups.setdefault(keys, []).append(row)
+        for keys, rows in groups.items():
+            self.bulk_insert('Models', ['ID', 'Label', 'ReportPath', 'FactorConfig'] + [str(k) for k in keys], rows, replace=True, report=False)
 
 
     def Targets_load(self):
@@ -550,11 +649,9 @@ class SqlHelper:
         return(target_lst)
 
 
-    def Targets_save(self, Target_lst):
-        for t in Target_lst:
-            query = "\nINSERT OR REPLACE INTO Targets (ID, NodeFullPath, Macrocell, InjectionCase) VALUES(?,?,?,?)"
-            self.robust_db_exec(query, (t.ID, t.NodeFullPath, t.Macrocell, t.InjectionCase))
-        self.connection.commit()
+    def Targets_save(self, Target_lst, report=True):
+        self.bulk_insert('Targets', ['ID', 'NodeFullPath', 'Macrocell', 'InjectionCase'],
+                         [(t.ID, t.NodeFullPath, t.Macrocell, t.InjectionCase) for t in Target_lst], replace=True, report=report)
 
 
     def InjectionDesc_load(self):
@@ -580,11 +677,11 @@ class SqlHelper:
             InjDesc_lst.append(a)
         return(InjDesc_lst)
 
-    def InjectionDesc_save(self, InjDesc_lst):
-        for i in InjDesc_lst:
-            query = "\nINSERT INTO Injections (ID, ModelID, TargetID, FaultModel, ForcedValue, InjectionTime, InjectionDuration, ObservationTime, Status, FailureMode, ErrorCount, TrapCode, FaultToFailureLatency, Dumpfile) VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-            self.robust_db_exec(query, (i.ID, i.ModelID, i.TargetID, i.FaultModel, i.ForcedValue, i.InjectionTime, i.InjectionDuration, i.ObservationTime, i.Status, i.FailureMode, i.ErrorCount, i.TrapCode, i.FaultToFailureLatency, i.Dumpfile))
-        self.connection.commit()
+    def InjectionDesc_save(self, InjDesc_lst, report=True):
+        self.bulk_insert('Injections', ['ID', 'ModelID', 'TargetID', 'FaultModel', 'ForcedValue', 'InjectionTime', 'InjectionDuration', 'ObservationTime',
+                                        'Status', 'FailureMode', 'ErrorCount', 'TrapCode', 'FaultToFailureLatency', 'Dumpfile'],
+                         [(i.ID, i.ModelID, i.TargetID, i.FaultModel, i.ForcedValue, i.InjectionTime, i.InjectionDuration, i.ObservationTime,
+                           i.Status, i.FailureMode, i.ErrorCount, i.TrapCode, i.FaultToFailureLatency, i.Dumpfile) for i in InjDesc_lst], report=report)
 
 
 
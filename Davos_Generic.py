@@ -28,6 +28,8 @@ import traceback
 import commands
 from sys import platform
 import zipfile as ZF
+import multiprocessing
+import threading
 
 
 # -----------------------------------------------------
@@ -270,6 +272,301 @@ class Dirstate:
         return (ds)
 
 
+class CompletionManifest:
+    """Script->dump mapping of the faultload (written once by the faultload generator) and completion records:
+       each simulation job appends the names of its finished dumps to its own file (log_dir/completed_<job>.txt),
+       the injector reads these files incrementally instead of re-reading scripts and listing the result dir.
+       Scripts of a bundled faultload (SBFI attribute script_bundle = "on") are stored in a single file (BundleFile),
+       their records carry the byte offset and length of the script in it"""
+    ManifestFile = '_manifest.csv'
+    CompletionPrefix = 'completed_'
+    BundleFile = '_faultload.bundle'
+    BundleDriver = 'bundle.do'
+
+    def __init__(self, work_dir, toolconf):
+        self.work_dir = work_dir
+        self.toolconf = toolconf
+        self.manifest_file = os.path.join(work_dir, toolconf.script_dir, CompletionManifest.ManifestFile)
+        self.dumpnames = dict()
+        self.bundled = dict()
+        self.completed = set()
+        self.offsets = dict()
+
+    def add_records(self, mapping):
+        for m in mapping:
+            self.dumpnames[m[0]] = m[1]
+            if len(m) > 3:
+                self.bundled[m[0]] = (int(m[2]), int(m[3]))
+
+    def write(self, mapping):
+        """mapping: list of (script, dumpname) or (script, dumpname, bundle offset, length); previous completion records are discarded"""
+        self.dumpnames, self.bundled = dict(), dict()
+        self.add_records(mapping)
+        if len(mapping) > 0:
+            robust_file_write(self.manifest_file, ''.join(';'.join(str(i) for i in m) + '\n' for m in mapping))
+        else:
+            open(self.manifest_file, 'w').close()
+        for f in glob.glob(os.path.join(self.work_dir, self.toolconf.log_dir, CompletionManifest.CompletionPrefix + '*.txt')):
+            os.remove(f)
+        self.completed, self.offsets = set(), dict()
+
+    def append(self, mapping):
+        """Adds the scripts of a further faultload batch (sequential sampling), completion records are kept"""
+        self.add_records(mapping)
+        with open(self.manifest_file, 'a') as f:
+            f.write(''.join(';'.join(str(i) for i in m) + '\n' for m in mapping))
+
+    def load(self):
+        if not os.path.exists(self.manifest_file):
+            return False
+        self.dumpnames, self.bundled = dict(), dict()
+        with open(self.manifest_file, 'r') as f:
+            self.add_records([l.rstrip('\n').split(';') for l in f if ';' in l])
+        return True
+
+    def script_command(self, script):
+        """Simulator command executing the script (paths relative to work dir)"""
+        if script in self.bundled:
+            return 'do {0}/{1}; davos_do_bundle {2}/{3} {4} {5}'.format(self.toolconf.code_dir, CompletionManifest.BundleDriver,
+                                                                      self.toolconf.script_dir, CompletionManifest.BundleFile, *self.bundled[script])
+        return 'do {0}/{1}'.format(self.toolconf.script_dir, script)
+
+    def script_content(self, script):
+        if script in self.bundled:
+            offset, length = self.bundled[script]
+            with open(os.path.join(self.work_dir, self.toolconf.script_dir, CompletionManifest.BundleFile), 'rb') as f:
+                f.seek(offset)
+                return f.read(length)
+        with open(os.path.join(self.work_dir, self.toolconf.script_dir, script), 'r') as f:
+            return f.read()
+
+    def update(self):
+        """Reads the completion records appended since the last call, returns the number of new ones"""
+        cnt = len(self.completed)
+        for fname in glob.glob(os.path.join(self.work_dir, self.toolconf.log_dir, CompletionManifest.CompletionPrefix + '*.txt')):
+            offset = self.offsets.get(fname, 0)
+            if os.path.getsize(fname) <= offset:
+                continue
+            with open(fname, 'r') as f:
+                f.seek(offset)
+                buf = f.read()
+            # unterminated last record is still being written
+            buf = buf[:buf.rfind('\n') + 1]
+            self.offsets[fname] = offset + len(buf)
+            self.completed.update(l.strip() for l in buf.split('\n') if l.strip() != '')
+        return len(self.completed) - cnt
+
+    def sync_results(self):
+        """Marks as completed the dumps found in the result dir (single listing, for runs without completion records)"""
+        existing = set(os.listdir(os.path.join(self.work_dir, self.toolconf.result_dir)))
+        res = [d for d in self.dumpnames.values() if d in existing and d not in self.completed]
+        if len(res) > 0:
+            self.record(res, 'sync')
+        return len(res)
+
+    def record(self, dumpnames, label='local'):
+        """Appends completion records from this process"""
+        if len(dumpnames) == 0:
+            return
+        fname = os.path.join(self.work_dir, self.toolconf.log_dir, '{0}{1}.txt'.format(CompletionManifest.CompletionPrefix, label))
+        with open(fname, 'a') as f:
+            f.write(''.join('{0}\n'.format(d) for d in dumpnames))
+        self.completed.update(dumpnames)
+
+    def record_shell(self, dumpname, label):
+        """Shell command appending the completion record of dumpname (if it was written) from a simulation job"""
+        return '[ -s {0}/{1} ] && echo {1} >> {2}/{3}{4}.txt'.format(self.toolconf.result_dir, dumpname, self.toolconf.log_dir, CompletionManifest.CompletionPrefix, label)
+
+    def record_tcl(self, dumpname, label):
+        """Tcl (simulator) command appending the completion record of dumpname (if it was written, non-empty as in record_shell)"""
+        return 'if {{[file exists {0}/{1}] && [file size {0}/{1}] > 0}} {{set fcompl [open {2}/{3}{4}.txt a]; puts $fcompl {1}; close $fcompl}}'.format(
+            self.toolconf.result_dir, dumpname, self.toolconf.log_dir, CompletionManifest.CompletionPrefix, label)
+
+    def pending(self):
+        return sorted(s for s, d in self.dumpnames.iteritems() if d not in self.completed)
+
+    def size(self):
+        return len(self.dumpnames)
+
+
+class PipelineStatus:
+    Pending, Running, Completed, Failed, Cancelled = range(5)
+
+
+class PipelineState:
+    """Keys of the completed pipeline tasks (one per line in fname), to resume an interrupted run;
+       the first line holds the signature of the configuration, the state is discarded when it differs"""
+
+    def __init__(self, fname, signature=''):
+        self.fname = fname
+        self.signature = signature
+        self.completed = set()
+
+    def load(self):
+        self.completed = set()
+        lines = []
+        if os.path.exists(self.fname):
+            with open(self.fname, 'r') as f:
+                lines = f.read().splitlines()
+        if len(lines) > 0 and lines[0] == self.signature:
+            self.completed = set(i for i in lines[1:] if i != '')
+        else:
+            self.reset()
+        return (self.completed)
+
+    def reset(self):
+        self.completed = set()
+        with open(self.fname, 'w') as f:
+            f.write(self.signature + '\n')
+
+    def add(self, key):
+        self.completed.add(key)
+        with open(self.fname, 'a') as f:
+            f.write(key + '\n')
+
+    def __contains__(self, key):
+        return (key in self.completed)
+
+
+class PipelineTask:
+    """Task of PipelineScheduler: action(slots) is executed once all deps are completed
+        slots: simulator slots taken by the task, -1: all free slots minus one per other group waiting for a simulator slot
+        isolated: True - runs in a forked process, False - runs in a thread of the scheduler process (e.g. access to the database)
+        group: tasks of the same group (configuration) do not reserve slots from each other
+        state: PipelineState, the task is skipped when its key is in the state, and recorded there when completed
+    """
+
+    def __init__(self, label, action, deps=None, slots=0, isolated=True, group='', state=None, key=None):
+        self.label = label
+        self.action = action
+        self.deps = deps if deps is not None else []
+        self.slots = slots
+        self.isolated = isolated
+        self.group = group
+        self.state = state
+        self.key = key if key is not None else label
+        self.status = PipelineStatus.Pending
+        self.granted = 0
+        self.proc = None
+        self.thread = None
+        self.success = False
+
+
+class PipelineScheduler:
+    """Executes a DAG of PipelineTasks within a budget of maxslots simulator slots:
+       isolated tasks of independent branches run concurrently, non-isolated tasks run one at a time in a worker thread
+       of this process, while other tasks are started and reaped. Dependents of a failed task are cancelled, other branches go on."""
+
+    def __init__(self, maxslots, poll_interval=1.0):
+        self.maxslots = max(1, maxslots)
+        self.poll_interval = poll_interval
+        self.tasks = []
+
+    def add(self, task):
+        task.slots = min(task.slots, self.maxslots)
+        self.tasks.append(task)
+        return (task)
+
+    def free_slots(self):
+        return (self.maxslots - sum(t.granted for t in self.tasks if t.status == PipelineStatus.Running))
+
+    def depends_on(self, task, other):
+        return (any(d is other or self.depends_on(d, other) for d in task.deps))
+
+    def reserved_slots(self, task):
+        """One slot per other group with a pending fixed-slot task that is not behind task, and not holding a slot already"""
+        waiting = set(t.group for t in self.tasks if t.status == PipelineStatus.Pending and t.slots > 0 and t.group != task.group
+                      and not (t.state is not None and t.key in t.state) and not self.depends_on(t, task))
+        holding = set(t.group for t in self.tasks if t.status == PipelineStatus.Running and t.granted > 0)
+        return (len(waiting - holding))
+
+    def grant(self, task):
+        free = self.free_slots()
+        if task.slots >= 0:
+            return (task.slots if task.slots <= free else None)
+        if free < 1:
+            return (None)
+        return (max(1, free - self.reserved_slots(task)))
+
+    def complete(self, task, success):
+        task.status = PipelineStatus.Completed if success else PipelineStatus.Failed
+        task.granted = 0
+        if success and task.state is not None:
+            task.state.add(task.key)
+        print('Pipeline: {0} {1}'.format(task.label, 'completed' if success else 'FAILED'))
+
+    def poll(self):
+        for t in self.tasks:
+            if t.status == PipelineStatus.Running and t.proc is not None and not t.proc.is_alive():
+                t.proc.join()
+                self.complete(t, t.proc.exitcode == 0)
+                t.proc = None
+            elif t.status == PipelineStatus.Running and t.thread is not None and not t.thread.is_alive():
+                t.thread.join()
+                self.complete(t, t.success)
+                t.thread = None
+        changed = True
+        while changed:
+            changed = False
+            for t in self.tasks:
+                if t.status == PipelineStatus.Pending and any(d.status in (PipelineStatus.Failed, PipelineStatus.Cancelled) for d in t.deps):
+                    t.status = PipelineStatus.Cancelled
+                    print('Pipeline: {0} cancelled'.format(t.label))
+                    changed = True
+
+    def run_local(self, task):
+        """Worker thread of a non-isolated task, completed by poll"""
+        try:
+            task.action(task.granted)
+            task.success = True
+        except Exception as e:
+            traceback.print_exc()
+            task.success = False
+
+    def run(self):
+        """Returns the list of tasks that have not been completed (failed or cancelled)"""
+        try:
+            while True:
+                self.poll()
+                progress = False
+                local = any(t.status == PipelineStatus.Running and t.thread is not None for t in self.tasks)
+                for t in self.tasks:
+                    if t.status != PipelineStatus.Pending or not all(d.status == PipelineStatus.Completed for d in t.deps):
+                        continue
+                    if t.state is not None and t.key in t.state:
+                        t.status = PipelineStatus.Completed
+                        print('Pipeline: {0} completed in a previous run'.format(t.label))
+                        progress = True
+                        continue
+                    if not t.isolated and local:
+                        continue
+                    slots = self.grant(t)
+                    if slots is None:
+                        continue
+                    t.status, t.granted = PipelineStatus.Running, slots
+                    print('Pipeline: {0} started, slots: {1}'.format(t.label, slots))
+                    if t.isolated:
+                        # forked while a non-isolated task may run in the worker thread: isolated tasks get their own
+                        # copy of the configuration and do not use the database connection of this process
+                        t.proc = multiprocessing.Process(target=t.action, args=(slots,))
+                        t.proc.start()
+                    else:
+                        t.thread = threading.Thread(target=self.run_local, args=(t,))
+                        t.thread.start()
+                        local = True
+                    progress = True
+                if all(t.status != PipelineStatus.Pending and t.status != PipelineStatus.Running for t in self.tasks):
+                    break
+                elif not progress:
+                    time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            for t in self.tasks:
+                if t.proc is not None and t.proc.is_alive():
+                    t.proc.terminate()
+            raise
+        return ([t for t in self.tasks if t.status != PipelineStatus.Completed])
+
+
 def create_folder(rtdir, nestdir, prefix=''):
     targetpath = os.path.join(rtdir, nestdir)
     renamepath = os.path.join(rtdir, nestdir + "__" + prefix)
@@ -881,6 +1178,41 @@ class DesignNode:
         self.group = ""
 
 
+netlist_instance_ptn = re.compile('(.*)\s\((.*?)\)$')
+rtl_instance_ptn = re.compile('\{(.+)\}')
+rtl_index_ptn = (re.compile('(.*)\([0-9]+\)$'), re.compile('(.*)\[[0-9]+\]$'))
+
+
+def parse_instance_log(fname, design_type, strip_index=False):
+    """Streaming parser of the instance list (output of 'find instances' for netlist, modelsim_rtl_nodes.do for rtl)
+        yields one DesignNode per matching line, the file is read line by line
+        strip_index: removes the trailing array index from rtl signal names, as (i) or [i]
+    """
+    with open(fname, 'r') as f:
+        for s in f:
+            s = s.rstrip('\r\n')
+            x = DesignNode()
+            if design_type == 'netlist':
+                match = netlist_instance_ptn.match(s)
+                if match is None: continue  # string does not match the pattern for netlist
+                path, x.type = match.group(1), match.group(2).lower()
+            elif design_type == 'rtl':
+                match = rtl_instance_ptn.search(s)
+                if match is None: continue
+                path, x.type = match.group(1), 'signal'
+                if strip_index:
+                    for ptn in rtl_index_ptn:
+                        match = ptn.match(path)
+                        if match is not None: path = match.group(1)
+            else:
+                continue
+            full_path = path.split('/')
+            x.name = full_path[-1]
+            x.unit_path = '/'.join(full_path[:-1])
+            if not x.unit_path.endswith('/'): x.unit_path += '/'
+            yield x
+
+
 class ConfigInitNodes:
     def __init__(self, lbl=""):
         self.config_label = lbl
@@ -890,14 +1222,26 @@ class ConfigInitNodes:
         self.specific_nodes = []
         # for search speed-up
         self.selected = []
+        # (type, name, unit_path) -> node, maintained by add_node and remove_selected
+        self.registry = dict()
+
+    def add_node(self, node):
+        """Appends node to all_nodes unless a node with the same (type, name, unit_path) is already there
+            returns True if the node has been added
+        """
+        key = (node.type, node.name, node.unit_path)
+        if key in self.registry:
+            return (False)
+        self.registry[key] = node
+        self.all_nodes.append(node)
+        return (True)
 
     def find_node_by_type_and_name_and_unit(self, stype, sname, sunit):
         self.selected = []
-        for c in self.all_nodes:
-            if (c.type == stype and c.name == sname and c.unit_path == sunit):
-                self.selected.append(c)
-                return (c)
-        return (None)
+        c = self.registry.get((stype, sname, sunit), None)
+        if c is not None:
+            self.selected.append(c)
+        return (c)
 
     def select_pseudo_common_items(self, reg_base_types, skey, sunit, mask_suffix='_BRB[0-9]+'):
         self.selected = []
@@ -911,6 +1255,9 @@ class ConfigInitNodes:
     def remove_selected(self):
         for c in self.selected:
             self.all_nodes.remove(c)
+            key = (c.type, c.name, c.unit_path)
+            if self.registry.get(key, None) is c:
+                del self.registry[key]
 
     # group = [] (all_nodes, pseudo_common_nodes, specific_nodes)
     def get_nodes_by_type(self, group, stype):
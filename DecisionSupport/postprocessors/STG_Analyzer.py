@@ -27,6 +27,7 @@ DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__fil
 sys.path.insert(1, DAVOSPATH)
 from Davos_Generic import *
 from Datamanager import *
+from ResultPack import open_dataset
 
 target_filter = ''
 ANALYSIS_MODE = 2
@@ -183,7 +184,7 @@ if __name__ == "__main__":
         #inj_descriptors = [x for x in datamodel.LaunchedInjExp_dict.values() if x.ModelID == model.ID]
         os.chdir(conf.work_dir)
         desctable = ExpDescTable(conf.label)
-        dataset = ZipFile("{0}/{1}.zip".format(conf.work_dir, conf.label) , 'r')
+        dataset = open_dataset("{0}/{1}".format(conf.work_dir, conf.label))
         simfiles = dataset.namelist()
         with dataset.open('iresults/_summary.csv') as f:
             desctable.build_from_csv_file(f, "Other")
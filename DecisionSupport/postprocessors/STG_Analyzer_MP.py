@@ -26,6 +26,7 @@ DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__fil
 sys.path.insert(1, DAVOSPATH)
 from Davos_Generic import *
 from Datamanager import *
+from ResultPack import open_dataset
 
 target_filter = ''
 ANALYSIS_MODE = 2
@@ -188,22 +189,31 @@ def proc_traces(trace_range):
     #inj_descriptors = [x for x in datamodel.LaunchedInjExp_dict.values() if x.ModelID == model.ID]
     os.chdir(conf.work_dir)
     #desctable = ExpDescTable(conf.label)
-    dataset = ZipFile("{0}/{1}.zip".format(conf.work_dir, conf.label) , 'r')
+    dataset = open_dataset("{0}/{1}".format(conf.work_dir, conf.label))
     simfiles = dataset.namelist()
     #with dataset.open('iresults/_summary.csv') as f:
     #    desctable.build_from_csv_file(f, "Other")
 
     #print('Processing simulation traces: {0}'.format(conf.label))
-    datamodel.reference.reference_dump = simDump()
-    with dataset.open('code/simInitModel.do') as f:
-        datamodel.reference.reference_dump.build_labels_from_file(f, config.SBFI.analyzer.rename_list)
-    with dataset.open('iresults/{0}'.format(toolconf.reference_file)) as f:
-        datamodel.reference.reference_dump.normalize_array_labels(f)
-    with dataset.open('iresults/{0}'.format(toolconf.reference_file)) as f:
-        datamodel.reference.reference_dump.build_vectors_from_file(f, True)
-    datamodel.reference.initial_internal_labels, datamodel.reference.initial_output_labels = datamodel.reference.reference_dump.get_labels_copy()
+    # prepared reference trace is cached: each worker process loads it instead of parsing the dumps
+    with dataset.open('code/simInitModel.do') as f1, dataset.open('iresults/{0}'.format(toolconf.reference_file)) as f2:
+        cache = ReferenceTraceCache(os.path.join(conf.work_dir, ReferenceTraceCache.CacheDir), 'simDump_filtered', [f1, f2],
+                                    ReferenceTraceCache.analyzer_items(config.SBFI.analyzer))
+    reference = cache.load()
+    if reference is None:
+        reference_dump = simDump()
+        with dataset.open('code/simInitModel.do') as f:
+            reference_dump.build_labels_from_file(f, config.SBFI.analyzer.rename_list)
+        with dataset.open('iresults/{0}'.format(toolconf.reference_file)) as f:
+            reference_dump.normalize_array_labels(f)
+        with dataset.open('iresults/{0}'.format(toolconf.reference_file)) as f:
+            reference_dump.build_vectors_from_file(f, True)
+        internal_labels, output_labels = reference_dump.get_labels_copy()
+        reference_dump.join_output_columns(config.SBFI.analyzer.join_group_list.copy())
+        reference = (reference_dump, internal_labels, output_labels)
+        cache.store(reference)
+    datamodel.reference.reference_dump, datamodel.reference.initial_internal_labels, datamodel.reference.initial_output_labels = reference
     datamodel.reference.JnGrLst = config.SBFI.analyzer.join_group_list.copy()
-    datamodel.reference.reference_dump.join_output_columns(datamodel.reference.JnGrLst.copy())
 
     tw = config.SBFI.analyzer.time_window if config.SBFI.analyzer.time_window is not None \
         else (datamodel.reference.reference_dump.vectors[0].time, datamodel.reference.reference_dump.vectors[-1].time)
@@ -347,7 +357,7 @@ if __name__ == "__main__":
         conf.logdir = logdir
 
         desctable = ExpDescTable(conf.label)
-        dataset = ZipFile("{0}/{1}.zip".format(conf.work_dir, conf.label), 'r')
+        dataset = open_dataset("{0}/{1}".format(conf.work_dir, conf.label))
         simfiles = dataset.namelist()
         with dataset.open('iresults/_summary.csv') as f:
             desctable.build_from_csv_file(f, "Other")
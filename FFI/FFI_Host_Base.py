@@ -21,6 +21,7 @@ import random
 import time
 import math
 import socket
+import bisect
 davos_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
 sys.path.insert(1, davos_dir)
 from Davos_Generic import Table
@@ -57,6 +58,144 @@ class CellTypes:
     EssentialBits, LUT, FF, BRAM, LUTRAM = range(5)
 
 
+class SeuRecords:
+    """Binary fault list as loaded by the injector app: flat array of 32-bit words (optional header),
+    followed by one record of RecordSize words per SEU:
+    Id, Offset, CellType, FaultModel, CellY, CellLabel, SLR, FAR, Word, Mask, Time, Duration, ReferenceWord
+    Serialized as little-endian words by a single write"""
+    RecordSize = 13
+
+    def __init__(self, header=None):
+        self.words = array(WordType, header if header is not None else [])
+
+    def add_faults(self, fault_list, part_idx=0, numbered=True):
+        """Appends the SEUs of fault_list as part part_idx, SEU offsets are numbered within the part (or all zero)"""
+        records, offset = [], 0
+        for fdesc in fault_list:
+            fdesc.PartIdx = part_idx
+            for seu in fdesc.SeuItems:
+                seu.Offset = offset
+                if numbered:
+                    offset += 1
+                records.extend((fdesc.Id, seu.Offset, fdesc.CellType, fdesc.FaultModel,
+                                seu.CellY, seu.CellLabel,
+                                seu.SLR, seu.FAR, seu.Word, seu.Mask,
+                                seu.Time, seu.Duration, seu.ReferenceWord))
+        self.words.fromlist(records)
+
+    def tostring(self):
+        if sys.byteorder == 'little':
+            return self.words.tostring()
+        data = array(WordType, self.words)
+        data.byteswap()
+        return data.tostring()
+
+    def write(self, fname):
+        with open(fname, 'wb') as f:
+            f.write(self.tostring())
+
+
+class SamplingStrata:
+    Nostrata, Column, FrameType, ColumnType = range(4)
+
+    @staticmethod
+    def from_string(val):
+        return {'column': SamplingStrata.Column, 'frametype': SamplingStrata.FrameType,
+                'columntype': SamplingStrata.ColumnType}.get(val.lower(), SamplingStrata.Nostrata)
+
+
+# bit indexes set in each byte value
+BytePositions = [tuple(i for i in range(8) if (b >> i) & 0x1) for b in range(256)]
+
+
+class EssentialBitSampler:
+    """Uniform sampling of the essential bits of a frame list (e.g. frames of a Pblock) without rejection:
+    positions of all essential bits are indexed once from the frame masks (positions: frame_index*FrameSize*32 + word*32 + bit,
+    frame_start: first position of each frame), samples are drawn as indexes into positions.
+    Supports sampling without replacement and stratification (proportional allocation) by column, frame type (FAR block type)
+    or column type (CLB, BRAM, ...), samples are reproducible for a given seed"""
+
+    def __init__(self, framelist, CM):
+        self.frames = framelist
+        self.FrameBits = CM.FrameSize * 32
+        self.positions = array(WordType)
+        self.frame_start = array(WordType, [0])
+        for idx, frame in enumerate(framelist):
+            base = idx * self.FrameBits
+            for word, val in enumerate(frame.mask):
+                if val != 0:
+                    for shift in (0, 8, 16, 24):
+                        b = (val >> shift) & 0xFF
+                        if b != 0:
+                            p = base + word*32 + shift
+                            self.positions.extend([p + i for i in BytePositions[b]])
+            self.frame_start.append(len(self.positions))
+        self.population_size = len(self.positions)
+        self.column_types = {}
+        for SLR_ID, fragment in CM.FragmentDict.iteritems():
+            for desc in fragment.layout.ColumnDescriptors:
+                self.column_types[(SLR_ID, desc.Block, desc.Top, desc.Row, desc.Column)] = desc.Type
+
+    def get_stratum(self, frame, stratify):
+        c = frame.coord
+        if stratify == SamplingStrata.Column:
+            return (frame.SLR_ID, c.BlockType, c.Top, c.Row, c.Major)
+        elif stratify == SamplingStrata.FrameType:
+            return c.BlockType
+        elif stratify == SamplingStrata.ColumnType:
+            return self.column_types.get((frame.SLR_ID, c.BlockType, c.Top, c.Row, c.Major), 'UNKNOWN')
+        return None
+
+    def get_strata(self, stratify):
+        """key -> (frame indexes, cumulative number of essential bits), in order of the first frame"""
+        strata, keys = {}, []
+        for idx, frame in enumerate(self.frames):
+            size = self.frame_start[idx+1] - self.frame_start[idx]
+            if size > 0:
+                key = self.get_stratum(frame, stratify)
+                if key not in strata:
+                    strata[key] = ([], [0])
+                    keys.append(key)
+                strata[key][0].append(idx)
+                strata[key][1].append(strata[key][1][-1] + size)
+        return [(key, strata[key][0], strata[key][1]) for key in keys]
+
+    @staticmethod
+    def allocate(n, sizes):
+        """Proportional allocation of n samples to strata of given sizes (largest remainder)"""
+        total = sum(sizes)
+        quotas = [n * size / total for size in sizes]
+        rest = sorted(range(len(sizes)), key=lambda i: (-(n * sizes[i] % total), i))
+        for i in rest[:n - sum(quotas)]:
+            quotas[i] += 1
+        return quotas
+
+    def sample(self, n, replace=True, stratify=SamplingStrata.Nostrata, seed=None):
+        """n essential bits drawn uniformly: list of (frame, word, bit)"""
+        rng = random.Random(seed)
+        if not replace and n > self.population_size:
+            print('EssentialBitSampler: sample size {0:d} exceeds population size {1:d}, sampled without replacement: {1:d}'.format(
+                n, self.population_size))
+            n = self.population_size
+        if n == 0 or self.population_size == 0:
+            return []
+        strata = self.get_strata(stratify)
+        res = []
+        for (key, frames, cum), k in zip(strata, EssentialBitSampler.allocate(n, [s[2][-1] for s in strata])):
+            size = cum[-1]
+            draws = rng.sample(xrange(size), k) if not replace else [rng.randrange(size) for i in xrange(k)]
+            if stratify == SamplingStrata.Nostrata:
+                res += draws
+            else:
+                for r in draws:
+                    i = bisect.bisect_right(cum, r) - 1
+                    res.append(self.frame_start[frames[i]] + r - cum[i])
+        if len(strata) > 1:
+            rng.shuffle(res)
+        positions, FrameBits = self.positions, self.FrameBits
+        return [(self.frames[positions[i] / FrameBits], (positions[i] % FrameBits) / 32, positions[i] % 32) for i in res]
+
+
 class InjectionStatistics:
     def __init__(self):
         self.population_size = int(0)
@@ -130,19 +269,17 @@ class FFIHostBase(object):
         random.seed(12345)
         if cell_type == CellTypes.EssentialBits:
             framelist = self.design.getFarList_for_Pblock(pb.X1, pb.Y1, pb.X2, pb.Y2)
-            self.InjStat.population_size = sum(frame.stat.EssentialBitsCount for frame in framelist)
-            for i in range(exp_conf.sample_size_goal):
+            self.InjStat.population_size = self.design.get_essential_bits_for_Pblock(pb.X1, pb.Y1, pb.X2, pb.Y2)
+            sampler = EssentialBitSampler(framelist, self.design.CM)
+            bits = sampler.sample(exp_conf.sample_size_goal * exp_conf.fault_multiplicity, not exp_conf.sample_without_replacement,
+                                  SamplingStrata.from_string(exp_conf.stratify), exp_conf.seed)
+            for i in range(len(bits) / exp_conf.fault_multiplicity):
                 fexp_conf = FaultDescriptor(i, CellTypes.EssentialBits, exp_conf.fault_model, exp_conf.fault_multiplicity)
                 for j in range(exp_conf.fault_multiplicity):
                     seu = SEU_item()
-                    essential_bit_mask = 0x0
-                    while (essential_bit_mask >> seu.Bit) & 0x1 == 0x0:
-                        frame = random.choice(framelist)
-                        seu.FAR = frame.FAR
-                        seu.SLR = self.design.CM.SLR_ID_LIST.index(frame.SLR_ID)
-                        seu.Word = random.randint(0, self.design.CM.FrameSize-1)
-                        seu.Bit = random.randint(0, 31)
-                        essential_bit_mask = frame.mask[seu.Word]
+                    frame, seu.Word, seu.Bit = bits[i * exp_conf.fault_multiplicity + j]
+                    seu.FAR = frame.FAR
+                    seu.SLR = self.design.CM.SLR_ID_LIST.index(frame.SLR_ID)
                     seu.Mask = 0x1 << seu.Bit
                     seu.ReferenceWord = frame.data[seu.Word]
                     f = FarFields.from_FAR(seu.FAR, self.design.series)
@@ -213,52 +350,26 @@ class FFIHostBase(object):
         print('Sampled faults: {0:d} (population size = {1:d})'.format(exp_conf.sample_size_goal, self.InjStat.population_size))
 
     def export_fault_list_bin(self, part_size=1000):
-        specificator = '<L'         #Little Endian
         nparts = int(math.ceil(float(len(self.fault_list))/part_size))
         for part_idx in range(nparts):
             fname = os.path.join(self.generatedFilesDir, 'Faultlist_{0:d}.bin'.format(part_idx))
             self.faultload_files.append(fname)
-            offset = 0
-            with open(fname, 'wb') as f:
-                for i in range(part_size):
-                    if part_idx*part_size+i >= len(self.fault_list):
-                        break
-                    fdesc = self.fault_list[part_idx*part_size+i]
-                    fdesc.PartIdx = part_idx
-                    for seu in fdesc.SeuItems:
-                        seu.Offset = offset
-                        offset += 1
-                        #Export SEU descriptor to the binary file (10 words x 32-bit)
-                        for atr in [fdesc.Id, seu.Offset, fdesc.CellType, fdesc.FaultModel,
-                                    seu.CellY, seu.CellLabel,
-                                    seu.SLR,  seu.FAR,    seu.Word,       seu.Mask, 
-                                    seu.Time, seu.Duration, seu.ReferenceWord]:
-                            f.write(struct.pack(specificator, atr))
-                            
-                            
+            #Export SEU descriptors to the binary file (13 words x 32-bit per SEU)
+            records = SeuRecords()
+            records.add_faults(self.fault_list[part_idx*part_size : (part_idx+1)*part_size], part_idx)
+            records.write(fname)
+
     def export_fault_list_full(self):
-        specificator = '<L'         #Little Endian
         fname = os.path.join(self.generatedFilesDir, 'Faultlist_0.bin')
         self.faultload_files.append(fname)
-        with open(fname, 'wb') as f:
-            #Header: Base + 0x0
-            for atr in [0xFA01FA01, len(self.fault_list), 0x1, 0x0,
-                        0x0, 0x0, 0x0, 0x0,
-                        0x0, 0x0, 0x0, 0x0,
-                        0x0, 0x0, 0x0, 0x0]:
-                f.write(struct.pack(specificator, atr))
-            offset = 0
-            #Fault descriptors: Base + 0x40 + i*11*4 
-            for i in range(len(self.fault_list)):
-                fdesc = self.fault_list[i]
-                fdesc.PartIdx = 0
-                for seu in fdesc.SeuItems:
-                    seu.Offset = offset
-                    for atr in [fdesc.Id, seu.Offset, fdesc.CellType, fdesc.FaultModel,
-                                seu.CellY, seu.CellLabel,
-                                seu.SLR,  seu.FAR,    seu.Word,       seu.Mask, 
-                                seu.Time, seu.Duration, seu.ReferenceWord]:
-                        f.write(struct.pack(specificator, atr))  
+        #Header: Base + 0x0
+        records = SeuRecords([0xFA01FA01, len(self.fault_list), 0x1, 0x0,
+                              0x0, 0x0, 0x0, 0x0,
+                              0x0, 0x0, 0x0, 0x0,
+                              0x0, 0x0, 0x0, 0x0])
+        #Fault descriptors: Base + 0x40 + i*13*4
+        records.add_faults(self.fault_list, 0, False)
+        records.write(fname)
 
     def get_fdesc_labels(self):
         return ['Id', 'PartIdx', 'CellType', 'FaultModel', 'Multiplicity', 'FailureMode', 'Offset', 'DesignNode', 'SLR', 'FAR',
@@ -277,38 +388,44 @@ class FFIHostBase(object):
 
     def export_fault_list_csv(self):
         self.FdescFile = os.path.join(self.generatedFilesDir, 'Faultlist.csv')
-        FdescTable = Table('Faultlist', self.get_fdesc_labels())
-        for idx in range(len(self.fault_list)):
-            for row in self.faultdesc_format_str(idx):
-                FdescTable.add_row(row)
-        FdescTable.to_csv(';', True, self.FdescFile)
+        #streamed in the format of Table.to_csv(';', True)
+        with open(self.FdescFile, 'w') as f:
+            f.write('sep=;\n' + ';'.join(self.get_fdesc_labels()))
+            f.writelines('\n' + ';'.join(row) for idx in xrange(len(self.fault_list)) for row in self.faultdesc_format_str(idx))
         print('Fault List exported to: {0}'.format(self.FdescFile))
 
     def load_fault_list_csv(self, infile):
-        Fdesctab = Table('Fdesc')
-        Fdesctab.build_from_csv(infile)
-        fdesc, idx, i, MaxRows = None, -1, 0, Fdesctab.rownum()
+        """Restores the fault list from the CSV (Faultlist.csv or log file), rows are split in place (no Table)"""
+        with open(infile, 'r') as f:
+            lines = f.read().replace('\r', '').split('\n')
+        match = re.search("sep\s*?=\s*?([;,]+)", lines[0])
+        sep, first = (match.group(1), 1) if match else (',', 0)
+        labels = lines[first].split(sep)
+        col = dict((lbl, labels.index(lbl)) for lbl in labels)
+        Id, PartIdx, CellType, FaultModel, Multiplicity, FailureMode, Offset, DesignNode, SLR, FAR, Word, Bit, Mask, Time, Duration = [
+            col[lbl] for lbl in ['Id', 'PartIdx', 'CellType', 'FaultModel', 'Multiplicity', 'FailureMode', 'Offset', 'DesignNode',
+                                 'SLR', 'FAR', 'Word', 'Bit', 'Mask', 'Time', 'Duration']]
+        ncols = len([lbl for lbl in labels if lbl != ''])
+        rows = [c for c in (l.split(sep) for l in lines[first+1:]) if len(c) >= ncols]
+        i, MaxRows = 0, len(rows)
         while i < MaxRows:
-            fdesc = FaultDescriptor(
-                int(Fdesctab.getByLabel('Id', i)),
-                int(Fdesctab.getByLabel('CellType', i)),
-                int(Fdesctab.getByLabel('FaultModel', i)),
-                int(Fdesctab.getByLabel('Multiplicity', i)))
-            fdesc.PartIdx = int(Fdesctab.getByLabel('PartIdx', i))
-            fdesc.FailureMode = Fdesctab.getByLabel('FailureMode', i)
-            for seu_idx in range(fdesc.Multiplicity):
+            r = rows[i]
+            fdesc = FaultDescriptor(int(r[Id]), int(r[CellType]), int(r[FaultModel]), int(r[Multiplicity]))
+            fdesc.PartIdx = int(r[PartIdx])
+            fdesc.FailureMode = r[FailureMode]
+            for r in rows[i : i+fdesc.Multiplicity]:
                 seu = SEU_item()
-                seu.Offset = int(Fdesctab.getByLabel('Offset', i))
-                seu.DesignNode = Fdesctab.getByLabel('DesignNode', i)
-                seu.SLR = int(Fdesctab.getByLabel('SLR', i), 16)
-                seu.FAR = int(Fdesctab.getByLabel('FAR', i), 16)
-                seu.Word = int(Fdesctab.getByLabel('Word', i))
-                seu.Bit = int(Fdesctab.getByLabel('Bit', i))
-                seu.Mask = int(Fdesctab.getByLabel('Mask', i), 16)
-                seu.Time = int(Fdesctab.getByLabel('Time', i))
-                seu.Duration = int(Fdesctab.getByLabel('Duration', i))
+                seu.Offset = int(r[Offset])
+                seu.DesignNode = r[DesignNode]
+                seu.SLR = int(r[SLR], 16)
+                seu.FAR = int(r[FAR], 16)
+                seu.Word = int(r[Word])
+                seu.Bit = int(r[Bit])
+                seu.Mask = int(r[Mask], 16)
+                seu.Time = int(r[Time])
+                seu.Duration = int(r[Duration])
                 fdesc.SeuItems.append(seu)
-                i += 1
+            i += fdesc.Multiplicity
             self.fault_list.append(fdesc)
         print('Fault descriptors restored from {0:s} : {1:d} items'.format(infile, len(self.fault_list)))
 
@@ -326,17 +443,10 @@ class FFIHostBase(object):
             self.logfile = open(self.logfilename, 'a')
             print('Injector {0:s} Restored from logfile {1:s}'.format(self.__class__.__name__, self.logfilename))
         if hashing:
-            cfg = (unit_path, pb.to_string() if pb is not None else '', load_ll_file)
-            digest = hashlib.md5(str(cfg)).hexdigest()
-            dumpfile = os.path.join(self.generatedFilesDir, '{0:s}.pickle'.format(digest))
-            if os.path.exists(dumpfile):
-                with open(dumpfile, 'rb') as f:
-                    print 'Loading cached DesignModel from {0:s}, config = {1:s}'.format(dumpfile, str(cfg))
-                    self.design = pickle.load(f)
-            else:
+            cache = DesignModelCache(self.design, (unit_path, pb.to_string() if pb is not None else '', load_ll_file))
+            if not cache.load(self.design):
                 self.design.initialize(False, unit_path, pb, load_ll_file)
-                with open(dumpfile, 'wb') as f:
-                    pickle.dump(self.design, f)
+                cache.store(self.design)
         else:
             self.design.initialize(False, unit_path, pb, load_ll_file)
         print('FFI Design Model initialized in {0:.1f} seconds'.format(time.time() - start_time))
@@ -16,6 +16,8 @@ import struct
 import ast
 from collections import OrderedDict
 import copy
+import binascii
+from array import array
 DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
 sys.path.insert(1, DAVOSPATH)
 
@@ -40,6 +42,95 @@ class FPGASeries:
 
 FrameSizeDict = {FPGASeries.S7: 101, FPGASeries.US: 123, FPGASeries.USP: 93}
 
+# array typecode of 32-bit configuration words
+WordType = 'I' if array('I').itemsize == 4 else 'L'
+# bus width detect, followed by two pad words, and one sync word
+SyncSequence = [0x000000BB, 0x11220044, 0xFFFFFFFF, 0xFFFFFFFF, 0xAA995566]
+BusWidthDetectBytes = '\x00\x00\x00\xbb\x11\x22\x00\x44'
+# str.translate table: byte -> number of bits set in it
+PopcountTable = ''.join(chr(bin(i).count('1')) for i in range(256))
+
+
+def parse_ascii_words(text):
+    """Words of an ASCII-binary dump (EBC/EBD: one 32-bit word per line) as an array of WordType,
+    converted by a single integer conversion of all digits instead of int(line, 2) per line"""
+    digits = text.translate(None, ' \t\r\n')
+    count = len(digits) / 32
+    if len(digits) != 32 * count:
+        raise ValueError('parse_ascii_words: lines of 32 binary digits expected')
+    words = array(WordType)
+    if count > 0:
+        words.fromstring(binascii.unhexlify('{0:0{1}x}'.format(int(digits, 2), 8 * count)))
+        if sys.byteorder == 'little':
+            words.byteswap()
+    return words
+
+
+def popcount_frames(words, size):
+    """Number of bits set in each frame of a frames x words array (frame = size words)"""
+    bits = bytearray(words.tostring().translate(PopcountTable))
+    step = size * words.itemsize
+    return array(WordType, [sum(bits[i:i+step]) for i in range(0, len(bits), step)])
+
+
+class WordSearch:
+    """Search of word sequences (packet headers, commands) in the bitstream array, by str.find on its raw buffer"""
+    def __init__(self, words):
+        self.size = len(words)
+        self.buf = words.tostring()
+
+    def next(self, pattern, start=0):
+        """Index of the first occurrence of the word sequence at or after start, size of the bitstream if not found"""
+        ptn = array(WordType, pattern).tostring()
+        pos = self.buf.find(ptn, start * 4)
+        while pos >= 0 and pos % 4 != 0:
+            pos = self.buf.find(ptn, pos + 1)
+        return pos / 4 if pos >= 0 else self.size
+
+
+class FrameWords(object):
+    """Words of one frame: view on the frame array of its SLR (frames x words, row-major)"""
+    __slots__ = ('store', 'offset', 'size')
+
+    def __init__(self, store, offset, size):
+        self.store, self.offset, self.size = store, offset, size
+
+    def __getstate__(self):
+        return (self.store, self.offset, self.size)
+
+    def __setstate__(self, state):
+        self.store, self.offset, self.size = state
+
+    def __len__(self):
+        return self.size
+
+    def index_of(self, i):
+        if i < 0:
+            i += self.size
+        if i < 0 or i >= self.size:
+            raise IndexError('frame word index out of range')
+        return self.offset + i
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.tolist()[i]
+        return self.store[self.index_of(i)]
+
+    def __setitem__(self, i, val):
+        self.store[self.index_of(i)] = val
+
+    def __iter__(self):
+        return iter(self.store[self.offset:self.offset + self.size])
+
+    def __eq__(self, other):
+        return self.tolist() == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def tolist(self):
+        return self.store[self.offset:self.offset + self.size].tolist()
+
 map_L = [63, 47, 62, 46, 61, 45, 60, 44, 15, 31, 14, 30, 13, 29, 12, 28, 59, 43, 58, 42, 57, 41, 56, 40, 11, 27, 10, 26,
          9, 25, 8, 24, 55, 39, 54, 38, 53, 37, 52, 36, 7, 23, 6, 22, 5, 21, 4, 20, 51, 35, 50, 34, 49, 33, 48, 32, 3,
          19, 2, 18, 1, 17, 0, 16]
@@ -88,12 +179,12 @@ class FrameStatistics:
 
 
 class FrameDesc:
-    def __init__(self, FAR=0x0, Series=FPGASeries.S7, SLR_ID=0x0):
+    def __init__(self, FAR=0x0, Series=FPGASeries.S7, SLR_ID=0x0, data=None, coord=None):
         self.FAR = FAR
         self.SLR_ID = SLR_ID
         self.Series = Series
-        self.coord = FarFields.from_FAR(self.FAR, self.Series)
-        self.data = []
+        self.coord = coord if coord is not None else FarFields.from_FAR(self.FAR, self.Series)
+        self.data = data if data is not None else []
         self.mask = []
         self.ebc_data = []
         self.custom_mask = []
@@ -103,19 +194,19 @@ class FrameDesc:
 
     def SetFar(self, FAR):
         self.FAR = FAR
-        self.Coord = FarFields.from_FAR(self.FAR, self.Series)
+        self.coord = FarFields.from_FAR(self.FAR, self.Series)
 
     def GetFar(self):
         return(self.FAR)
 
-    def update_stat(self):
-        self.stat.Type = FarFields.from_FAR(self.FAR, self.Series).BlockType
+    def update_stat(self, EssentialBitsCount=None):
+        self.stat.Type = self.coord.BlockType
         # flag[0] - not_empty - when at least one word is not masked-out
-        self.stat.EssentialBitsCount = sum([bin(i).count("1") for i in self.mask])
-        for i in self.data:
-            if i!=0x0:
-                self.stat.Empty=False
-                break
+        if EssentialBitsCount is None:
+            EssentialBitsCount = sum([bin(i).count("1") for i in self.mask])
+        self.stat.EssentialBitsCount = EssentialBitsCount
+        if any(self.data):
+            self.stat.Empty = False
 
     def to_string(self, log_data, log_mask, log_word_indexes):
         res = "\nFAR : {0:08x} ({1:s})\tSLR: {2:08x}".format(self.FAR, self.coord.to_string(), self.SLR_ID)
@@ -194,12 +285,62 @@ class SuperLogicRegion:
         self.stat = BitstreamStatistics()
         self.Empty = True
         self.Series = Series
+        self.FrameSize = FrameSizeDict[Series]
+        # frames x words: words of FarList[k] at k*FrameSize
+        self.FrameData = array(WordType)
+        self.RowBreaks = bytearray()
+        self.Coords = []
+        # essential bits (EBD) and EBC data, aligned with FrameData; per-frame and per-column essential bit counts
+        self.EssentialMask = array(WordType)
+        self.EssentialData = array(WordType)
+        self.EssentialBits = array(WordType)
+        self.ColumnEssentialBits = dict()
+
+    def allocate_frames(self):
+        self.FrameData = array(WordType, [0]) * (len(self.FarList) * self.FrameSize)
+
+    def frame_view(self, index):
+        return FrameWords(self.FrameData, index * self.FrameSize, self.FrameSize)
+
+    def get_coords(self):
+        """FarFields of the frames in FarList"""
+        if len(self.Coords) != len(self.FarList):
+            self.Coords = [FarFields.from_FAR(FAR, self.Series) for FAR in self.FarList]
+        return self.Coords
+
+    def get_row_breaks(self):
+        """Pad frame map: RowBreaks[k] = 1 when FarList[k] and FarList[k+1] belong to different clock rows (Row or Top)"""
+        if len(self.RowBreaks) != len(self.FarList):
+            rows = [(f.Top, f.Row) for f in self.get_coords()]
+            self.RowBreaks = bytearray([1 if rows[k] != rows[k+1] else 0 for k in range(len(rows)-1)] + [0]*min(1, len(rows)))
+        return self.RowBreaks
+
+    def get_column_bounds(self):
+        """(first, last+1) indexes in FarList of each configuration column (BlockType, Top, Row, Major)"""
+        res, head = [], 0
+        cols = [(f.BlockType, f.Top, f.Row, f.Major) for f in self.get_coords()]
+        for k in range(1, len(cols)+1):
+            if k == len(cols) or cols[k] != cols[head]:
+                res.append((head, k))
+                head = k
+        return res
+
+    def count_essential_bits(self):
+        """Popcount of the essential bits mask: EssentialBits per frame, ColumnEssentialBits per column (FAR of its first frame)"""
+        self.EssentialBits = popcount_frames(self.EssentialMask, self.FrameSize)
+        self.ColumnEssentialBits = dict()
+        for head, end in self.get_column_bounds():
+            self.ColumnEssentialBits[self.FarList[head]] = sum(self.EssentialBits[head:end])
+        return self.EssentialBits
 
     def put_frame(self, frame):
         if not self.Empty:
             if frame.FAR == self.FarList[-1]:
                 print("FAR = {0:08x} already registered (pad frame)".format(frame.FAR))
                 return
+        if len(frame.data) == self.FrameSize and len(self.FrameData) == len(self.FarList) * self.FrameSize:
+            self.FrameData.extend(frame.data)
+            frame.data = self.frame_view(len(self.FarList))
         self.FarList.append(frame.FAR)
         self.Frames[frame.FAR] = frame
         self.Empty = False
@@ -213,8 +354,13 @@ class SuperLogicRegion:
 
     def update_stat(self):
         self.stat = BitstreamStatistics()
+        if len(self.EssentialMask) > 0:
+            self.count_essential_bits()
         for frame in self.Frames.values():
-            frame.update_stat()
+            if isinstance(frame.mask, FrameWords) and frame.mask.store is self.EssentialMask:
+                frame.update_stat(self.EssentialBits[frame.mask.offset / self.FrameSize])
+            else:
+                frame.update_stat()
             if not frame.stat.Empty:
                 self.stat.UtilizedFrames += 1
             if frame.stat.Type == 0:
@@ -246,6 +392,11 @@ class SuperLogicRegion:
                 current = FarFields.from_FAR(self.FarList[idx], self.Series)
         return res
 
+    def get_essential_bits_of_column(self, column_FAR):
+        if column_FAR in self.ColumnEssentialBits:
+            return self.ColumnEssentialBits[column_FAR]
+        return sum(frame.stat.EssentialBitsCount for frame in self.get_frames_of_column(column_FAR))
+
 
 class DevicePartDetails:
     def __init__(self, name=''):
@@ -318,60 +469,72 @@ class ConfigMemory:
         fragment = self.FragmentDict[self.SLR_ID_LIST[slr_idx]]
         return fragment.get_frames_of_column(column_FAR)
 
+    def get_essential_bits_of_column(self, slr_idx, column_FAR):
+        fragment = self.FragmentDict[self.SLR_ID_LIST[slr_idx]]
+        return fragment.get_essential_bits_of_column(column_FAR)
+
     def load_bitstream(self, fname, filetype=BitfileType.Regular):
+        """Reads the bitstream at once into an array of 32-bit words, packets are located with WordSearch,
+        the frames of each SLR are stored in its frame array (SuperLogicRegion.FrameData), FrameDesc.data is a view on it"""
         self.BitstreamFile = fname
-        FrameSize = FrameSizeDict[self.Series]
-        res = []
         if fname.endswith('.bin'):
-            specificator = '<I'
+            byteorder = 'little'
         elif fname.endswith('.bit'):
-            specificator = '>I'
+            byteorder = 'big'
         else:
             raw_input('bitstream_to_FrameList: Unknown file format')
             return (None)
-        header = []
-        bus_width_detect = 0x0
         with open(fname, 'rb') as f:
-            while bus_width_detect != 0x000000BB11220044:
-                data = f.read(1)
-                header.append(struct.unpack('>c', data)[0])
-                bus_width_detect = ((bus_width_detect << 8) | struct.unpack('>B', data)[0] & 0xFF) & 0xFFFFFFFFFFFFFFFF
-            matchDesc = re.search("Version=([0-9]+.*?[0-9]+.*?[a-zA-Z]+).*?([0-9a-zA-Z\\-]+)", ''.join(header))
-            if matchDesc:
-                self.VivadoVersion = matchDesc.group(1)
-                self.DevicePart = matchDesc.group(2)
-                if not self.DevicePart.startswith('xc'):
-                    self.DevicePart = 'xc'+self.DevicePart
-                self.DeviceDetails = DevicePartDetails(self.DevicePart)
-                print 'Parse bitstream: device part detected: {0:s}'.format(self.DeviceDetails.to_string())
-                self.set_series(self.DeviceDetails.series)
-            else:
-                print "load_bitstream: device part is not found in the bitstream header"
-            bitstream = [0x000000BB, 0x11220044]
-            data = f.read()
-            for i in range(0, len(data), 4):
-                bitstream.append(struct.unpack(specificator, data[i:i+4])[0])
+            raw = f.read()
+        pos = raw.find(BusWidthDetectBytes)
+        if pos < 0:
+            print('load_bitstream: bus width detection pattern not found in {0:s}'.format(fname))
+            return (None)
+        matchDesc = re.search("Version=([0-9]+.*?[0-9]+.*?[a-zA-Z]+).*?([0-9a-zA-Z\\-]+)", raw[:pos+8])
+        if matchDesc:
+            self.VivadoVersion = matchDesc.group(1)
+            self.DevicePart = matchDesc.group(2)
+            if not self.DevicePart.startswith('xc'):
+                self.DevicePart = 'xc'+self.DevicePart
+            self.DeviceDetails = DevicePartDetails(self.DevicePart)
+            print 'Parse bitstream: device part detected: {0:s}'.format(self.DeviceDetails.to_string())
+            self.set_series(self.DeviceDetails.series)
+        else:
+            print "load_bitstream: device part is not found in the bitstream header"
+        body = array(WordType)
+        body.fromstring(raw[pos+8:pos+8+(len(raw)-pos-8)/4*4])
+        raw = None
+        if byteorder != sys.byteorder:
+            body.byteswap()
+        bitstream = array(WordType, SyncSequence[:2])
+        bitstream.extend(body)
+        body = None
+        search = WordSearch(bitstream)
+        end = len(bitstream) - 5
 
         # In a debug bitstream data are written frame by frame with CRC check after each frame
         if filetype == BitfileType.Debug:
-            i=0
-            while i < len(bitstream)-5:
+            #FDRI register: word count = FrameSize (101 or 123 or 93)
+            fdri = 0x30004000 | self.FrameSize
+            i, sync, data = 0, -1, -1
+            while i < end:
+                if sync < i: sync = search.next(SyncSequence, i)
+                if data < i: data = search.next([fdri], i)
+                i = min(sync, data)
+                if i >= end: break
                 #bus width detect, followed by two pad words, and one sync word
-                if [ bitstream[i], bitstream[i+1], bitstream[i+2], bitstream[i+3], bitstream[i+4] ] == [0x000000BB, 0x11220044, 0xFFFFFFFF, 0xFFFFFFFF, 0xAA995566] :
+                if i == sync:
                     #extract Device_ID from ICcode register
                     while(bitstream[i] != 0x30018001): i += 1
                     IDcode = bitstream[i+1]
                     self.SLR_ID_LIST.append(IDcode)
 
-                #FDRI register: word count = FrameSize (101 or 123 or 93)
-                if bitstream[i] == (0x30004000 | self.FrameSize):
+                if bitstream[i] == fdri:
                     #CRC check goes after the frame data
                     if bitstream[i+self.FrameSize+1] == 0x30002001 and bitstream[i+self.FrameSize+3]==0x30000001:
                         #extract FAR and data for the located data frame
                         FAR = bitstream[i+self.FrameSize+2]
-                        frame = FrameDesc(FAR, self.Series, IDcode)
-                        frame.data = bitstream[i+1:i+self.FrameSize+1]
-                        #frame.update_stat()
+                        frame = FrameDesc(FAR, self.Series, IDcode, bitstream[i+1:i+self.FrameSize+1])
                         self.put_frame(frame)
                         i += (self.FrameSize+4)
                     else:
@@ -403,7 +566,8 @@ class ConfigMemory:
                         else:
                             fragment = self.FragmentDict[SLR_ID]
                         fragment.FarList.append(FAR)
-
+                for fragment in self.FragmentDict.values():
+                    fragment.allocate_frames()
             else:
                 print('load_bitstream: FAR list file not found for device part: {0}'.format(self.DevicePart))
                 print('Device layout can be added to DAVOS by running: python DesignParser.py op=addlayout part={0:s}'.format(
@@ -411,8 +575,16 @@ class ConfigMemory:
                 return
             i, FrameIndex, fragment = 0, 0, None
             fragment_found = False
-            while i < len(bitstream)-5:
-                if [ bitstream[i], bitstream[i+1], bitstream[i+2], bitstream[i+3], bitstream[i+4] ] == [0x000000BB, 0x11220044, 0xFFFFFFFF, 0xFFFFFFFF, 0xAA995566] :
+            sync, farcmd = -1, -1
+            while i < end:
+                if sync < i: sync = search.next(SyncSequence, i)
+                if fragment_found:
+                    if farcmd < i: farcmd = search.next([0x30002001], i)
+                    i = min(sync, farcmd)
+                else:
+                    i = sync
+                if i >= end: break
+                if i == sync:
                     #extract Device_ID from ICcode register
                     while(bitstream[i] != 0x30018001): i += 1
                     IDcode = bitstream[i+1]
@@ -424,11 +596,12 @@ class ConfigMemory:
                 if fragment_found and bitstream[i] == 0x30002001:  # write FAR register 1 word
                     i += 1
                     FAR = bitstream[i]
-                    while FrameIndex < len(fragment.FarList) and fragment.FarList[FrameIndex] != FAR:
-                        FrameIndex += 1
+                    try:
+                        FrameIndex = fragment.FarList.index(FAR, FrameIndex)
+                    except ValueError:
+                        FrameIndex = max(FrameIndex, len(fragment.FarList))
                     # look ahead: Command register --> WCFG command (write config data)
-                    while i < len(bitstream) and not (bitstream[i] == 0x30008001 and bitstream[i+1] == 0x00000001) :
-                        i += 1
+                    i = search.next([0x30008001, 0x00000001], i)
                     # look ahead: FDRI register
                     while i < len(bitstream) and (bitstream[i] & 0xFFFFF800 != 0x30004000):
                         i += 1
@@ -441,24 +614,25 @@ class ConfigMemory:
                     i += 1
                     FrameCnt = 0
                     PadIndex = 0
-                    while FrameCnt < (WordCount / self.FrameSize):
-                        if FrameIndex + FrameCnt - PadIndex < len(fragment.FarList):
-                            FAR = fragment.FarList[FrameIndex + FrameCnt - PadIndex]
-                            frame = FrameDesc(FAR, self.Series, IDcode)
-                            frame.data = bitstream[i:i + self.FrameSize]
-                            fragment.Frames[frame.FAR] = frame
+                    FarNum = len(fragment.FarList)
+                    RowBreaks = fragment.get_row_breaks()
+                    Coords = fragment.get_coords()
+                    while FrameCnt < (WordCount / self.FrameSize) and i + self.FrameSize <= len(bitstream):
+                        idx = FrameIndex + FrameCnt - PadIndex
+                        if idx < FarNum:
+                            fragment.FrameData[idx*self.FrameSize:(idx+1)*self.FrameSize] = bitstream[i:i+self.FrameSize]
+                            FAR = fragment.FarList[idx]
+                            fragment.Frames[FAR] = FrameDesc(FAR, self.Series, IDcode, fragment.frame_view(idx), Coords[idx])
                         else:
-                            print("load_bitstream: Skipping extra (pad) frames idx: {0:d}".format(FrameIndex+FrameCnt-PadIndex))
+                            print("load_bitstream: Skipping extra (pad) frames idx: {0:d}".format(idx))
                             fragment_found = False
                         i += self.FrameSize
                         FrameCnt += 1
-                        if FrameIndex+FrameCnt-PadIndex < len(fragment.FarList)-1:
-                            f1 = FarFields.from_FAR(fragment.FarList[FrameIndex+FrameCnt-PadIndex], self.Series)
-                            f2 = FarFields.from_FAR(fragment.FarList[FrameIndex+FrameCnt-PadIndex+1], self.Series)
-                            if (f1.Row != f2.Row) or (f1.Top != f2.Top):
-                                PadIndex += 2
-                                FrameCnt += 2
-                                i += self.FrameSize * 2
+                        # two pad frames between clock rows
+                        if idx+1 < FarNum-1 and RowBreaks[idx+1]:
+                            PadIndex += 2
+                            FrameCnt += 2
+                            i += self.FrameSize * 2
                     FrameIndex += (FrameCnt - PadIndex)
                     fragment_found = False
                 else:
@@ -466,8 +640,9 @@ class ConfigMemory:
         self.update_stat()
         for id in self.SLR_ID_LIST:
             fragment = self.FragmentDict[id]
+            coords = fragment.get_coords()
             for far in range(len(fragment.FarList)):
-                f = FarFields.from_FAR(fragment.FarList[far], self.Series)
+                f = coords[far]
                 if (f.Top == 0) and (f.Row >= fragment.layout.TopRows):
                     fragment.layout.TopRows = f.Row+1
                 elif (f.Top == 1) and (f.Row >= fragment.layout.BottomRows):
@@ -480,7 +655,7 @@ class ConfigMemory:
                     fragment.layout.RowHeight = 60
                 
             for i in range(len(fragment.FarList)-1):
-                x1, x2 = FarFields.from_FAR(fragment.FarList[i], self.Series), FarFields.from_FAR(fragment.FarList[i+1], self.Series)
+                x1, x2 = coords[i], coords[i+1]
                 if x1.Major != x2.Major:
                     desc = ConfColumnDescriptor(id, x1.BlockType, x1.Top, x1.Row, x1.Major, x1.Minor+1, 'UNKNOWN')
                     if self.Series == FPGASeries.USP:
@@ -507,37 +682,43 @@ class ConfigMemory:
             print("load_essential_bits: invalid slr_id: {0:08x}".format(slr_id))
             return
         fragment = self.FragmentDict[slr_id]
-        header_parsed = False
-        words = []
         with open(filename, 'r') as f:
-            for line in f:
-                if not header_parsed:
-                    buf = re.findall("Part:\s*?([0-9a-zA-Z\\-]+)", line)
-                    if len(buf) > 0:
-                        self.DevicePart = buf[0]
-                        continue
-                    buf = re.findall("Bits:\s*?([0-9]+)", line)
-                    if len(buf) > 0:
-                        wordnum = int(buf[0]) / 32
-                        header_parsed = True
-                        continue
-                else:
-                    words.append(int(line, 2))
+            content = f.read()
+        header = re.search("Bits:\s*?([0-9]+)", content)
+        if header is None:
+            print("load_essential_bits: no header found in {0:s}".format(filename))
+            return
+        buf = re.findall("Part:\s*?([0-9a-zA-Z\\-]+)", content[:header.start()])
+        if len(buf) > 0:
+            self.DevicePart = buf[0]
+        words = parse_ascii_words(content[header.end():])
         if self.Series == FPGASeries.S7:
             w = self.FrameSize
         elif self.Series == FPGASeries.USP:
             w = self.FrameSize+25
-        for frame_id in range(fragment.stat.Type0Frames):
-            frame = fragment.get_frame_by_index(frame_id)
+        #copy the words of Type-0 frames clock row by clock row, skipping two pad frames between clock rows
+        FS, FrameNum = self.FrameSize, min(fragment.stat.Type0Frames, len(fragment.FarList))
+        store = array(WordType, [0]) * (len(fragment.FarList) * FS)
+        breaks = fragment.get_row_breaks()
+        head = 0
+        for frame_id in range(FrameNum):
+            if breaks[frame_id] or frame_id == FrameNum-1:
+                chunk = words[w:w + (frame_id+1-head)*FS]
+                store[head*FS:head*FS + len(chunk)] = chunk
+                w += (frame_id+1-head)*FS + (FS*2 if breaks[frame_id] else 0)
+                head = frame_id+1
+        if file_type == FileTypes.EBC:
+            fragment.EssentialData = store
+        elif file_type == FileTypes.EBD:
+            fragment.EssentialMask = store
+        for frame_id in range(FrameNum):
+            frame = fragment.Frames.get(fragment.FarList[frame_id], None)
+            if frame is None:
+                continue
             if file_type == FileTypes.EBC:
-                frame.ebc_data = words[w:w+self.FrameSize]
+                frame.ebc_data = FrameWords(store, frame_id*FS, FS)
             elif file_type == FileTypes.EBD:
-                frame.mask = words[w:w+self.FrameSize]
-            w += self.FrameSize
-            #skip pad frame between clock rows
-            next_frame = fragment.get_frame_by_index(frame_id+1)
-            if (frame.coord.Row != next_frame.coord.Row) or (frame.coord.Top != next_frame.coord.Top):
-                w += self.FrameSize * 2
+                frame.mask = FrameWords(store, frame_id*FS, FS)
         print('Essential bits loaded: {0:s} into SLR: {1:08x}'.format(filename, slr_id))        
 
 
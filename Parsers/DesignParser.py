@@ -24,6 +24,10 @@ DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__fil
 sys.path.insert(1, DAVOSPATH)
 import Davos_Generic
 import pickle
+import cPickle
+import hashlib
+import mmap
+import gc
 
 
 class VivadoDesignModel:
@@ -160,8 +164,8 @@ class VivadoDesignModel:
                 proc = subprocess.Popen(script, stdin=subprocess.PIPE, stdout=logfile, stderr=errfile, shell=True)
                 proc.wait()
 
-    def getFarList_for_Pblock(self, X1, Y1, X2, Y2):
-        res = []
+    def get_columns_for_Pblock(self, X1, Y1, X2, Y2):
+        """(SLR config index, FAR of the first frame) of the configuration columns covering the Pblock"""
         columns = set()
         for x in range(X1, X2+1):
             for y in range(Y1, Y2+1):
@@ -195,10 +199,17 @@ class VivadoDesignModel:
                     #add major frame of the RighhandResource column
                     if maj_frame+1 < slr.fragment.layout.Columns:
                         columns.add((slr.config_index, FarFields(self.series, 0, Top, Row, maj_frame+1, 0).get_far() ))
-        for i in sorted(list(columns), key=lambda x: (x[0], x[1])):
+        return sorted(list(columns), key=lambda x: (x[0], x[1]))
+
+    def getFarList_for_Pblock(self, X1, Y1, X2, Y2):
+        res = []
+        for i in self.get_columns_for_Pblock(X1, Y1, X2, Y2):
             res += self.CM.get_frames_of_column(i[0], i[1])
         return res
 
+    def get_essential_bits_for_Pblock(self, X1, Y1, X2, Y2):
+        return sum(self.CM.get_essential_bits_of_column(i[0], i[1]) for i in self.get_columns_for_Pblock(X1, Y1, X2, Y2))
+
 
     #tileX to localize column
     #tileY to localize slr, top, row, word offset
@@ -381,12 +392,326 @@ class VivadoDesignModel:
                 self.CM.load_essential_bits(self.files['EBD'][i], FileTypes.EBD, self.CM.SLR_ID_LIST[i])
         self.CM.print_stat()
         self.CM.log(os.path.join(self.generatedFilesDir, 'bitlog.txt'), True, True, True, True)
+        self.link_config_memory()
+
+    def link_config_memory(self):
         for slr_idx, slr in self.dev_layout.slr_by_config_index.iteritems():
             slr.ID = self.CM.SLR_ID_LIST[slr_idx]
             slr.fragment = self.CM.FragmentDict[slr.ID]
             print('SLR layout index = {0:d} : config index = {1:d} : chip id = {2:08x}'.format(slr.layout_index, slr.config_index, slr.fragment.SLR_ID))
 
 
+class DesignModelCache:
+    """Versioned on-disk cache of the design model (VivadoDesignModel.initialize): device layout, netlist cells with their bitmaps,
+    configuration frames and essential bits, stored as columns (arrays and string tables) in one binary file per configuration.
+    File: magic, header length, header (cPickle: small items and section table), sections (raw arrays, 8-byte aligned),
+    sections are read from a memory map of the file.
+    The key combines Version, the signatures (path, size, mtime) of the source files (bitstream, EBC/EBD, LL, CELLS, layout, FAR list)
+    and the hash of the parser modules: the model is rebuilt from the sources whenever any of them changes.
+    Usage: cache = DesignModelCache(design, config_items); if not cache.load(design): design.initialize(...); cache.store(design)
+    """
+    CacheDir = 'DesignCache'
+    Magic = 'DAVOSDMC'
+    Version = 1
+    CellClasses = [NetlistCellDescriptor, LutCellDescritor, RegCellDescriptor, BramCellDescriptor, LutramCellDescriptor]
+
+    def __init__(self, design, config_items):
+        self.cache_dir = os.path.join(design.generatedFilesDir, DesignModelCache.CacheDir)
+        self.config = str(config_items)
+        self.fname = os.path.join(self.cache_dir, 'design_{0:s}.cache'.format(hashlib.md5(self.config).hexdigest()))
+        self.sections, self.table, self.mm, self.base = [], {}, None, 0
+
+    @staticmethod
+    def get_key(design):
+        digest = hashlib.md5('{0:d}:{1:s}'.format(DesignModelCache.Version, design.DevicePart))
+        devsupport_dir = os.path.join(DAVOSPATH, 'Parsers', 'DeviceSupport')
+        sources = sorted(set(fname for fileset in design.files.values() for fname in fileset))
+        sources += sorted(glob.glob('{0:s}/LAYOUT*{1:s}*.xml'.format(devsupport_dir, design.DevicePart)))
+        sources += sorted(glob.glob('{0:s}/FARLIST*{1:s}*.txt'.format(devsupport_dir, design.DevicePart)))
+        for fname in sources:
+            if not os.path.exists(fname):
+                return None
+            st = os.stat(fname)
+            digest.update('{0:s}:{1:d}:{2:s}\0'.format(fname, st.st_size, repr(st.st_mtime)))
+        for module in ['BitstreamParser.py', 'NetlistModel.py', 'DesignParser.py']:
+            with open(os.path.join(DAVOSPATH, 'Parsers', module), 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def put_array(self, name, data):
+        self.sections.append((name, data.typecode, len(data), data.tostring()))
+
+    def put_strings(self, name, items):
+        self.sections.append((name, 's', len(items), '\0'.join(items)))
+
+    def get_array(self, name):
+        offset, typecode, count, size = self.table[name]
+        res = array(typecode)
+        if res.itemsize * count != size:
+            raise ValueError('DesignModelCache: item size mismatch in section {0:s}'.format(name))
+        res.fromstring(self.mm[self.base+offset:self.base+offset+size])
+        return res
+
+    def get_strings(self, name):
+        offset, typecode, count, size = self.table[name]
+        return self.mm[self.base+offset:self.base+offset+size].split('\0') if count > 0 else []
+
+    def put_layout(self, layout):
+        slrs = sorted(layout.slr_by_layout_index.values(), key=lambda s: s.layout_index)
+        meta = {'part': layout.part, 'cr_height': layout.cr_height, 'clb_column_dict': layout.clb_column_dict,
+                'slrs': [(s.Name, s.layout_index, s.config_index, s.TileYmin, s.TileYmax, s.SwBoxDict) for s in slrs],
+                'regions': [], 'tile_types': [], 'slice_types': []}
+        tile_types, slice_types, slice_index = {}, {}, {}
+        t_region, t_x, t_y, t_type, t_column, t_offset, t_has_offset, t_name = [array('l') for i in range(7)] + [[]]
+        s_tile, s_x, s_y, s_type, s_offset, s_name = [array('l') for i in range(5)] + [[]]
+        for slr_pos in range(len(slrs)):
+            for cr in slrs[slr_pos].ClockRegionDict.values():
+                meta['regions'].append((slr_pos, cr.Name, cr.X, cr.Y, cr.TileYmin, cr.TileYmax))
+                for tile in cr.TileDict.values():
+                    if tile.Type not in tile_types:
+                        tile_types[tile.Type] = len(meta['tile_types'])
+                        meta['tile_types'].append(tile.Type)
+                    t_region.append(len(meta['regions'])-1)
+                    t_x.append(tile.X)
+                    t_y.append(tile.Y)
+                    t_type.append(tile_types[tile.Type])
+                    t_column.append(tile.Column)
+                    t_offset.append(getattr(tile, 'Offset', 0))
+                    t_has_offset.append(1 if hasattr(tile, 'Offset') else 0)
+                    t_name.append(tile.Name)
+                    for s in tile.SliceDict.values():
+                        if s.Type not in slice_types:
+                            slice_types[s.Type] = len(meta['slice_types'])
+                            meta['slice_types'].append(s.Type)
+                        slice_index[id(s)] = len(s_name)
+                        s_tile.append(len(t_name)-1)
+                        s_x.append(s.X)
+                        s_y.append(s.Y)
+                        s_type.append(slice_types[s.Type])
+                        s_offset.append(s.Offset)
+                        s_name.append(s.Name)
+        for name, data in zip(['tile_region', 'tile_x', 'tile_y', 'tile_type', 'tile_column', 'tile_offset', 'tile_has_offset',
+                               'slice_tile', 'slice_x', 'slice_y', 'slice_type', 'slice_offset'],
+                              [t_region, t_x, t_y, t_type, t_column, t_offset, t_has_offset, s_tile, s_x, s_y, s_type, s_offset]):
+            self.put_array(name, data)
+        self.put_strings('tile_name', t_name)
+        self.put_strings('slice_name', s_name)
+        return meta, slice_index
+
+    def get_layout(self, meta):
+        layout = DevLayout(None)
+        layout.part, layout.cr_height, layout.clb_column_dict = meta['part'], meta['cr_height'], meta['clb_column_dict']
+        slrs, regions, tiles, slices = [], [], [], []
+        for Name, layout_index, config_index, TileYmin, TileYmax, SwBoxDict in meta['slrs']:
+            slr = DevSRL(None)
+            slr.Name, slr.layout_index, slr.config_index = Name, layout_index, config_index
+            slr.TileYmin, slr.TileYmax, slr.SwBoxDict = TileYmin, TileYmax, SwBoxDict
+            layout.slr_by_config_index[config_index] = slr
+            layout.slr_by_layout_index[layout_index] = slr
+            slrs.append(slr)
+        for slr_pos, Name, X, Y, TileYmin, TileYmax in meta['regions']:
+            cr = DevClockRegion(None)
+            cr.Name, cr.X, cr.Y, cr.TileYmin, cr.TileYmax = Name, X, Y, TileYmin, TileYmax
+            slrs[slr_pos].ClockRegionDict[(cr.X, cr.Y)] = cr
+            regions.append(cr)
+        t_region, t_x, t_y, t_type, t_column, t_offset, t_has_offset = [self.get_array(name) for name in [
+            'tile_region', 'tile_x', 'tile_y', 'tile_type', 'tile_column', 'tile_offset', 'tile_has_offset']]
+        for i, Name in enumerate(self.get_strings('tile_name')):
+            tile = DevTile(None)
+            tile.Name, tile.X, tile.Y, tile.Type, tile.Column = Name, t_x[i], t_y[i], meta['tile_types'][t_type[i]], t_column[i]
+            if t_has_offset[i]:
+                tile.Offset = t_offset[i]
+            tile.ClockRegion = regions[t_region[i]]
+            tile.ClockRegion.TileDict[tile.X, tile.Y, tile.Type] = tile
+            tiles.append(tile)
+        s_tile, s_x, s_y, s_type, s_offset = [self.get_array(name) for name in [
+            'slice_tile', 'slice_x', 'slice_y', 'slice_type', 'slice_offset']]
+        for i, Name in enumerate(self.get_strings('slice_name')):
+            s = DevSlice(None)
+            s.Name, s.X, s.Y, s.Type, s.Offset = Name, s_x[i], s_y[i], meta['slice_types'][s_type[i]], s_offset[i]
+            s.Tile = tiles[s_tile[i]]
+            s.Tile.SliceDict[s.X, s.Y, s.Type] = s
+            layout.slice_by_coord_dict[s.X, s.Y, s.Type] = s
+            layout.slice_by_name_dict[s.Name] = s
+            slices.append(s)
+        return layout, slices
+
+    def put_netlist(self, netlist, slice_index):
+        c_group, c_class, c_slice = array('b'), array('b'), array('l')
+        c_name, c_celltype, c_beltype, c_label, c_connections, c_init = [], [], [], [], [], []
+        b_cell, b_key, b_far, b_word, b_bit, b_ecc = array('l'), array('l'), array(WordType), array('l'), array('l'), array('b')
+        for group in sorted(netlist.CellsDict.keys()):
+            for cell in netlist.CellsDict[group]:
+                c_group.append(cell.group)
+                c_class.append(DesignModelCache.CellClasses.index(type(cell)))
+                c_slice.append(slice_index[id(cell.slice)] if cell.slice is not None else -1)
+                c_name.append(cell.name)
+                c_celltype.append(cell.celltype)
+                c_beltype.append(cell.beltype)
+                c_label.append(cell.label)
+                c_connections.append(' '.join('{0:s}:{1:s}'.format(k, v) for k, v in cell.connections.iteritems()))
+                c_init.append('{0:x}'.format(cell.init) if hasattr(cell, 'init') else '')
+                for ecc, bitmap in [(0, cell.bitmap), (1, getattr(cell, 'bitmap_ecc', {}))]:
+                    for key, (FAR, word, bit) in bitmap.iteritems():
+                        b_cell.append(len(c_name)-1)
+                        b_key.append(key)
+                        b_far.append(FAR)
+                        b_word.append(word)
+                        b_bit.append(bit)
+                        b_ecc.append(ecc)
+        for name, data in zip(['cell_group', 'cell_class', 'cell_slice', 'bit_cell', 'bit_key', 'bit_far', 'bit_word', 'bit_bit', 'bit_ecc'],
+                              [c_group, c_class, c_slice, b_cell, b_key, b_far, b_word, b_bit, b_ecc]):
+            self.put_array(name, data)
+        for name, data in zip(['cell_name', 'cell_celltype', 'cell_beltype', 'cell_label', 'cell_connections', 'cell_init'],
+                              [c_name, c_celltype, c_beltype, c_label, c_connections, c_init]):
+            self.put_strings(name, data)
+
+    def get_netlist(self, slices):
+        netlist = Netlist()
+        c_group, c_class, c_slice = [self.get_array(name) for name in ['cell_group', 'cell_class', 'cell_slice']]
+        c_celltype, c_beltype, c_label, c_connections, c_init = [self.get_strings(name) for name in [
+            'cell_celltype', 'cell_beltype', 'cell_label', 'cell_connections', 'cell_init']]
+        cells = []
+        for i, name in enumerate(self.get_strings('cell_name')):
+            cell = DesignModelCache.CellClasses[c_class[i]](name, c_group[i])
+            cell.celltype, cell.beltype, cell.label = c_celltype[i], c_beltype[i], c_label[i]
+            cell.slice = slices[c_slice[i]] if c_slice[i] >= 0 else None
+            if c_connections[i] != '':
+                cell.connections = dict(c.split(':') for c in c_connections[i].split(' '))
+            if c_init[i] != '':
+                cell.init = int(c_init[i], 16)
+            netlist.CellsDict[cell.group].append(cell)
+            cells.append(cell)
+        b_cell, b_key, b_far, b_word, b_bit, b_ecc = [self.get_array(name) for name in [
+            'bit_cell', 'bit_key', 'bit_far', 'bit_word', 'bit_bit', 'bit_ecc']]
+        for i in range(len(b_cell)):
+            cell = cells[b_cell[i]]
+            (cell.bitmap_ecc if b_ecc[i] else cell.bitmap)[b_key[i]] = (b_far[i], b_word[i], b_bit[i])
+        netlist.update_statistics()
+        return netlist
+
+    def put_frames(self, fragment, attr, flags, flag):
+        """frames x words array of a frame attribute (data, mask, ebc_data), flag set for the frames that have it"""
+        FS = fragment.FrameSize
+        res = array(WordType, [0]) * (len(fragment.FarList) * FS)
+        for idx, FAR in enumerate(fragment.FarList):
+            words = getattr(fragment.Frames[FAR], attr) if FAR in fragment.Frames else []
+            if len(words) == FS:
+                res[idx*FS:(idx+1)*FS] = words.store[words.offset:words.offset+FS] if isinstance(words, FrameWords) else array(WordType, words)
+                flags[idx] |= flag
+        return res
+
+    def put_config_memory(self, CM):
+        meta = {'Series': CM.Series, 'DevicePart': CM.DevicePart, 'VivadoVersion': CM.VivadoVersion,
+                'BitstreamFile': CM.BitstreamFile, 'SLR_ID_LIST': CM.SLR_ID_LIST, 'DeviceDetails': CM.DeviceDetails,
+                'fragments': []}
+        for SLR_ID, fragment in CM.FragmentDict.iteritems():
+            k = len(meta['fragments'])
+            meta['fragments'].append((SLR_ID, fragment.layout, fragment.Empty))
+            flags = array('B', [0]) * len(fragment.FarList)
+            for attr, flag in [('data', 1), ('mask', 2), ('ebc_data', 4)]:
+                self.put_array('{0:s}_{1:d}'.format(attr, k), self.put_frames(fragment, attr, flags, flag))
+            self.put_array('far_{0:d}'.format(k), array(WordType, fragment.FarList))
+            self.put_array('flags_{0:d}'.format(k), flags)
+        return meta
+
+    def get_config_memory(self, meta):
+        CM = ConfigMemory(meta['Series'])
+        CM.DevicePart, CM.VivadoVersion, CM.BitstreamFile = meta['DevicePart'], meta['VivadoVersion'], meta['BitstreamFile']
+        CM.SLR_ID_LIST, CM.DeviceDetails = meta['SLR_ID_LIST'], meta['DeviceDetails']
+        for k, (SLR_ID, layout, Empty) in enumerate(meta['fragments']):
+            fragment = SuperLogicRegion(SLR_ID, CM.Series)
+            fragment.layout, fragment.Empty = layout, Empty
+            fragment.FarList = self.get_array('far_{0:d}'.format(k)).tolist()
+            fragment.FrameData = self.get_array('data_{0:d}'.format(k))
+            mask, ebc, flags = [self.get_array('{0:s}_{1:d}'.format(attr, k)) for attr in ['mask', 'ebc_data', 'flags']]
+            if any(f & 0x2 for f in flags):
+                fragment.EssentialMask = mask
+            if any(f & 0x4 for f in flags):
+                fragment.EssentialData = ebc
+            FS, coords = fragment.FrameSize, fragment.get_coords()
+            for idx, FAR in enumerate(fragment.FarList):
+                if flags[idx] & 0x1:
+                    frame = FrameDesc(FAR, CM.Series, SLR_ID, fragment.frame_view(idx), coords[idx])
+                    if flags[idx] & 0x2:
+                        frame.mask = FrameWords(mask, idx*FS, FS)
+                    if flags[idx] & 0x4:
+                        frame.ebc_data = FrameWords(ebc, idx*FS, FS)
+                    fragment.Frames[FAR] = frame
+            CM.FragmentDict[SLR_ID] = fragment
+        return CM
+
+    def store(self, design):
+        """Stores the model of the initialized design (atomic replace)"""
+        key = DesignModelCache.get_key(design)
+        if key is None:
+            return
+        start_time = time.time()
+        self.sections = []
+        layout_meta, slice_index = self.put_layout(design.dev_layout)
+        self.put_netlist(design.netlist, slice_index)
+        meta = {'layout': layout_meta, 'CM': self.put_config_memory(design.CM)}
+        offset, table = 0, {}
+        for name, typecode, count, buf in self.sections:
+            table[name] = (offset, typecode, count, len(buf))
+            offset += (len(buf) + 7) & ~7
+        header = cPickle.dumps({'Version': DesignModelCache.Version, 'key': key, 'config': self.config,
+                                'meta': meta, 'sections': table}, cPickle.HIGHEST_PROTOCOL)
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        tmpname = '{0:s}.{1:d}.tmp'.format(self.fname, os.getpid())
+        with open(tmpname, 'wb') as f:
+            f.write(DesignModelCache.Magic + struct.pack('<I', len(header)) + header)
+            f.write('\0' * (-f.tell() % 8))
+            for name, typecode, count, buf in self.sections:
+                f.write(buf + '\0' * (-len(buf) % 8))
+        if os.path.exists(self.fname):
+            os.remove(self.fname)
+        os.rename(tmpname, self.fname)
+        self.sections = []
+        print('Design model cached in {0:.1f} seconds: {1:s}'.format(time.time() - start_time, self.fname))
+
+    def load(self, design):
+        """Restores the design model (layout, netlist, CM) into design, returns False if not cached or outdated"""
+        if not os.path.exists(self.fname) or not design.check_preconditions():
+            return False
+        start_time = time.time()
+        #object graph is rebuilt in bulk: cyclic GC passes over the growing heap would dominate the load time
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self.fname, 'rb') as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if self.mm[:len(DesignModelCache.Magic)] != DesignModelCache.Magic:
+                    return False
+                pos = len(DesignModelCache.Magic)
+                size = struct.unpack('<I', self.mm[pos:pos+4])[0]
+                header = cPickle.loads(self.mm[pos+4:pos+4+size])
+                if header['Version'] != DesignModelCache.Version or header['key'] != DesignModelCache.get_key(design):
+                    print('Design model cache outdated: {0:s}'.format(self.fname))
+                    return False
+                self.table, self.base = header['sections'], (pos + 4 + size + 7) & ~7
+                layout, slices = self.get_layout(header['meta']['layout'])
+                netlist = self.get_netlist(slices)
+                CM = self.get_config_memory(header['meta']['CM'])
+            finally:
+                self.mm.close()
+                self.mm = None
+        except Exception as e:
+            print('Design model cache {0:s} not loaded: {1:s}'.format(self.fname, str(e)))
+            return False
+        finally:
+            if gc_enabled:
+                gc.enable()
+        design.dev_layout, design.netlist, design.CM = layout, netlist, CM
+        design.CM.print_stat()
+        design.link_config_memory()
+        print('Loaded cached design model from {0:s} in {1:.1f} seconds, config = {2:s}'.format(
+            self.fname, time.time() - start_time, self.config))
+        return True
+
+
 def compare_bitfiles(bitfile_list, pb, resfilename):
     targetDir = '/'.join(bitfile_list[0].split('/')[:-1])
     CM = ConfigMemory()
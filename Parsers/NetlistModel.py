@@ -113,7 +113,8 @@ class DevSRL:
         self.SwBoxDict = {}
         self.TileYmin, self.TileYmax = 0, 0
         self.build_from_xml(xmltag)
-        self.get_TileY_range()
+        if len(self.ClockRegionDict) > 0:
+            self.get_TileY_range()
 
     def build_from_xml(self, xmltag):
         if xmltag != None:
@@ -148,8 +149,10 @@ class DevLayout:
         self.slice_by_name_dict = {}
         self.clb_column_dict = {} #TileX -> [sliceX]
         self.build_from_xml(xmltag)
-        cr = self.slr_by_layout_index[0].ClockRegionDict.values()[0]
-        self.cr_height = cr.TileYmax - cr.TileYmin + 1
+        self.cr_height = 0
+        if len(self.slr_by_layout_index) > 0:
+            cr = self.slr_by_layout_index[0].ClockRegionDict.values()[0]
+            self.cr_height = cr.TileYmax - cr.TileYmin + 1
 
     def build_from_xml(self, xmltag):
         if xmltag != None:
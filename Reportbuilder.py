@@ -44,6 +44,8 @@ def build_report(config, toolconf, datamodel, short=False):
     copy_all_files(os.path.join(config.call_dir,'UserInterface/SBFI'), config.report_dir)
     copy_all_files(os.path.join(config.call_dir,'UserInterface/libs'), os.path.join(config.report_dir, 'libs'))
     shutil.copy(os.path.join(config.call_dir, config.file), os.path.join(config.report_dir, 'config.xml'))
+    #reader of binary result packs (RESPACK_*.trp) used by dumptrace.py
+    shutil.copy(os.path.join(config.call_dir, 'ResultPack.py'), config.report_dir)
     build_querypage(config, toolconf, datamodel)
     if not short:
         compute_stat(config, toolconf, datamodel)
@@ -98,27 +100,40 @@ def compute_stat(config, toolconf, datamodel):
     failuremodes = datamodel.dbhelper.get_distinct('FailureMode', 'Injections', True)
     macrocells = datamodel.dbhelper.get_distinct('Macrocell', 'Targets', True)
     if '' in failuremodes: failuremodes.remove('')
+    failuremodes = [str(c) for c in failuremodes]
+    model_labels = dict((c[0], str(c[1])) for c in datamodel.dbhelper.execute_for_result('SELECT ID, Label FROM Models', None))
+    target_cells = dict((c[0], str(c[1])) for c in datamodel.dbhelper.execute_for_result('SELECT ID, Macrocell FROM Targets', None))
+    # Single pass over the Injections_Stat index, groups are merged by (model label, macrocell, fault model):
+    # entry = [counts per failure mode (Status != E), sum of latencies (Status != E), count of Status H, count of Status E]
+    stat = dict()
+    query = """ SELECT ModelID, TargetID, FaultModel, FailureMode, Status, COUNT(*), SUM(FaultToFailureLatency)
+                FROM Injections
+                GROUP BY ModelID, TargetID, FaultModel, FailureMode, Status
+            """
+    for model_id, target_id, fault_model, failure_mode, status, count, latency in datamodel.dbhelper.execute_for_result(query, None):
+        if model_id not in model_labels or target_id not in target_cells: continue
+        key = (model_labels[model_id], target_cells[target_id], str(fault_model))
+        entry = stat.get(key)
+        if entry is None:
+            entry = stat[key] = [dict(), float(0), 0, 0]
+        if status == 'E':
+            entry[3] += count
+        elif str(failure_mode) in failuremodes:
+            entry[0][str(failure_mode)] = entry[0].get(str(failure_mode), 0) + count
+            entry[1] += float(latency)
+        if status == 'H':
+            entry[2] += count
+
     for hm in datamodel.HdlModel_lst:
         injection_stat = dict()
         for mc in macrocells:
             for fault_model in faultmodels:
-                fmodestat = dict()
-                total = float(0)
-                latency = float(0)
-                for failure_mode in failuremodes:
-                    query = """ SELECT COUNT(*), SUM(I.FaultToFailureLatency)
-                                FROM Injections I
-                                JOIN Models M ON I.ModelID = M.ID
-                                JOIN Targets T ON I.TargetID = T.ID
-                                WHERE I.Status != \"E\" AND M.Label = \"{0}\" AND T.Macrocell = \"{1}\" AND I.FaultModel = \"{2}\" AND I.FailureMode = \"{3}\" 
-                            """.format(hm.Label, str(mc), str(fault_model), str(failure_mode))
-                    val = datamodel.dbhelper.execute_for_result(query, None)
-                    if val:
-                        if int(val[0][0]) > 0:
-                            fmodestat['Abs_'+str(failure_mode)] = int(val[0][0])
-                            total += float(val[0][0])
-                            latency += float(val[0][1])
+                entry = stat.get((str(hm.Label), str(mc), str(fault_model)))
+                if entry is None: continue
+                fmodestat = dict(('Abs_'+k, v) for k, v in entry[0].items() if v > 0)
                 if len(fmodestat.keys()) > 0:
+                    total = float(sum(fmodestat.values()))
+                    latency = entry[1]
                     keys = fmodestat.keys()
                     abs_failures = 0
                     if 'Abs_C' in fmodestat: abs_failures += fmodestat['Abs_C']
@@ -133,10 +148,8 @@ def compute_stat(config, toolconf, datamodel):
                         stat_mc = dict()
                         injection_stat[str(mc)] = stat_mc
                     stat_mc[str(fault_model)] = fmodestat
-                val = datamodel.dbhelper.execute_for_result("SELECT COUNT(*) FROM Injections I JOIN Models M ON I.ModelID = M.ID JOIN Targets T ON I.TargetID = T.ID WHERE I.Status = \"H\" AND M.Label = \"{0}\" AND T.Macrocell = \"{1}\" AND I.FaultModel = \"{2}\" ".format(hm.Label, str(mc), str(fault_model)), None)
-                fmodestat['Model_Hang'] = int(val[0][0])
-                val = datamodel.dbhelper.execute_for_result("SELECT COUNT(*) FROM Injections I JOIN Models M ON I.ModelID = M.ID JOIN Targets T ON I.TargetID = T.ID WHERE I.Status = \"E\" AND M.Label = \"{0}\" AND T.Macrocell = \"{1}\" AND I.FaultModel = \"{2}\" ".format(hm.Label, str(mc), str(fault_model)), None)
-                fmodestat['Incomplete_Absent_Dumps'] = int(val[0][0])
+                    fmodestat['Model_Hang'] = entry[2]
+                    fmodestat['Incomplete_Absent_Dumps'] = entry[3]
         hm.Metrics['Injectionstat'] = injection_stat
     datamodel.SaveHdlModels()
 
@@ -0,0 +1,337 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Binary result package of SBFI experiments (*.trp): replaces per-experiment copies of dumps and their ZIP archive
+#       Traces are delta-encoded (line level) against the reference trace and compressed by chunks,
+#       single traces are read by experiment ID or by name through the random-access index, without extraction
+#       Self-contained (standard library only): also imported by the web interface (UserInterface/SBFI/dumptrace.py)
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import os
+import struct
+import zlib
+import threading
+import zipfile
+from io import BytesIO
+
+
+# File layout:
+#   header:  Magic, version
+#   chunks:  'CHNK', compressed length, raw length, zlib(records)
+#            record = kind, ID, name length, data length, name, data
+#   index:   'INDX', number of chunks, number of items, chunk table, item table
+#   footer:  offset of index, EndMagic
+# The index is rewritten on close, if it is missing (writer interrupted) it is rebuilt by scanning the chunks
+class TraceRecordKinds:
+    RAW, DELTA, REF = range(3)
+
+
+def delta_encode(ref_lines, ref_map, text):
+    """Encodes text as a sequence of operations over the reference lines:
+    'C' - copy a run of reference lines (start, count), 'L' - literal text
+    ref_map: line -> index of its first occurrence in ref_lines"""
+    ops, literal = [], []
+    start, count = 0, 0
+    for l in text.splitlines(True):
+        if count > 0 and start + count < len(ref_lines) and ref_lines[start + count] == l:
+            count += 1
+            continue
+        if count > 0:
+            ops.append('C' + struct.pack('<II', start, count))
+            count = 0
+        p = ref_map.get(l)
+        if p is None:
+            literal.append(l)
+        else:
+            if len(literal) > 0:
+                s = ''.join(literal)
+                ops.append('L' + struct.pack('<I', len(s)) + s)
+                literal = []
+            start, count = p, 1
+    if count > 0:
+        ops.append('C' + struct.pack('<II', start, count))
+    if len(literal) > 0:
+        s = ''.join(literal)
+        ops.append('L' + struct.pack('<I', len(s)) + s)
+    return ''.join(ops)
+
+
+def delta_decode(ref_lines, data):
+    res, pos = [], 0
+    while pos < len(data):
+        op = data[pos]
+        if op == 'C':
+            start, count = struct.unpack_from('<II', data, pos + 1)
+            res.extend(ref_lines[start:start + count])
+            pos += 9
+        else:
+            size = struct.unpack_from('<I', data, pos + 1)[0]
+            res.append(data[pos + 5:pos + 5 + size])
+            pos += 5 + size
+    return ''.join(res)
+
+
+class TracePack:
+    """Binary archive of injection traces (see file layout above)
+
+    mode: 'r' - read, 'w' - create (truncates), 'a' - append to existing pack (created if missing)
+    Writing: set_reference(name, filename), add_trace(ID, name, filename), add_member(name, filename),
+             content can be given instead of filename: add_trace(ID, name, data=text)
+    Reading: read_trace(ID), read(name), open(name) / namelist() / close() as in zipfile.ZipFile
+    Records are buffered and compressed by chunks of chunk_size bytes, reading a record decompresses only its chunk
+    """
+    Magic = 'DAVOSTRP'
+    EndMagic = 'DAVOSEND'
+    Version = 1
+    RecordHeader = struct.Struct('<BqII')
+    ChunkHeader = struct.Struct('<4sII')
+    ChunkEntry = struct.Struct('<QII')
+    IndexEntry = struct.Struct('<BqIIIH')
+    Footer = struct.Struct('<Q8s')
+
+    def __init__(self, filename, mode='r', chunk_size=1024*1024, level=6):
+        self.filename = filename
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.level = level
+        self.lock = threading.RLock()
+        self.chunks = []        #(file offset, compressed length, raw length)
+        self.items = dict()     #name -> (kind, ID, chunk index, offset in chunk, length)
+        self.ids = dict()       #experiment ID -> name
+        self.reference_name = None
+        self.base = None        #reference record (chunk index, offset in chunk, length)
+        self.ref_lines, self.ref_map = None, None
+        self.pending, self.pending_size = [], 0
+        self.cache = (None, None)   #last decompressed chunk: (index, data)
+        if mode == 'w' or (mode == 'a' and not os.path.exists(filename)):
+            self.handle = open(filename, 'w+b')
+            self.handle.write(self.Magic + struct.pack('<I', self.Version))
+        else:
+            self.handle = open(filename, 'r+b' if mode == 'a' else 'rb')
+            if self.handle.read(len(self.Magic)) != self.Magic:
+                self.handle.close()
+                raise ValueError('Not a trace pack: {0}'.format(filename))
+            end = self.load_index()
+            if mode == 'a':
+                #new chunks overwrite the index, it is written again on close
+                self.handle.seek(end)
+                self.handle.truncate()
+        self.write_pos = self.handle.tell() if mode != 'r' else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def load_index(self):
+        """Loads the index, returns the offset where the chunk sequence ends"""
+        self.handle.seek(0, os.SEEK_END)
+        size = self.handle.tell()
+        index_offset = None
+        if size >= len(self.Magic) + 4 + self.Footer.size:
+            self.handle.seek(size - self.Footer.size)
+            offset, magic = self.Footer.unpack(self.handle.read(self.Footer.size))
+            if magic == self.EndMagic:
+                index_offset = offset
+        if index_offset is None:
+            return self.scan_chunks()
+        self.handle.seek(index_offset)
+        tag, chunk_num, item_num = struct.unpack('<4sII', self.handle.read(12))
+        buf = self.handle.read(chunk_num * self.ChunkEntry.size)
+        self.chunks = [self.ChunkEntry.unpack_from(buf, i * self.ChunkEntry.size) for i in range(chunk_num)]
+        buf = zlib.decompress(self.handle.read(size - self.Footer.size - self.handle.tell()))
+        pos = 0
+        for i in range(item_num):
+            kind, ID, chunk, offset, length, namelen = self.IndexEntry.unpack_from(buf, pos)
+            pos += self.IndexEntry.size
+            self.register(buf[pos:pos + namelen], kind, ID, chunk, offset, length)
+            pos += namelen
+        return index_offset
+
+    def scan_chunks(self):
+        """Rebuilds the index from the chunk sequence (pack not closed properly), returns the end of the last valid chunk"""
+        self.chunks, self.items, self.ids, self.base = [], dict(), dict(), None
+        pos = len(self.Magic) + 4
+        self.handle.seek(pos)
+        while True:
+            head = self.handle.read(self.ChunkHeader.size)
+            if len(head) < self.ChunkHeader.size: break
+            tag, clen, ulen = self.ChunkHeader.unpack(head)
+            if tag != 'CHNK': break
+            try:
+                data = zlib.decompress(self.handle.read(clen))
+            except zlib.error:
+                break
+            self.chunks.append((pos, clen, ulen))
+            self.register_records(len(self.chunks) - 1, data)
+            pos = self.handle.tell()
+        return pos
+
+    def register(self, name, kind, ID, chunk, offset, length):
+        self.items[name] = (kind, ID, chunk, offset, length)
+        if ID >= 0:
+            self.ids[ID] = name
+        if kind == TraceRecordKinds.REF:
+            self.reference_name = name
+            self.base = (chunk, offset, length)
+            self.ref_lines, self.ref_map = None, None
+
+    def register_records(self, chunk, data):
+        pos = 0
+        while pos < len(data):
+            kind, ID, namelen, datalen = self.RecordHeader.unpack_from(data, pos)
+            pos += self.RecordHeader.size
+            self.register(data[pos:pos + namelen], kind, ID, chunk, pos + namelen, datalen)
+            pos += namelen + datalen
+
+    #------------------------------- writing -------------------------------#
+
+    def append_record(self, kind, ID, name, data):
+        with self.lock:
+            self.pending.append(self.RecordHeader.pack(kind, ID, len(name), len(data)) + name + data)
+            self.pending_size += len(self.pending[-1])
+            if self.pending_size >= self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        with self.lock:
+            if len(self.pending) == 0:
+                return
+            data = ''.join(self.pending)
+            self.pending, self.pending_size = [], 0
+            packed = zlib.compress(data, self.level)
+            self.handle.seek(self.write_pos)
+            self.handle.write(self.ChunkHeader.pack('CHNK', len(packed), len(data)) + packed)
+            self.chunks.append((self.write_pos, len(packed), len(data)))
+            self.register_records(len(self.chunks) - 1, data)
+            self.write_pos = self.handle.tell()
+
+    @staticmethod
+    def load_source(filename, data):
+        if data is None:
+            with open(filename, 'rb') as f:
+                data = f.read()
+        return data
+
+    def set_reference(self, name, filename=None, data=None):
+        """Stores the reference trace (base of delta encoding)
+        If the pack already has a different reference, the new one is stored as a plain member (read by name),
+        and the old one remains the base of delta encoding"""
+        data = self.load_source(filename, data)
+        with self.lock:
+            if self.base is None:
+                self.append_record(TraceRecordKinds.REF, -1, name, data)
+                self.flush()
+            elif self.read_base() != data or name != self.reference_name:
+                self.add_member(name, data=data)
+
+    def add_member(self, name, filename=None, data=None):
+        """Stores an auxiliary file (list init file, experiment descriptors, ...) as is"""
+        self.append_record(TraceRecordKinds.RAW, -1, name, self.load_source(filename, data))
+
+    def add_trace(self, ID, name, filename=None, data=None):
+        """Stores the trace of experiment ID, delta-encoded against the reference"""
+        data = self.load_source(filename, data)
+        with self.lock:
+            if self.base is None:
+                self.append_record(TraceRecordKinds.RAW, ID, name, data)
+                return
+            self.load_reference_lines()
+            self.append_record(TraceRecordKinds.DELTA, ID, name, delta_encode(self.ref_lines, self.ref_map, data))
+
+    def close(self):
+        with self.lock:
+            if self.handle is None:
+                return
+            if self.mode != 'r':
+                self.flush()
+                self.handle.seek(self.write_pos)
+                index = []
+                if self.base is not None and self.items[self.reference_name][0] != TraceRecordKinds.REF:
+                    #base of delta encoding overridden by a member with the same name: keep it in the index (first)
+                    index.append(self.IndexEntry.pack(TraceRecordKinds.REF, -1, self.base[0], self.base[1], self.base[2],
+                                                      len(self.reference_name)) + self.reference_name)
+                for name, (kind, ID, chunk, offset, length) in self.items.items():
+                    index.append(self.IndexEntry.pack(kind, ID, chunk, offset, length, len(name)) + name)
+                self.handle.write(struct.pack('<4sII', 'INDX', len(self.chunks), len(index)))
+                self.handle.write(''.join(self.ChunkEntry.pack(*c) for c in self.chunks))
+                self.handle.write(zlib.compress(''.join(index), self.level))
+                self.handle.write(self.Footer.pack(self.write_pos, self.EndMagic))
+                self.handle.truncate()
+            self.handle.close()
+            self.handle = None
+
+    #------------------------------- reading -------------------------------#
+
+    def load_chunk(self, index):
+        if self.cache[0] != index:
+            offset, clen, ulen = self.chunks[index]
+            self.handle.seek(offset + self.ChunkHeader.size)
+            self.cache = (index, zlib.decompress(self.handle.read(clen)))
+        return self.cache[1]
+
+    def read_base(self):
+        chunk, offset, length = self.base
+        return self.load_chunk(chunk)[offset:offset + length]
+
+    def load_reference_lines(self):
+        if self.ref_lines is None:
+            self.ref_lines = self.read_base().splitlines(True)
+            self.ref_map = dict()
+            for i in range(len(self.ref_lines) - 1, -1, -1):
+                self.ref_map[self.ref_lines[i]] = i
+
+    def namelist(self):
+        with self.lock:
+            if self.mode != 'r':
+                self.flush()
+            return self.items.keys()
+
+    def trace_ids(self):
+        return sorted(self.ids.keys())
+
+    def __contains__(self, name):
+        return name in self.items
+
+    def read(self, name):
+        """Returns the content of a member or trace (decoded) by name"""
+        with self.lock:
+            if self.mode != 'r':
+                self.flush()
+            if name not in self.items:
+                raise KeyError('There is no item named {0} in the trace pack'.format(name))
+            kind, ID, chunk, offset, length = self.items[name]
+            data = self.load_chunk(chunk)[offset:offset + length]
+            if kind == TraceRecordKinds.DELTA:
+                self.load_reference_lines()
+                data = delta_decode(self.ref_lines, data)
+            return data
+
+    def read_trace(self, ID):
+        with self.lock:
+            if self.mode != 'r':
+                self.flush()
+            if ID not in self.ids or self.items[self.ids[ID]][1] != ID:
+                raise KeyError('There is no trace with ID {0} in the trace pack'.format(str(ID)))
+            return self.read(self.ids[ID])
+
+    def open(self, name):
+        """File-like object of the member (zipfile.ZipFile.open compatible)"""
+        return BytesIO(self.read(name))
+
+    def open_trace(self, ID):
+        return BytesIO(self.read_trace(ID))
+
+
+def open_dataset(basename):
+    """Opens basename.trp (binary trace pack) if it exists, basename.zip otherwise
+    Both provide namelist(), open(name) and close()"""
+    if os.path.exists(basename + '.trp'):
+        return TracePack(basename + '.trp')
+    return zipfile.ZipFile(basename + '.zip', 'r')
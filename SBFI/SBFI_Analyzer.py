@@ -20,10 +20,16 @@ import datetime
 import time
 import random
 import glob
+import math
 import threading
 from threading import Thread
+from multiprocessing import Pool
+from zipfile import ZipFile, ZIP_DEFLATED
+from array import array
+from bisect import bisect_left, bisect_right
 from Davos_Generic import *
 from Datamanager import *
+from ResultPack import TracePack
 
 EnhancedAnalysisOfLatentErrors = False
 
@@ -69,7 +75,7 @@ def check_outputs(ref_trace, inj_trace, time_window, mode, max_time_violation):
 
 def check_tmr(ref_trace, inj_trace, time_window, mode, max_time_violation):
     if len(ref_trace.domain_indices.keys()) < 3:
-        print('SBFI analyzer error: number of domains ({0}) is less than required for TMR')
+        print('SBFI analyzer error: number of domains ({0}) is less than required for TMR'.format(len(ref_trace.domain_indices.keys())))
         return None
     time_points = sorted(list(set([i.time for i in ref_trace.vectors + inj_trace.vectors
                                    if (i.time >= time_window[0])])))
@@ -117,170 +123,432 @@ def count_latent_errors(ref_trace, inj_trace, time_window):
     return mismatches
 
 
-def process_dumps_in_linst(config, toolconf, conf, datamodel, DescItems, baseindex):
-    model = datamodel.GetHdlModel(conf.label)
-    basetime = datamodel.reference.reference_dump.vectors[-1].time - conf.workload_time
-    ExpDescIdCnt = baseindex
-    tw = config.SBFI.analyzer.time_window if config.SBFI.analyzer.time_window is not None else (datamodel.reference.reference_dump.vectors[0].time, datamodel.reference.reference_dump.vectors[-1].time)
-    print("Analysis of traces, time window: {0}".format(str(tw)))
+class TraceAlignment:
+    """Injected trace aligned to the time points of the comparison window (see TraceComparator.align)"""
+    def __init__(self, inj_trace, grid, ref_rows, inj_rows, code_map):
+        self.inj_trace = inj_trace
+        self.grid = grid            # sorted time points (union of both traces within the time window)
+        self.ref_rows = ref_rows    # row of the reference trace observed at each time point
+        self.inj_rows = inj_rows    # row of the injected trace observed at each time point
+        self.code_map = code_map    # injected value code -> reference value code (None if value tables are shared)
 
-    err_signal_index = None, None
-    if config.SBFI.analyzer.error_flag_signal != '':
-        if '{{{0}}}'.format(config.SBFI.analyzer.error_flag_signal) in datamodel.reference.reference_dump.internal_labels:
-            err_signal_index = 0, datamodel.reference.reference_dump.internal_labels.index('{{{0}}}'.format(config.SBFI.analyzer.error_flag_signal))
-        elif '{{{0}}}'.format(config.SBFI.analyzer.error_flag_signal) in datamodel.reference.reference_dump.output_labels:
-            err_signal_index = 1, datamodel.reference.reference_dump.output_labels.index('{{{0}}}'.format(config.SBFI.analyzer.error_flag_signal))
 
-    for item in DescItems:
-        if ExpDescIdCnt % 10 == 0:
-            sys.stdout.write("\r%s: Processing dump: %6i" % (conf.label, ExpDescIdCnt))
-            sys.stdout.flush()
-        target = datamodel.GetOrAppendTarget(item.target, item.instance_type, item.injection_case)
-        InjDesc = InjectionDescriptor()
-        InjDesc.OutOfBounds = dict.fromkeys(datamodel.reference.reference_dump.value_range.keys())
-        InjDesc.MaxValueDeviation = dict.fromkeys(datamodel.reference.reference_dump.value_range.keys())
-        InjDesc.ID = ExpDescIdCnt
-        InjDesc.ModelID = model.ID
-        InjDesc.TargetID = target.ID
-        InjDesc.FaultModel = item.fault_model
-        InjDesc.ForcedValue = item.forced_value
-        InjDesc.InjectionTime = item.injection_time
-        InjDesc.InjectionDuration = item.duration
-        InjDesc.ObservationTime = item.observation_time
-        InjDesc.Node = item.target
-        InjDesc.InjCase = item.injection_case
-        InjDesc.DomainMatch = {}
-        for k in datamodel.reference.reference_dump.domain_indices.keys():
-            InjDesc.DomainMatch[k] = '-'
-        inj_dump = simDump()
-        inj_dump.set_labels_copy(datamodel.reference.initial_internal_labels, datamodel.reference.initial_output_labels)
-
-        if inj_dump.build_vectors_from_file(os.path.join(conf.work_dir, toolconf.result_dir, item.dumpfile)) == None:
-            InjDesc.Status = 'E'  # error
-        else:
-            InjDesc.Status = 'S'  # Simulation successful and dumpfile exists
-
-            inj_range = inj_dump.get_value_range(config.SBFI.analyzer.check_range_columns)
-            for k, v in datamodel.reference.reference_dump.value_range.iteritems():
-                if k in inj_range:
-                    InjDesc.MaxValueDeviation[k] = max(abs(inj_range[k][0] - v[0]), abs(inj_range[k][1] - v[1]))
-                    if (inj_range[k][0] < v[0]) or (inj_range[k][1] > v[1]):
-                        InjDesc.OutOfBounds[k] = "[0x{0:x},0x{1:x}] : [0x{2:x},0x{3:x}]".format(inj_range[k][0], inj_range[k][1], v[0], v[1])
+class TraceComparator:
+    """Compares injected traces (simTrace) against a pre-indexed reference trace
+
+    Works on the change events of each column instead of materializing and comparing vectors per time point:
+    for every column the segments of constant value are projected onto the aligned time points,
+    and mismatching segments are merged per domain column group.
+    Produces the same results as check_outputs, check_tmr and count_latent_errors.
+    """
+    def __init__(self, ref_trace, time_window):
+        self.ref_trace = ref_trace
+        self.time_window = time_window
+        self.ref_times = set(t for t in ref_trace.times if t >= time_window[0])
+        ni = len(ref_trace.internal_labels)
+        self.domain_columns = dict((k, [ni + i for i in v]) for k, v in ref_trace.domain_indices.items())
+
+    def align(self, inj_trace):
+        grid = array('d', sorted(self.ref_times.union(t for t in inj_trace.times if t >= self.time_window[0])))
+        code_map = None
+        if inj_trace.values is not self.ref_trace.values:
+            code_map = [self.ref_trace.values.code(v) for v in inj_trace.values.values]
+        return TraceAlignment(inj_trace, grid, self.map_rows(self.ref_trace, grid), self.map_rows(inj_trace, grid), code_map)
+
+    def align_last(self, inj_trace):
+        """Alignment on the last time point only: enough for MLV and TMR verdicts and latent errors"""
+        t = max(self.ref_trace.times[-1] if len(self.ref_trace.times) > 0 else self.time_window[0] - 1,
+                inj_trace.times[-1] if len(inj_trace.times) > 0 else self.time_window[0] - 1)
+        grid = array('d', [t] if t >= self.time_window[0] else [])
+        code_map = None
+        if inj_trace.values is not self.ref_trace.values:
+            code_map = [self.ref_trace.values.code(v) for v in inj_trace.values.values]
+        return TraceAlignment(inj_trace, grid, self.map_rows(self.ref_trace, grid), self.map_rows(inj_trace, grid), code_map)
+
+    @staticmethod
+    def map_rows(trace, grid):
+        res = array('l')
+        times, n = trace.times, len(trace.times)
+        for t in grid:
+            i = bisect_left(times, t)
+            res.append(i if (i < n and times[i] == t) else i - 1)
+        return res
+
+    @staticmethod
+    def column_segments(trace, col, rows_map, code_map=None):
+        """Returns segments of constant value of trace column as lists (start point index, value code)"""
+        seg_start, seg_code = [], []
+        if len(rows_map) == 0:
+            return seg_start, seg_code
+        rows, codes = trace.change_rows[col], trace.change_codes[col]
+        first = max(bisect_right(rows, rows_map[0]) - 1, 0)
+        if len(rows) == 0 or rows[first] > rows_map[0]:
+            seg_start.append(0)
+            seg_code.append(None)
+        for i in range(first, len(rows)):
+            g = bisect_left(rows_map, rows[i])
+            if g >= len(rows_map):
+                break
+            code = codes[i] if code_map is None else code_map[codes[i]]
+            if len(seg_start) > 0 and seg_start[-1] == g:
+                seg_code[-1] = code
+            else:
+                seg_start.append(g)
+                seg_code.append(code)
+        return seg_start, seg_code
+
+    def mismatch_intervals(self, alignment, ref_col, inj_col):
+        """Returns intervals [a, b) of aligned time points where ref_col and inj_col values differ"""
+        ref_start, ref_code = self.column_segments(self.ref_trace, ref_col, alignment.ref_rows)
+        inj_start, inj_code = self.column_segments(alignment.inj_trace, inj_col, alignment.inj_rows, alignment.code_map)
+        res = []
+        npoints = len(alignment.grid)
+        i, j, pos = 0, 0, 0
+        while pos < npoints:
+            while i + 1 < len(ref_start) and ref_start[i + 1] <= pos: i += 1
+            while j + 1 < len(inj_start) and inj_start[j + 1] <= pos: j += 1
+            end = min(ref_start[i + 1] if i + 1 < len(ref_start) else npoints,
+                      inj_start[j + 1] if j + 1 < len(inj_start) else npoints)
+            if ref_code[i] != inj_code[j] or ref_code[i] is None:
+                if len(res) > 0 and res[-1][1] == pos:
+                    res[-1][1] = end
                 else:
-                    InjDesc.MaxValueDeviation[k] = "x"
-
-
-            err_raised = False
-            if err_signal_index[0] is not None:
-                for v in inj_dump.vectors:
-                    if err_signal_index[0] == 0:
-                        if v.internals[err_signal_index[1]] == config.SBFI.analyzer.error_flag_active_value:
-                            err_raised = True
-                            break
-                    elif err_signal_index[0] == 1:
-                        if v.outputs[err_signal_index[1]] == config.SBFI.analyzer.error_flag_active_value:
-                            err_raised = True
-                            break
-
-            InjDesc.ErrorCount = count_latent_errors(datamodel.reference.reference_dump, inj_dump, tw)
-            InjDesc.FaultToFailureLatency = float(0)
-
-            if config.SBFI.analyzer.domain_mode.upper() in ['', 'SIMPLEX']:
-                output_match_res = check_outputs(datamodel.reference.reference_dump, inj_dump, tw, config.SBFI.analyzer.mode, config.SBFI.analyzer.max_time_violation)
-                for k, v in output_match_res.items():
-                    InjDesc.DomainMatch[k] = 'V' if v[0] == 0 else 'X'
-                out_misnum = sum(v[0] for k, v in output_match_res.items())
-                if out_misnum > 0:
-                    first_mismatch = min(v[1] for k, v in output_match_res.items() if v[1] is not None)
-                    InjDesc.FaultToFailureLatency = first_mismatch - basetime - float(InjDesc.InjectionTime)
-                    if InjDesc.FaultToFailureLatency < 0:  InjDesc.FaultToFailureLatency = float(0)
-                # Determine failure mode
-                if out_misnum == 0:
-                    if InjDesc.ErrorCount == 0:
-                        InjDesc.FailureMode = 'Masked'  # Masked fault
+                    res.append([pos, end])
+            pos = end
+        return res
+
+    def last_point_codes(self, alignment, cols):
+        ref_row, inj_row = alignment.ref_rows[-1], alignment.inj_rows[-1]
+        res = []
+        for col in cols:
+            ref_code, inj_code = self.ref_trace.get_code(ref_row, col), alignment.inj_trace.get_code(inj_row, col)
+            if alignment.code_map is not None and inj_code is not None:
+                inj_code = alignment.code_map[inj_code]
+            res.append((ref_code, inj_code))
+        return res
+
+    def check_outputs(self, alignment, mode):
+        """Same as check_outputs: dictionary key='DomainLabel', val= [number of mismatches, time of first mismatch]"""
+        res = dict((k, [0, None]) for k in self.domain_columns.keys())
+        if len(alignment.grid) == 0:
+            return res
+        if mode == TraceCheckModes.MAV:
+            for k, cols in self.domain_columns.items():
+                intervals = []
+                for col in cols:
+                    intervals.extend(self.mismatch_intervals(alignment, col, col))
+                if len(intervals) == 0:
+                    continue
+                intervals.sort()
+                cnt, cur = 0, intervals[0][:]
+                for a, b in intervals[1:]:
+                    if a <= cur[1]:
+                        cur[1] = max(cur[1], b)
                     else:
-                        InjDesc.FailureMode = 'Latent'  # Latent fault
+                        cnt += cur[1] - cur[0]
+                        cur = [a, b]
+                cnt += cur[1] - cur[0]
+                res[k] = [cnt, alignment.grid[intervals[0][0]]]
+        elif mode == TraceCheckModes.MLV:
+            for k, cols in self.domain_columns.items():
+                if any(c[0] != c[1] for c in self.last_point_codes(alignment, cols)):
+                    res[k] = [1, alignment.grid[-1]]
+        return res
+
+    def check_tmr(self, alignment):
+        """Same as check_tmr: returns ({domain: (mismatches, first mismatch time)}, tmr_match)"""
+        if len(self.domain_columns.keys()) < 3:
+            print('SBFI analyzer error: number of domains ({0}) is less than required for TMR'.format(len(self.domain_columns)))
+            return None
+        t = alignment.grid[-1]
+        ref_row, inj_row = alignment.ref_rows[-1], alignment.inj_rows[-1]
+        domains = sorted(self.domain_columns.keys())
+        m, tm = [0, 0, 0], [None, None, None]
+        tmr_match = True
+        for item_id in range(len(self.domain_columns[domains[0]])):
+            h, r = [], []
+            for d in range(3):
+                col = self.domain_columns[domains[d]][item_id]
+                h.append(int(alignment.inj_trace.get_value(inj_row, col), 16))
+                r.append(int(self.ref_trace.get_value(ref_row, col), 16))
+                if h[d] != r[d]:
+                    m[d] += 1
+                    if tm[d] is None: tm[d] = t
+            voted = (h[0] & h[1]) | (h[0] & h[2]) | (h[1] & h[2])
+            if voted != r[0]:
+                tmr_match = False
+        return dict((domains[d], (m[d], tm[d])) for d in range(3)), tmr_match
+
+    def count_latent_errors(self, alignment):
+        """Same as count_latent_errors: number of mismatching internals at the last time point"""
+        if len(alignment.grid) == 0:
+            return 0
+        return sum(c[0] != c[1] for c in self.last_point_codes(alignment, range(len(self.ref_trace.internal_labels))))
+
+
+class AnalysisContext:
+    """Read-only state required to analyze the dumps of one configuration
+
+    Picklable: a pool worker receives it once (pool initializer) instead of re-parsing the reference trace,
+    the binary result pack (result_pack) is not passed to workers: traces are packed by the parent process
+    """
+    def __init__(self, config, toolconf, conf, datamodel, result_pack=None):
+        ref = datamodel.reference.reference_dump
+        self.label = conf.label
+        self.analyzer = config.SBFI.analyzer
+        self.result_dir = os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir))
+        self.result_name = os.path.basename(self.result_dir)
+        self.pack_dir = os.path.normpath(os.path.join(conf.work_dir, 'irespack'))
+        self.copy_dumps = True
+        self.result_pack = result_pack
+        self.reference = datamodel.reference
+        self.model_id = datamodel.GetHdlModel(conf.label).ID
+        self.basetime = ref.times[-1] - conf.workload_time
+        self.time_window = self.analyzer.time_window if self.analyzer.time_window is not None else (ref.times[0], ref.times[-1])
+        self.comparator = TraceComparator(ref, self.time_window)
+        # MLV and TMR verdicts and latent errors are determined at the last time point
+        self.last_point_only = self.analyzer.mode == TraceCheckModes.MLV or self.analyzer.domain_mode.upper() == 'TMR'
+        # early exit: only the final state is read from the dump (tail), unless value ranges are requested
+        self.tail_only = self.analyzer.early_exit and self.last_point_only and \
+                         len([c for c in self.analyzer.check_range_columns if c != '']) == 0
+        # early stop (SBFI attribute): runs stopped on a golden state match are marked by <dumpfile>.stop
+        self.early_stop = config.SBFI.early_stop
+        self.err_signal_index = None, None
+        if self.analyzer.error_flag_signal != '':
+            if '{{{0}}}'.format(self.analyzer.error_flag_signal) in ref.internal_labels:
+                self.err_signal_index = 0, ref.internal_labels.index('{{{0}}}'.format(self.analyzer.error_flag_signal))
+            elif '{{{0}}}'.format(self.analyzer.error_flag_signal) in ref.output_labels:
+                self.err_signal_index = 1, ref.output_labels.index('{{{0}}}'.format(self.analyzer.error_flag_signal))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['result_pack'] = None
+        return state
+
+
+def analyze_dump(ctx, item, ID, TargetID):
+    """Analyzes the dump of a single injection experiment (ExpDescItem), returns InjectionDescriptor"""
+    reference_dump = ctx.reference.reference_dump
+    InjDesc = InjectionDescriptor()
+    InjDesc.OutOfBounds = dict.fromkeys(reference_dump.value_range.keys())
+    InjDesc.MaxValueDeviation = dict.fromkeys(reference_dump.value_range.keys())
+    InjDesc.ID = ID
+    InjDesc.ModelID = ctx.model_id
+    InjDesc.TargetID = TargetID
+    InjDesc.FaultModel = item.fault_model
+    InjDesc.ForcedValue = item.forced_value
+    InjDesc.InjectionTime = item.injection_time
+    InjDesc.InjectionDuration = item.duration
+    InjDesc.ObservationTime = item.observation_time
+    InjDesc.Node = item.target
+    InjDesc.InjCase = item.injection_case
+    InjDesc.DomainMatch = {}
+    for k in reference_dump.domain_indices.keys():
+        InjDesc.DomainMatch[k] = '-'
+    inj_dump = simTrace(values=reference_dump.values)
+    inj_dump.set_labels_copy(ctx.reference.initial_internal_labels, ctx.reference.initial_output_labels)
+
+    stopped = ctx.early_stop and os.path.exists(os.path.join(ctx.result_dir, item.dumpfile + '.stop'))
+    if stopped:
+        # run stopped early: the state matched the golden run at the stop time, the trace is truncated there,
+        # the truncated part is compared as is, only the remainder is taken from the reference
+        res = inj_dump.build_vectors_from_file(os.path.join(ctx.result_dir, item.dumpfile))
+        if res is not None:
+            inj_dump.append_tail(reference_dump, inj_dump.times[-1])
+    elif ctx.tail_only:
+        res = inj_dump.build_last_vector_from_file(os.path.join(ctx.result_dir, item.dumpfile))
+    else:
+        res = inj_dump.build_vectors_from_file(os.path.join(ctx.result_dir, item.dumpfile))
+    if res == None:
+        InjDesc.Status = 'E'  # error
+    else:
+        InjDesc.Status = 'S'  # Simulation successful and dumpfile exists
+
+        inj_range = inj_dump.get_value_range(ctx.analyzer.check_range_columns) if not ctx.tail_only or stopped else {}
+        for k, v in reference_dump.value_range.iteritems():
+            if k in inj_range:
+                InjDesc.MaxValueDeviation[k] = max(abs(inj_range[k][0] - v[0]), abs(inj_range[k][1] - v[1]))
+                if (inj_range[k][0] < v[0]) or (inj_range[k][1] > v[1]):
+                    InjDesc.OutOfBounds[k] = "[0x{0:x},0x{1:x}] : [0x{2:x},0x{3:x}]".format(inj_range[k][0], inj_range[k][1], v[0], v[1])
+            else:
+                InjDesc.MaxValueDeviation[k] = "x"
+
+
+        err_raised = False
+        if ctx.err_signal_index[0] is not None:
+            err_col = ctx.err_signal_index[1] + (len(inj_dump.internal_labels) if ctx.err_signal_index[0] == 1 else 0)
+            err_code = inj_dump.values.codes.get(ctx.analyzer.error_flag_active_value)
+            err_raised = (err_code is not None) and (err_code in inj_dump.change_codes[err_col])
+
+        comparator = ctx.comparator
+        alignment = comparator.align_last(inj_dump) if ctx.last_point_only else comparator.align(inj_dump)
+        InjDesc.ErrorCount = comparator.count_latent_errors(alignment)
+        InjDesc.FaultToFailureLatency = float(0)
+
+        if ctx.analyzer.domain_mode.upper() in ['', 'SIMPLEX']:
+            output_match_res = comparator.check_outputs(alignment, ctx.analyzer.mode)
+            for k, v in output_match_res.items():
+                InjDesc.DomainMatch[k] = 'V' if v[0] == 0 else 'X'
+            out_misnum = sum(v[0] for k, v in output_match_res.items())
+            if out_misnum > 0:
+                first_mismatch = min(v[1] for k, v in output_match_res.items() if v[1] is not None)
+                InjDesc.FaultToFailureLatency = first_mismatch - ctx.basetime - float(InjDesc.InjectionTime)
+                if InjDesc.FaultToFailureLatency < 0:  InjDesc.FaultToFailureLatency = float(0)
+            # Determine failure mode
+            if out_misnum == 0:
+                if InjDesc.ErrorCount == 0:
+                    InjDesc.FailureMode = 'Masked'  # Masked fault
                 else:
-                    if err_raised:
-                        InjDesc.FailureMode = 'Signalled'  # Signaled Failure
-                    else:
-                        InjDesc.FailureMode = 'SDC'  # Silent Data Corruption
-            elif config.SBFI.analyzer.domain_mode.upper() in ['TMR']:
-                output_match_res, tmr_match = check_tmr(datamodel.reference.reference_dump, inj_dump, tw, config.SBFI.analyzer.mode, config.SBFI.analyzer.max_time_violation)
-                for k, v in output_match_res.items():
-                    InjDesc.DomainMatch[k] = 'V' if v[0] == 0 else 'X'
-                if not tmr_match:
-                    InjDesc.FailureMode = 'C'
-                    first_mismatch = min(v[1] for k, v in output_match_res.items() if v[1] is not None)
-                    InjDesc.FaultToFailureLatency = first_mismatch - basetime - float(InjDesc.InjectionTime)
-                elif sum(i == 'V' for i in InjDesc.DomainMatch.values()) < 3:
                     InjDesc.FailureMode = 'Latent'  # Latent fault
+            else:
+                if err_raised:
+                    InjDesc.FailureMode = 'Signalled'  # Signaled Failure
                 else:
-                    InjDesc.FailureMode = 'Masked'  # Masked fault
+                    InjDesc.FailureMode = 'SDC'  # Silent Data Corruption
+        elif ctx.analyzer.domain_mode.upper() in ['TMR']:
+            output_match_res, tmr_match = comparator.check_tmr(alignment)
+            for k, v in output_match_res.items():
+                InjDesc.DomainMatch[k] = 'V' if v[0] == 0 else 'X'
+            if not tmr_match:
+                InjDesc.FailureMode = 'C'
+                first_mismatch = min(v[1] for k, v in output_match_res.items() if v[1] is not None)
+                InjDesc.FaultToFailureLatency = first_mismatch - ctx.basetime - float(InjDesc.InjectionTime)
+            elif sum(i == 'V' for i in InjDesc.DomainMatch.values()) < 3:
+                InjDesc.FailureMode = 'Latent'  # Latent fault
+            else:
+                InjDesc.FailureMode = 'Masked'  # Masked fault
+
+
+
+    # rename dumpfile to string of unique index {InjDesc.ID}.lst
+    InjDesc.Dumpfile = '{0:010d}.lst'.format(InjDesc.ID)
+    src = os.path.normpath(os.path.join(ctx.result_dir, item.dumpfile))
+    dst = os.path.normpath(os.path.join(ctx.pack_dir, InjDesc.Dumpfile))
+    if ctx.copy_dumps and ctx.analyzer.result_pack == 'ZIP' and os.path.exists(src): shutil.copy(src, dst)
+    return InjDesc
+
+
+def pack_trace(ctx, InjDesc, dumpfile):
+    """Appends the raw dump of an analyzed injection to the binary result pack (result_pack TRP)"""
+    src = os.path.normpath(os.path.join(ctx.result_dir, dumpfile))
+    if ctx.result_pack is not None and os.path.exists(src):
+        ctx.result_pack.add_trace(InjDesc.ID, '{0}/{1}'.format(ctx.result_name, dumpfile), src)
+
+
+def process_dumps_in_linst(ctx, datamodel, DescItems, baseindex):
+    ExpDescIdCnt = baseindex
+    for item in DescItems:
+        if ExpDescIdCnt % 10 == 0:
+            sys.stdout.write("\r%s: Processing dump: %6i" % (ctx.label, ExpDescIdCnt))
+            sys.stdout.flush()
+        target = datamodel.GetOrAppendTarget(item.target, item.instance_type, item.injection_case)
+        InjDesc = analyze_dump(ctx, item, ExpDescIdCnt, target.ID)
+        if ctx.copy_dumps: pack_trace(ctx, InjDesc, item.dumpfile)
+        datamodel.LaunchedInjExp_dict[InjDesc.ID] = InjDesc
+        ExpDescIdCnt += 1
 
 
+# Process pool mode: each worker receives the analysis context once (initializer),
+# and returns plain InjectionDescriptors, DataModel and target IDs remain under control of the parent process
+worker_context = None
 
-        # rename dumpfile to string of unique index {InjDesc.ID}.lst
-        InjDesc.Dumpfile = '{0:010d}.lst'.format(InjDesc.ID)
-        src = os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, item.dumpfile))
-        dst = os.path.normpath(os.path.join(conf.work_dir, 'irespack', InjDesc.Dumpfile))
-        if os.path.exists(src): shutil.copy(src, dst)
-        datamodel.LaunchedInjExp_dict[InjDesc.ID] = InjDesc
-        ExpDescIdCnt += 1
 
+def init_analysis_worker(ctx):
+    global worker_context
+    worker_context = ctx
 
-def process_dumps(config, toolconf, conf, datamodel):
-    timestart = datetime.datetime.now().replace(microsecond=0)
-    os.chdir(conf.work_dir)
-    packdir = os.path.join(conf.work_dir, 'irespack')
-    if os.path.exists(packdir): shutil.rmtree(packdir)
-    os.mkdir(packdir)
-    shutil.copy(os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file)), os.path.normpath(os.path.join(packdir, toolconf.reference_file)))
-    datamodel.reference.reference_dump = simDump()
-    datamodel.reference.reference_dump.build_labels_from_file(os.path.normpath(os.path.join(conf.work_dir, toolconf.list_init_file)), config.SBFI.analyzer.rename_list)
-    datamodel.reference.reference_dump.normalize_array_labels(os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file)))
-    datamodel.reference.reference_dump.build_vectors_from_file(os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file)))
-    datamodel.reference.initial_internal_labels, datamodel.reference.initial_output_labels = datamodel.reference.reference_dump.get_labels_copy()
-    datamodel.reference.JnGrLst = config.SBFI.analyzer.join_group_list.copy()
-    datamodel.reference.reference_dump.join_output_columns(datamodel.reference.JnGrLst.copy())
-    datamodel.reference.reference_dump.get_value_range(config.SBFI.analyzer.check_range_columns)
-    desctable = ExpDescTable(conf.label)
-    desctable.build_from_csv_file(os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.exp_desc_file)), "Other")
 
+def analyze_dump_batch(batch):
+    return [analyze_dump(worker_context, item, ID, TargetID) for (item, ID, TargetID) in batch]
 
-    print('Processing simulation traces')
-    progress = 0
-    for i in desctable.items:
-        target = datamodel.GetOrAppendTarget(i.target, i.instance_type, i.injection_case)
-        progress += 1
-        if progress % 100 == 0:
-            sys.stdout.write('Targets appended: {0:06d}\r'.format(progress))
 
-    # Prepare multithreaded analysis of dumps
-    threadnum = config.SBFI.analyzer.threads
-    ExpDescIdCnt = datamodel.GetMaxKey(DataDescriptors.InjectionExp) + 1
-    threadlist = []
-    step = (len(desctable.items) / threadnum) + 1
-    index = 0
-    while index < len(desctable.items):
-        if index + step <= len(desctable.items):
-            items = desctable.items[index:index + step]
-        else:
-            items = desctable.items[index:]
-        baseindex = ExpDescIdCnt + index
-        print('Starting analysis thread: {0} + {1}'.format(str(baseindex), str(len(items))))
-        t = Thread(target=process_dumps_in_linst, args=(config, toolconf, conf, datamodel, items, baseindex))
-        threadlist.append(t)
-        index += step
-    for t in threadlist:
-        t.start()
-    for t in threadlist:
-        t.join()
+def process_dumps_in_pool(ctx, datamodel, DescItems, baseindex, procnum, batchsize=16):
+    batches, batch = [], []
+    dumpfiles = dict()
+    for i in range(len(DescItems)):
+        item = DescItems[i]
+        dumpfiles[baseindex + i] = item.dumpfile
+        target = datamodel.GetOrAppendTarget(item.target, item.instance_type, item.injection_case)
+        batch.append((item, baseindex + i, target.ID))
+        if len(batch) == batchsize:
+            batches.append(batch)
+            batch = []
+    if len(batch) > 0:
+        batches.append(batch)
+    print('Starting pool of {0:d} analyzers: {1:d} dumps'.format(procnum, len(DescItems)))
+    p = Pool(procnum, init_analysis_worker, (ctx,))
+    try:
+        cnt = 0
+        for res in p.imap_unordered(analyze_dump_batch, batches):
+            for InjDesc in res:
+                if ctx.copy_dumps: pack_trace(ctx, InjDesc, dumpfiles[InjDesc.ID])
+                datamodel.LaunchedInjExp_dict[InjDesc.ID] = InjDesc
+            cnt += len(res)
+            sys.stdout.write("\r%s: Processed dumps: %6i" % (ctx.label, cnt))
+            sys.stdout.flush()
+        p.close()
+    except:
+        p.terminate()
+        raise
+    finally:
+        p.join()
+    print('')
 
-    datamodel.SaveTargets()
-    datamodel.SaveInjections()
 
-    injsummary = datamodel.LaunchedInjExp_dict.values()
+def load_reference(config, toolconf, conf, datamodel):
+    """Builds the pack directory (irespack, result_pack ZIP) and parses the golden run trace into datamodel.reference"""
+    packdir = os.path.join(conf.work_dir, 'irespack')
+    if os.path.exists(packdir): shutil.rmtree(packdir)
+    if config.SBFI.analyzer.result_pack == 'ZIP':
+        os.mkdir(packdir)
+        shutil.copy(os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file)), os.path.normpath(os.path.join(packdir, toolconf.reference_file)))
+    list_init_file = os.path.normpath(os.path.join(conf.work_dir, toolconf.list_init_file))
+    reference_file = os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file))
+    cache = ReferenceTraceCache(os.path.join(conf.work_dir, ReferenceTraceCache.CacheDir), 'simTrace', [list_init_file, reference_file],
+                                ReferenceTraceCache.analyzer_items(config.SBFI.analyzer))
+    reference = cache.load()
+    if reference is None:
+        reference_dump = simTrace()
+        reference_dump.build_labels_from_file(list_init_file, config.SBFI.analyzer.rename_list)
+        reference_dump.build_vectors_from_file(reference_file, normalize_labels=True)
+        internal_labels, output_labels = reference_dump.get_labels_copy()
+        reference_dump.join_output_columns(config.SBFI.analyzer.join_group_list.copy())
+        reference_dump.get_value_range(config.SBFI.analyzer.check_range_columns)
+        reference = (reference_dump, internal_labels, output_labels)
+        cache.store(reference)
+    datamodel.reference.reference_dump, datamodel.reference.initial_internal_labels, datamodel.reference.initial_output_labels = reference
+    datamodel.reference.JnGrLst = config.SBFI.analyzer.join_group_list.copy()
+    return packdir
+
+
+def open_result_pack(config, toolconf, conf):
+    """Opens the binary result pack RESPACK_label.trp (result_pack TRP), stores the reference trace as the base of delta encoding
+    Members are named relative to conf.work_dir as in the zipped package: iresults/reference.lst, code/..."""
+    if config.SBFI.analyzer.result_pack != 'TRP':
+        return None
+    pack = TracePack(os.path.join(config.report_dir, "RESPACK_{0}.trp".format(conf.label)), 'a')
+    result_name = os.path.basename(os.path.normpath(toolconf.result_dir))
+    pack.set_reference('{0}/{1}'.format(result_name, toolconf.reference_file), os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file)))
+    return pack
+
+
+def close_result_pack(toolconf, conf, result_pack):
+    """Appends the experiment descriptors and the model sources (toolconf.code_dir) to the binary result pack, writes its index"""
+    result_name = os.path.basename(os.path.normpath(toolconf.result_dir))
+    desc_file = os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.exp_desc_file))
+    if os.path.exists(desc_file):
+        result_pack.add_member('{0}/{1}'.format(result_name, toolconf.exp_desc_file), desc_file)
+    code_dir = os.path.normpath(os.path.join(conf.work_dir, toolconf.code_dir))
+    for root, dirs, files in os.walk(code_dir):
+        for fname in files:
+            c = os.path.relpath(os.path.join(root, fname), os.path.join(code_dir, '..')).replace('\\', '/')
+            if c not in result_pack:
+                result_pack.add_member(c, os.path.join(root, fname))
+    result_pack.close()
+
+
+def report_analysis_results(config, toolconf, conf, datamodel, injsummary, packdir, result_pack=None):
+    """Exports summary table, result package and statistics of the analyzed injections (list of InjectionDescriptor)"""
     domains = sorted(injsummary[0].DomainMatch.keys())
 
     T = Table('SummaryFaultSim', ['Node', 'Fault', 'InjTime', 'Duration', 'FailureMode'] + domains +
@@ -301,13 +569,15 @@ def process_dumps(config, toolconf, conf, datamodel):
 
     with open(os.path.join(config.report_dir, 'Summary_{0}_{1}.csv'.format(config.experiment_label, conf.label)), 'w') as f:
         f.write(T.to_csv())
-    datamodel.LaunchedInjExp_dict.clear()
 
-    dumppack = "RESPACK_{0}.zip".format(conf.label)
     os.chdir(conf.work_dir)
-    zip_folder(packdir, os.path.join(config.report_dir, dumppack))
-    zip_folder(toolconf.code_dir, os.path.join(config.report_dir, dumppack))
-    shutil.rmtree(packdir)
+    if result_pack is not None:
+        close_result_pack(toolconf, conf, result_pack)
+    else:
+        dumppack = "RESPACK_{0}.zip".format(conf.label)
+        zip_folder(packdir, os.path.join(config.report_dir, dumppack))
+        zip_folder(toolconf.code_dir, os.path.join(config.report_dir, dumppack))
+    if os.path.exists(packdir): shutil.rmtree(packdir)
 
     domain_stats = {}
     valid_exp = sum(i.Status == 'S' for i in injsummary)
@@ -329,5 +599,241 @@ def process_dumps(config, toolconf, conf, datamodel):
                     f.write('\n\t{0:s} : {1:s}'.format(k, v))
 
 
+def process_dumps(config, toolconf, conf, datamodel):
+    timestart = datetime.datetime.now().replace(microsecond=0)
+    os.chdir(conf.work_dir)
+    packdir = load_reference(config, toolconf, conf, datamodel)
+    desctable = ExpDescTable(conf.label)
+    desctable.build_from_csv_file(os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.exp_desc_file)), "Other")
+
+
+    print('Processing simulation traces')
+    progress = 0
+    for i in desctable.items:
+        target = datamodel.GetOrAppendTarget(i.target, i.instance_type, i.injection_case)
+        progress += 1
+        if progress % 100 == 0:
+            sys.stdout.write('Targets appended: {0:06d}\r'.format(progress))
+
+    ctx = AnalysisContext(config, toolconf, conf, datamodel, open_result_pack(config, toolconf, conf))
+    print("Analysis of traces, time window: {0}".format(str(ctx.time_window)))
+    ExpDescIdCnt = datamodel.GetMaxKey(DataDescriptors.InjectionExp) + 1
+    threadnum = config.SBFI.analyzer.threads
+    if config.SBFI.analyzer.parallel_mode == 'PROCESSES' and threadnum > 1:
+        # CPU-bound analysis: worker processes are not serialized by the GIL
+        process_dumps_in_pool(ctx, datamodel, desctable.items, ExpDescIdCnt, threadnum)
+    else:
+        # Prepare multithreaded analysis of dumps
+        threadlist = []
+        step = (len(desctable.items) / threadnum) + 1
+        index = 0
+        while index < len(desctable.items):
+            if index + step <= len(desctable.items):
+                items = desctable.items[index:index + step]
+            else:
+                items = desctable.items[index:]
+            baseindex = ExpDescIdCnt + index
+            print('Starting analysis thread: {0} + {1}'.format(str(baseindex), str(len(items))))
+            t = Thread(target=process_dumps_in_linst, args=(ctx, datamodel, items, baseindex))
+            threadlist.append(t)
+            index += step
+        for t in threadlist:
+            t.start()
+        for t in threadlist:
+            t.join()
+
+    datamodel.SaveTargets()
+    datamodel.SaveInjections()
+
+    injsummary = datamodel.LaunchedInjExp_dict.values()
+    report_analysis_results(config, toolconf, conf, datamodel, injsummary, packdir, ctx.result_pack)
+    datamodel.LaunchedInjExp_dict.clear()
 
     print('\n\nAnalysys completed, time taken: ' + str(time_to_seconds(datetime.datetime.now().replace(microsecond=0) - timestart)))
+
+
+class StreamingAnalysis:
+    """Analyzes the injection dumps while the simulation campaign is still running
+
+    The injector passes each dump as soon as its simulator process exits (dump_completed),
+    or requests a scan of the result directory (poll) when process-to-dump mapping is not available.
+    Each dump is classified immediately, its InjectionDescriptor is appended to the database,
+    and the raw dump is kept (KEEP), removed (DELETE) or moved into the result package (PACK), see analyzer attribute raw_dumps.
+    Result package: RESPACK_label.zip or binary trace pack RESPACK_label.trp, see analyzer attribute result_pack.
+    """
+    def __init__(self, config, toolconf, conf, datamodel, settle_time=10):
+        self.timestart = datetime.datetime.now().replace(microsecond=0)
+        self.config, self.toolconf, self.conf, self.datamodel = config, toolconf, conf, datamodel
+        self.settle_time = settle_time
+        os.chdir(conf.work_dir)
+        self.packdir = load_reference(config, toolconf, conf, datamodel)
+        self.ctx = AnalysisContext(config, toolconf, conf, datamodel, open_result_pack(config, toolconf, conf))
+        print("Streaming analysis of traces, time window: {0}".format(str(self.ctx.time_window)))
+        # SGE monitor detects completion by the number of dumps in the result dir: keep them
+        self.raw_dumps = config.SBFI.analyzer.raw_dumps if config.platform == Platforms.Multicore else 'KEEP'
+        self.ctx.copy_dumps = (self.raw_dumps == 'KEEP')
+        self.ExpDescIdCnt = datamodel.GetMaxKey(DataDescriptors.InjectionExp) + 1
+        self.pending = dict()
+        self.known = set()
+        self.total = 0
+        self.extend()
+        self.dumpfiles = dict()
+        self.injsummary = []
+        self.stats = dict()
+        self.inprogress = []
+        self.pool = None
+        if config.SBFI.analyzer.parallel_mode == 'PROCESSES' and config.SBFI.analyzer.threads > 1:
+            self.pool = Pool(config.SBFI.analyzer.threads, init_analysis_worker, (self.ctx,))
+        self.ziphandle = None
+        if self.raw_dumps == 'PACK' and self.ctx.result_pack is None:
+            self.ziphandle = ZipFile(os.path.join(config.report_dir, "RESPACK_{0}.zip".format(conf.label)), mode='a', compression=ZIP_DEFLATED, allowZip64=True)
+            self.packed = set(self.ziphandle.namelist())
+
+    def extend(self):
+        """Registers the experiments of the descriptor table not seen before (next batch of the sequential sampling)"""
+        desctable = ExpDescTable(self.conf.label)
+        desctable.build_from_csv_file(os.path.normpath(os.path.join(self.conf.work_dir, self.toolconf.result_dir, self.toolconf.exp_desc_file)), "Other")
+        for item in desctable.items:
+            if item.dumpfile in self.known:
+                continue
+            target = self.datamodel.GetOrAppendTarget(item.target, item.instance_type, item.injection_case)
+            self.pending[item.dumpfile] = (item, self.ExpDescIdCnt, target.ID)
+            self.known.add(item.dumpfile)
+            self.ExpDescIdCnt += 1
+            self.total += 1
+        self.datamodel.SaveTargets()
+
+    def dump_completed(self, dumpfile):
+        task = self.pending.pop(dumpfile, None)
+        if task is None:
+            return
+        self.dumpfiles[task[1]] = dumpfile
+        if self.pool is not None:
+            self.inprogress.append(self.pool.apply_async(analyze_dump_batch, ([task],)))
+        else:
+            self.commit([analyze_dump(self.ctx, task[0], task[1], task[2])])
+        self.collect()
+
+    def poll(self):
+        """Picks up the dumps not modified during settle_time (simulator has finished writing them)"""
+        now = time.time()
+        for dumpfile in set(os.listdir(self.ctx.result_dir)).intersection(self.pending.keys()):
+            try:
+                if now - os.path.getmtime(os.path.join(self.ctx.result_dir, dumpfile)) > self.settle_time:
+                    self.dump_completed(dumpfile)
+            except OSError:
+                pass
+        self.collect()
+
+    def collect(self, wait=False):
+        remaining = []
+        for res in self.inprogress:
+            if wait or res.ready():
+                self.commit(res.get())
+            else:
+                remaining.append(res)
+        self.inprogress = remaining
+
+    def commit(self, descs):
+        self.datamodel.dbhelper.InjectionDesc_save(descs, report=False)
+        for InjDesc in descs:
+            self.injsummary.append(InjDesc)
+            self.stats[InjDesc.FailureMode] = self.stats.get(InjDesc.FailureMode, 0) + 1
+            dumpfile = self.dumpfiles.pop(InjDesc.ID)
+            src = os.path.normpath(os.path.join(self.ctx.result_dir, dumpfile))
+            if self.raw_dumps != 'DELETE':
+                pack_trace(self.ctx, InjDesc, dumpfile)
+            if self.raw_dumps == 'KEEP' or not os.path.exists(src):
+                continue
+            if self.ziphandle is not None:
+                arcname = os.path.join(os.path.basename(self.packdir), InjDesc.Dumpfile)
+                if arcname not in self.packed:
+                    self.ziphandle.write(src, arcname)
+                    self.packed.add(arcname)
+            os.remove(src)
+
+    def status(self):
+        return 'Analyzed: {0}/{1} [{2}]'.format(len(self.injsummary), self.total,
+                                               ', '.join('{0}: {1}'.format(k, v) for k, v in sorted(self.stats.items())))
+
+    def drain(self):
+        """Analyzes all pending dumps (missing dumps are marked as errors), waits for the results"""
+        for dumpfile in self.pending.keys():
+            self.dump_completed(dumpfile)
+        self.collect(True)
+
+    def finalize(self):
+        """Analyzes remaining dumps and exports the results"""
+        self.drain()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+        if self.ziphandle is not None:
+            self.ziphandle.close()
+        print('\n{0}: {1}'.format(self.conf.label, self.status()))
+        if len(self.injsummary) > 0:
+            report_analysis_results(self.config, self.toolconf, self.conf, self.datamodel, self.injsummary, self.packdir, self.ctx.result_pack)
+        elif self.ctx.result_pack is not None:
+            close_result_pack(self.toolconf, self.conf, self.ctx.result_pack)
+        print('\n\nAnalysys completed, time taken: ' + str(time_to_seconds(datetime.datetime.now().replace(microsecond=0) - self.timestart)))
+
+
+# t-values of the confidence levels supported by the sequential sampling (as in the SBFI query interface)
+T_Table = {0.95: 1.96, 0.99: 2.576, 0.999: 3.291}
+
+
+def get_error_margin(sample_size, confidence_level, P=0.5, N=None):
+    t = T_Table[confidence_level]
+    if N != None:
+        return t * math.sqrt(P * (1 - P) * (N - sample_size) / (sample_size * (N - 1)))
+    else:
+        return t * math.sqrt(P * (1 - P) / sample_size)
+
+
+class SequentialStopRule:
+    """Stop rule of the sequential sampling (SBFI attribute sequential_sampling = "on")
+
+    Tracks the failure rate (FailureMode other than Masked/Latent) of each (macrocell type, fault model)
+    in the analyzed injections, and its error margin at the given confidence level.
+    The rate is estimated as (failures+1)/(samples+2): a group without observed failures
+    still needs the sample size required by the margin, instead of converging at margin 0.
+    """
+    def __init__(self, confidence_level, error_margin):
+        if confidence_level not in T_Table:
+            raise ValueError('Sequential sampling: confidence_level must be one of {0}'.format(sorted(T_Table.keys())))
+        self.confidence_level = confidence_level
+        self.error_margin = error_margin
+        self.groups = dict()    # key = (Macrocell, FaultModel), value = [samples, failures]
+        self.processed = 0
+
+    def update(self, injsummary, datamodel):
+        """Accounts the injection descriptors appended to injsummary since the last call"""
+        macrocells = dict((t.ID, t.Macrocell) for t in datamodel.Target_lst)
+        for InjDesc in injsummary[self.processed:]:
+            if InjDesc.Status != 'S':
+                continue
+            group = self.groups.setdefault((macrocells.get(InjDesc.TargetID, ''), InjDesc.FaultModel), [0, 0])
+            group[0] += 1
+            if InjDesc.FailureMode not in ('Masked', 'Latent'):
+                group[1] += 1
+        self.processed = len(injsummary)
+
+    def rate(self, key):
+        samples, failures = self.groups[key]
+        return float(failures + 1) / (samples + 2)
+
+    def margin(self, key):
+        return get_error_margin(self.groups[key][0], self.confidence_level, self.rate(key))
+
+    def converged(self):
+        return set(k for k in self.groups if self.margin(k) <= self.error_margin)
+
+    def done(self):
+        return len(self.groups) > 0 and len(self.converged()) == len(self.groups)
+
+    def report(self):
+        res = 'SEQUENTIAL SAMPLING: confidence {0}, error margin {1}'.format(self.confidence_level, self.error_margin)
+        for k in sorted(self.groups.keys()):
+            res += '\n\t{0:30s} {1:20s} samples: {2:6d}, failure rate: {3:0.4f} +/- {4:0.4f} {5}'.format(
+                k[0], k[1], self.groups[k][0], self.rate(k), self.margin(k), '(done)' if self.margin(k) <= self.error_margin else '')
+        return res
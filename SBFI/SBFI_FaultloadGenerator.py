@@ -22,6 +22,8 @@ import datetime
 import time
 import random
 import glob
+from array import array
+from bisect import bisect_right
 from Davos_Generic import *
 from Datamanager import *
 from SBFI.SBFI_Profiler import *
@@ -30,6 +32,74 @@ class FaultloadModes:
     Sampling, Exhaustive, Mixed, Staggering = range(4)
 
 
+class SamplingBatch:
+    """One batch of the sequential sampling (SBFI attribute sequential_sampling = "on")
+
+    index: batch number (random seed of each faultload is rand_seed + index, batch 0 reproduces the non-sequential sample)
+    sizes: number of samples per faultload (config.SBFI.fault_model)
+    exclude: set of (macrocell type, fault model) that already meet the error margin, not sampled anymore
+    """
+    def __init__(self, index, sizes, exclude):
+        self.index = index
+        self.sizes = sizes
+        self.exclude = exclude
+
+
+class FaultloadWriter:
+    """Exports the fault scripts of a faultload generator, its experiment descriptor table and completion manifest
+
+    Scripts are written one file each, or appended to a single bundle file (SBFI attribute script_bundle = "on"),
+    executed by the injector through the Tcl driver SupportScripts/modelsim_bundle.do (see CompletionManifest.script_command).
+    Rows of the descriptor table are streamed to the table file.
+    append: continue the faultload (batch of the sequential sampling), scripts are numbered from start_index
+    """
+    DescHeader = "INDEX;DUMPFILE;TARGET;INSTANCE_TYPE;INJECTION_CASE;FAULT_MODEL;FORCED_VALUE;DURATION;TIME_INSTANCE;OBSERVATION_TIME;MAX_ACTIVITY_DURATION;EFFECTIVE_SWITHES;PROFILED_VALUE;ON_TRIGGER;"
+
+    def __init__(self, config, modelconf, toolconf, append=False, header=None):
+        self.work_dir = modelconf.work_dir
+        self.toolconf = toolconf
+        self.manifest = CompletionManifest(modelconf.work_dir, toolconf)
+        self.append = append and self.manifest.load()
+        self.start_index = self.manifest.size() if self.append else 0
+        self.mapping = []
+        desc_file = os.path.join(modelconf.work_dir, toolconf.result_dir, toolconf.exp_desc_file)
+        self.append = self.append and os.path.exists(desc_file)
+        self.desc = open(desc_file, 'a' if self.append else 'w')
+        if not self.append:
+            self.desc.write("sep=;\n" + (header if header is not None else FaultloadWriter.DescHeader))
+        self.bundle = None
+        if config.SBFI.script_bundle:
+            self.bundle = open(os.path.join(modelconf.work_dir, toolconf.script_dir, CompletionManifest.BundleFile), 'ab' if self.append else 'wb')
+            self.bundle.seek(0, os.SEEK_END)
+            robust_file_write(os.path.join(modelconf.work_dir, toolconf.code_dir, CompletionManifest.BundleDriver),
+                              "do {0}\n".format(os.path.normpath(os.path.join(config.call_dir, toolconf.support_script_dir, 'modelsim_bundle.do'))))
+
+    def add(self, fname, dumpfilename, script, descriptor):
+        """fname: script name, descriptor: row of the descriptor table (fields separated by ;)"""
+        if self.bundle is not None:
+            offset = self.bundle.tell()
+            self.bundle.write(script)
+            self.mapping.append((fname, dumpfilename, offset, len(script)))
+        else:
+            robust_file_write(os.path.join(self.work_dir, self.toolconf.script_dir, fname), script)
+            self.mapping.append((fname, dumpfilename))
+        self.desc.write("\n" + descriptor)
+
+    def count(self):
+        return len(self.mapping)
+
+    def close(self):
+        """Completes the export, returns the number of exported scripts"""
+        self.desc.close()
+        if self.bundle is not None:
+            self.bundle.close()
+        if self.append:
+            self.manifest.append(self.mapping)
+        else:
+            self.manifest.write(self.mapping)
+        return len(self.mapping)
+
+
 def get_checkpoints(dir):
     """Looks for simulation checkpoints
 
@@ -93,12 +163,90 @@ def get_random_injection_time(h_start_time, h_end_time, time_mode, sample_size,
     return res
 
 
+def get_state_snapshots(config, modelconf, toolconf):
+    """Golden-run state snapshots for the early stop of masked faults: [(time, snapshot file)],
+    taken at the clustering checkpoints (see generate_clustering_checkpoints), except time 0
+    """
+    delta = int(modelconf.workload_time / config.SBFI.workload_split_factor)
+    return [(t, '{0}/state_{1}.txt'.format(toolconf.checkpoint_dir, t)) for t in range(delta, int(modelconf.workload_time), delta)]
+
+
+def get_state_signals(list_init_file):
+    """Absolute paths of the signals traced by the list init file (state compared by the early stop)"""
+    res, scope = [], ''
+    with open(list_init_file, 'r') as f:
+        for line in f:
+            line = line.split(';')[0].strip()
+            if line.startswith('env '):
+                scope = line.split()[1].rstrip('/')
+            elif line.startswith('add list '):
+                braced = re.findall('\{([^{}]+)\}', line)
+                path = braced[-1] if len(braced) > 0 else line.split()[-1]
+                res.append(path if path.startswith('/') else scope + '/' + path)
+    return res
+
+
+def get_target_signals(inj_code):
+    """Signals accessed by an injection code (examine, force, change), without bit/element indexes:
+    the injected state compared by the early stop in addition to the observed signals
+    """
+    res = []
+    for token in re.findall('(?:examine|change|force)\s+(?:-\w+\s+)*(\S+)', inj_code):
+        match = re.match('[^\s\[\];#$]+', token)
+        if match is not None and not token.startswith('$'):
+            path = re.sub('(\(\d+\)|\[\d+\])+$', '', match.group(0))
+            if path not in res:
+                res.append(path)
+    return res
+
+
+def get_injection_targets(config, modelconf, toolconf):
+    """Target signals of all injection cases of the configured faultloads (snapshot in the golden run)"""
+    faultdict = FaultDict(os.path.join(config.call_dir, config.SBFI.fault_dictionary))
+    nodetree = ET.parse(os.path.join(modelconf.work_dir, toolconf.injnode_list)).getroot()
+    res, seen = [], set()
+    for fconfig in config.SBFI.fault_model:
+        inj_space = FaultSpace(ConfigNodes(modelconf.label, nodetree).get_all_by_typelist(fconfig.target_logic), faultdict, fconfig)
+        for instance in inj_space.nodelist:
+            for injection_rule, injection_case, dims in inj_space.cases[instance.type][0]:
+                for path in get_target_signals(get_injection_case_code(instance, injection_rule, injection_case, fconfig)):
+                    if path not in seen:
+                        seen.add(path)
+                        res.append(path)
+    return res
+
+
+def write_early_stop_script(config, modelconf, toolconf):
+    """Exports the Tcl setup of the early stop (procedures, observed and injected state signals), returns its path (relative to work dir)"""
+    fname = os.path.join(toolconf.code_dir, 'early_stop.do')
+    content = "do {0}".format(os.path.normpath(os.path.join(config.call_dir, toolconf.support_script_dir, 'modelsim_early_stop.do')))
+    content += "\nset davos_state_signals {{{0}}}".format(' '.join('{{{0}}}'.format(i) for i in get_state_signals(os.path.join(modelconf.work_dir, toolconf.list_init_file))))
+    content += "\nset davos_target_signals {{{0}}}\n".format(' '.join('{{{0}}}'.format(i) for i in get_injection_targets(config, modelconf, toolconf)))
+    robust_file_write(os.path.join(modelconf.work_dir, fname), content)
+    return fname
+
+
+def early_stop_run(config, modelconf, toolconf, start_time, inj_end, dumpfilename, inj_codes):
+    """Tcl commands replacing 'run $ExecTime' in a fault script started at start_time:
+    the observed state and the injected targets (signals of inj_codes) are compared with the golden snapshots
+    taken after the injection (inj_end), on match the run stops and <dumpfile>.stop marks the truncated trace for the analyzer
+    """
+    hooks = ['{0} {1}'.format(t - int(start_time), f) for t, f in get_state_snapshots(config, modelconf, toolconf) if t > start_time and t > inj_end]
+    targets = []
+    for code in inj_codes:
+        targets += [i for i in get_target_signals(code) if i not in targets]
+    return "do {0}\ndavos_run_until_masked [concat $davos_state_signals {{{1}}}] {{{2}}} {3} {4}/{5}.stop".format(
+        os.path.join(toolconf.code_dir, 'early_stop.do'), ' '.join('{{{0}}}'.format(i) for i in targets), ' '.join(hooks),
+        int(modelconf.workload_time) - int(start_time), toolconf.result_dir, dumpfilename)
+
+
 def generate_faultload(mode, config, modelconf, toolconf):
     os.chdir(os.path.join(modelconf.work_dir, toolconf.script_dir))
+    manifest = CompletionManifest(modelconf.work_dir, toolconf)
     flist = glob.glob('fault*.do')
-    if len(flist) > 0 and os.path.exists(os.path.join(modelconf.work_dir, toolconf.result_dir, toolconf.exp_desc_file)) and not config.SBFI.clean_run:
+    if (len(flist) > 0 or manifest.load()) and os.path.exists(os.path.join(modelconf.work_dir, toolconf.result_dir, toolconf.exp_desc_file)) and not config.SBFI.clean_run:
         print('{0}: using existing faultload'.format(modelconf.label))
-        return len(flist)
+        return max(len(flist), manifest.size())
     else:
         faultdict = FaultDict(os.path.join(config.call_dir, config.SBFI.fault_dictionary))
         if mode == FaultloadModes.Sampling:
@@ -130,11 +278,11 @@ def match_centered(points, base_point, left, right):
 
 
 def stagger_faultload_generator(config, modelconf, toolconf, faultdict):
-    DescTable = Table('Faultlist', ['INDEX','DUMPFILE','TARGET','INSTANCE_TYPE','INJECTION_CASE','FAULT_MODEL',
-                                    'FORCED_VALUE','DURATION','TIME_INSTANCE','OBSERVATION_TIME',
-                                    'HEAD_TIME', 'INTERVAL', 'OFFSET',
-                                    'SWITCH_INSTANT', "ACTIVE_NODES",
-                                    'MAX_ACTIVITY_DURATION', 'PROFILED_VALUE','ON_TRIGGER'])
+    writer = FaultloadWriter(config, modelconf, toolconf, header=';'.join(['INDEX','DUMPFILE','TARGET','INSTANCE_TYPE','INJECTION_CASE','FAULT_MODEL',
+                                                                           'FORCED_VALUE','DURATION','TIME_INSTANCE','OBSERVATION_TIME',
+                                                                           'HEAD_TIME', 'INTERVAL', 'OFFSET',
+                                                                           'SWITCH_INSTANT', "ACTIVE_NODES",
+                                                                           'MAX_ACTIVITY_DURATION', 'PROFILED_VALUE','ON_TRIGGER']))
     checkpointlist = get_checkpoints(os.path.join(config.call_dir, modelconf.work_dir, toolconf.checkpoint_dir))
     os.chdir(os.path.join(modelconf.work_dir, toolconf.script_dir))
     for fconfig in config.SBFI.fault_model:
@@ -170,7 +318,7 @@ def stagger_faultload_generator(config, modelconf, toolconf, faultdict):
         exp_dict = {}
         tested_nodes = set()
         SampleSizeGoal = fconfig.sample_size * len(fconfig.stagger_offsets)
-        while DescTable.rownum() < SampleSizeGoal:
+        while writer.count() < SampleSizeGoal:
             #select random injection target and time instant
             while True:
                 reg_name = random.choice(activity_profile.keys())
@@ -205,7 +353,7 @@ def stagger_faultload_generator(config, modelconf, toolconf, faultdict):
             if len(time_pairs) <= 1:
                 continue
             tested_nodes.add(c.name)
-            inj_code = get_injection_code_all(c, faultdict, fconfig, 1.0, None)[0]
+            inj_code = FaultSpace([c], faultdict, fconfig).get(0)
             duration = random.uniform(fconfig.duration_min, fconfig.duration_max)
             delay = random.randrange(1, modelconf.clk_period)
             for offset in sorted(time_pairs.keys()):
@@ -238,12 +386,12 @@ def stagger_faultload_generator(config, modelconf, toolconf, faultdict):
                             fname = "fault_" + str_index + "__checkpoint_0" + ".do"
                     if config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore:
                         inj_script += "\n\ndo {0}".format(toolconf.list_init_file)
-                    inj_script += "\nrun $ExecTime; config list -strobeperiod 1ns -strobestart [expr $now/1000] -usestrobe 1; run 1ns;"
                     dumpfilename = "dump_{0}_nodename.lst".format(str_index)
+                    run_cmd = early_stop_run(config, modelconf, toolconf, checkpoint_linked, inj_time + duration, dumpfilename, [simcmd]) if (config.SBFI.early_stop and fconfig.trigger_expression == '') else "run $ExecTime"
+                    inj_script += "\n{0}; config list -strobeperiod 1ns -strobestart [expr $now/1000] -usestrobe 1; run 1ns;".format(run_cmd)
                     inj_script += "\nwrite list -events {0}/{1}".format(toolconf.result_dir, dumpfilename)
                     if config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore:
                         inj_script += "\nquit\n"
-                    robust_file_write(fname, inj_script)
                     sys.stdout.write('Stored script: {0:06d}\r'.format(script_index))
                     sys.stdout.flush()
 
@@ -267,9 +415,9 @@ def stagger_faultload_generator(config, modelconf, toolconf, faultdict):
                                   '',
                                   '',
                                   '']
-                    DescTable.add_row(descriptor)
+                    writer.add(fname, dumpfilename, inj_script, ';'.join(descriptor))
                 script_index += 1
-    DescTable.to_csv(';', True, os.path.join(modelconf.work_dir, toolconf.result_dir, toolconf.exp_desc_file))
+    writer.close()
 
 
     #desctable = ExpDescTable(modelconf.label)
@@ -285,39 +433,48 @@ def stagger_faultload_generator(config, modelconf, toolconf, faultdict):
 
 
 
-def sample_fault_generator(config, modelconf, toolconf, faultdict):
+def sample_fault_generator(config, modelconf, toolconf, faultdict, batch=None):
     """Generates randomly sampled faultload
 
     Exports a set of TCL scripts for the ModelSim simulator.
     Each script corresponds to one (independent) injection run.
+    A batch of the sequential sampling continues the script numbering,
+    and appends to the experiment descriptor table and to the completion manifest.
 
     Args:
         config (SBFIConfiguration): parameters of SBFI experiment (SBFI tag of input configuration XML)
         modelconf (ParConfig): parameters of particular model configuration under test (ModelConfig tag of input XML)
         toolconf (ToolOptions): generic parameters of SBFI tool (not model-related)
         faultdict (FaultDict): fault dictionary for target implementation technology
+        batch (SamplingBatch): batch of the sequential sampling, None - complete sample (sample_size of each faultload)
 
     Returns:
         int: number of exported fault injection scripts
     """
     checkpointlist = get_checkpoints(os.path.join(config.call_dir, modelconf.work_dir, toolconf.checkpoint_dir))
     os.chdir(os.path.join(modelconf.work_dir, toolconf.script_dir))
-    fdesclog_content = "sep=;\nINDEX;DUMPFILE;TARGET;INSTANCE_TYPE;INJECTION_CASE;FAULT_MODEL;FORCED_VALUE;DURATION;TIME_INSTANCE;OBSERVATION_TIME;MAX_ACTIVITY_DURATION;EFFECTIVE_SWITHES;PROFILED_VALUE;ON_TRIGGER;"
+    writer = FaultloadWriter(config, modelconf, toolconf, batch is not None and batch.index > 0)
+    script_index = writer.start_index
 
     dT = []
-    script_index = 0
-    for fconfig in config.SBFI.fault_model:
-        random.seed(fconfig.rand_seed)
+    for fconfig_index in range(len(config.SBFI.fault_model)):
+        fconfig = config.SBFI.fault_model[fconfig_index]
+        random.seed(fconfig.rand_seed + (batch.index if batch is not None else 0))
+        sample_size = batch.sizes[fconfig_index] if batch is not None else fconfig.sample_size
         # Select macrocells(targets) of the types specified in the faultload configuration
         nodetree = ET.parse(os.path.join(modelconf.work_dir, toolconf.injnode_list)).getroot()
         inj_nodes = ConfigNodes(modelconf.label, nodetree)
         nodelist = inj_nodes.get_all_by_typelist(fconfig.target_logic)
-        inj_code_items = []
-        for instance in nodelist:
-            inj_code_items = inj_code_items + get_injection_code_all(instance, faultdict, fconfig, 1.0, None)
-
-        for local_index in range(fconfig.sample_size):
-            c = random.sample(inj_code_items, fconfig.multiplicity)
+        if batch is not None:
+            nodelist = [i for i in nodelist if (i.type, fconfig.model + fconfig.modifier) not in batch.exclude]
+        inj_space = FaultSpace(nodelist, faultdict, fconfig)
+        if len(inj_space) < fconfig.multiplicity:
+            continue
+
+        for local_index in range(sample_size):
+            selected = random.sample(xrange(len(inj_space)), fconfig.multiplicity)
+            c = [inj_space.get(i) for i in selected]
+            instance_type = inj_space.node(selected[0]).type
             inj_time_base = get_random_injection_time(fconfig.time_start, fconfig.time_end, fconfig.time_mode, fconfig.multiplicity, 1.0, modelconf.clk_period, modelconf.workload_time)
             duration = random.uniform(fconfig.duration_min, fconfig.duration_max)
 
@@ -354,27 +511,28 @@ def sample_fault_generator(config, modelconf, toolconf, faultdict):
                             fname = "fault_" + str_index + "__checkpoint_0" + ".do"
                     if config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore:
                         inj_script += "\n\ndo {0}".format(toolconf.list_init_file)
-                    inj_script += "\nrun $ExecTime; config list -strobeperiod 1ns -strobestart [expr $now/1000] -usestrobe 1; run 1ns;"
                     dumpfilename = "dump_{0}_nodename.lst".format(str_index)
+                    run_cmd = early_stop_run(config, modelconf, toolconf, checkpoint_linked, max(inj_time) + duration, dumpfilename, [i[2] for i in c]) if (config.SBFI.early_stop and fconfig.trigger_expression == '') else "run $ExecTime"
+                    inj_script += "\n{0}; config list -strobeperiod 1ns -strobestart [expr $now/1000] -usestrobe 1; run 1ns;".format(run_cmd)
                     inj_script += "\nwrite list -events {0}/{1}".format(toolconf.result_dir, dumpfilename)
                     if config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore:
                         inj_script += "\nquit\n"
 
-                    robust_file_write(fname, inj_script)
                     sys.stdout.write('Stored script: {0:06d}\r'.format(script_index))
                     sys.stdout.flush()
-                    fdesclog_content += "\n" + str(script_index) + ";" + dumpfilename + ";" + c[0][0] + ";" + instance.type + ";" + c[0][1] + ";" + fconfig.model + fconfig.modifier + ";" + fconfig.forced_value + ";" + str(duration) + ";" + str(inj_time[0]) + ";" + str(int(modelconf.workload_time) - int(inj_time[0]))
+                    descriptor = str(script_index) + ";" + dumpfilename + ";" + c[0][0] + ";" + instance_type + ";" + c[0][1] + ";" + fconfig.model + fconfig.modifier + ";" + fconfig.forced_value + ";" + str(duration) + ";" + str(inj_time[0]) + ";" + str(int(modelconf.workload_time) - int(inj_time[0]))
                     if c[0][3] is not None:
-                        fdesclog_content += ';{0:.2f};{1:d};{2:s};'.format(c[0][3].total_time, c[0][3].effective_switches, c[0][3].profiled_value)
+                        descriptor += ';{0:.2f};{1:d};{2:s};'.format(c[0][3].total_time, c[0][3].effective_switches, c[0][3].profiled_value)
                     else:
-                        fdesclog_content += ';None;None;None;'
+                        descriptor += ';None;None;None;'
+                    descriptor += fconfig.trigger_expression.replace(';', ' ').replace('&apos', '') + ';'
+                    writer.add(fname, dumpfilename, inj_script, descriptor)
                     script_index += 1
-                    fdesclog_content += fconfig.trigger_expression.replace(';', ' ').replace('&apos', '') + ';'
-    robust_file_write(os.path.join(modelconf.work_dir, toolconf.result_dir, toolconf.exp_desc_file), fdesclog_content)
 
-    checkpoint_speedup = len(dT) * float(modelconf.workload_time) / (sum(dT))
-    print('CHECKPOINT SPEED-UP: {0:0.3f}'.format(checkpoint_speedup))
-    return(script_index)
+    if len(dT) > 0:
+        checkpoint_speedup = len(dT) * float(modelconf.workload_time) / (sum(dT))
+        print('CHECKPOINT SPEED-UP: {0:0.3f}'.format(checkpoint_speedup))
+    return writer.close()
 
 
 def mixed_faultload_generator(config, modelconf, toolconf, faultdict):
@@ -397,7 +555,7 @@ def mixed_faultload_generator(config, modelconf, toolconf, faultdict):
     checkpointlist = get_checkpoints(os.path.join(modelconf.work_dir, toolconf.checkpoint_dir))
 
     script_index = 0
-    fdesclog_content = "sep=;\nINDEX;DUMPFILE;TARGET;INSTANCE_TYPE;INJECTION_CASE;FAULT_MODEL;FORCED_VALUE;DURATION;TIME_INSTANCE;OBSERVATION_TIME;MAX_ACTIVITY_DURATION;EFFECTIVE_SWITHES;PROFILED_VALUE;ON_TRIGGER;"
+    writer = FaultloadWriter(config, modelconf, toolconf)
     scale_factor = float(modelconf.clk_period) / float(config.genconf.std_clk_period)
     for fconfig in config.injector.fault_model:
         # Select macrocells(targets) of the types specified in the faultload configuration
@@ -426,10 +584,11 @@ def mixed_faultload_generator(config, modelconf, toolconf, faultdict):
                     random.randint(h_start_time, h_end_time)
                     continue
                 # build the list of tuples (inj_case, inj_code, profiling_descriptor)
-                inj_code_items = get_injection_code_all(instance, faultdict, fconfig, scale_factor, None)
-
+                inj_space = FaultSpace([instance], faultdict, fconfig)
                 if fconfig.sample_size > 0:
-                    inj_code_items = random.sample(inj_code_items, 1)
+                    inj_code_items = [inj_space.get(i) for i in random.sample(xrange(len(inj_space)), 1)]
+                else:
+                    inj_code_items = [inj_space.get(i) for i in xrange(len(inj_space))]
                 # for i in inj_code_items: raw_input(str(i))
                 # for the instance from the same group as previous one: restore rand state to obtain the same random sequence
                 if instance.group != '' and instance.group == prev_desc[0]:
@@ -479,19 +638,94 @@ def mixed_faultload_generator(config, modelconf, toolconf, faultdict):
                     if config.injector.checkpoint_mode == CheckpointModes.ColdRestore:
                         inj_script += "\nquit\n"
 
-                    robust_file_write(fname, inj_script)
                     sys.stdout.write('Stored script {0}: {1:6d}\r'.format(c[1], script_index))
                     sys.stdout.flush()
-                    fdesclog_content += "\n" + str(script_index) + ";" + dumpfilename + ";" + c[0] + ";" + instance.type + ";" + c[1] + ";" + fconfig.model + fconfig.modifier + ";" + fconfig.forced_value + ";" + str(fconfig.duration_max) + ";" + str(inj_time[0]) + ";" + str(int(config.genconf.std_workload_time * scale_factor) - int(inj_time[0]))
+                    descriptor = str(script_index) + ";" + dumpfilename + ";" + c[0] + ";" + instance.type + ";" + c[1] + ";" + fconfig.model + fconfig.modifier + ";" + fconfig.forced_value + ";" + str(fconfig.duration_max) + ";" + str(inj_time[0]) + ";" + str(int(config.genconf.std_workload_time * scale_factor) - int(inj_time[0]))
                     if c[3] is not None:
-                        fdesclog_content += ';{0:.2f};{1:d};{2:s};'.format(c[3].total_time, c[3].effective_switches, c[3].profiled_value)
+                        descriptor += ';{0:.2f};{1:d};{2:s};'.format(c[3].total_time, c[3].effective_switches, c[3].profiled_value)
                     else:
-                        fdesclog_content += ';None;None;None;'
+                        descriptor += ';None;None;None;'
                     script_index += 1
-                    fdesclog_content += fconfig.trigger_expression.replace(';', ' ').replace('&apos', '') + ';'
+                    descriptor += fconfig.trigger_expression.replace(';', ' ').replace('&apos', '') + ';'
+                    writer.add(fname, dumpfilename, inj_script, descriptor)
+
+    return writer.close()
 
-    robust_file_write(os.path.join(modelconf.work_dir, toolconf.result_dir, toolconf.exp_desc_file), fdesclog_content)
-    return script_index
+
+def get_injection_case_code(instance, injection_rule, injection_case, fconfig):
+    """Injection code of an injection case with placeholders replaced (except the index #DIM)"""
+    inj_code = injection_rule.code_pattern.replace('#PATH', instance.name).replace('#FORCEDVALUE', fconfig.forced_value)
+    for node in injection_case.nodes:
+        inj_code = inj_code.replace(node.placeholder, node.nodename_pattern)
+    if len(fconfig.CCF) > 0:
+        inj_code = '\n\n'.join([inj_code.replace(fconfig.CCF[0], fconfig.CCF[ind]) for ind in range(0, len(fconfig.CCF))])
+    return inj_code
+
+
+class FaultSpace:
+    """Indexed fault space of a node list: the items of get_injection_code_all (without profiling)
+    for all nodes, enumerated in the same order but not materialized.
+
+    Injection cases of each macrocell type are taken once from the fault dictionary,
+    each node stores only the cumulative offset of its items; the injection code is rendered
+    only for the requested indexes (get), e.g. sampled with random.sample(xrange(len(space)), k).
+    """
+    def __init__(self, nodelist, faultdict, fconfig):
+        self.nodelist = nodelist
+        self.fconfig = fconfig
+        # per macrocell type: list of (injection_rule, injection_case, dimension sizes), cumulative item counts
+        self.cases = dict()
+        self.offsets = array('l', [0])
+        for instance in nodelist:
+            if instance.type not in self.cases:
+                self.cases[instance.type] = self.enumerate_cases(faultdict, instance.type)
+            self.offsets.append(self.offsets[-1] + self.cases[instance.type][1][-1])
+
+    def enumerate_cases(self, faultdict, macrocell):
+        segments, counts = [], [0]
+        faultdescriptor = faultdict.get_descriptor(self.fconfig.model, macrocell)
+        if faultdescriptor == None:
+            raw_input('Error: no descriptor found in dictionary for fault model: ' + str(self.fconfig.model) + '::' + macrocell)
+            return segments, counts
+        for injection_rule in faultdescriptor.injection_rules:
+            for injection_case in injection_rule.injection_cases:
+                dims = [(int(d.low_index), int(d.high_index) - int(d.low_index) + 1) for d in injection_case.dimensions[:2]]
+                size = 1
+                for d in dims:
+                    size *= max(d[1], 0)
+                # empty index range: single item without index (as in get_injection_code_all)
+                if size == 0:
+                    dims, size = [], 1
+                segments.append((injection_rule, injection_case, dims))
+                counts.append(counts[-1] + size)
+        return segments, counts
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def node(self, index):
+        """Node (InjectionNode) of the item at index"""
+        return self.nodelist[bisect_right(self.offsets, index) - 1]
+
+    def get(self, index):
+        """Item at index: (targeted node, injection case, fault injection script, None)"""
+        if index < 0 or index >= len(self):
+            raise IndexError('FaultSpace index out of range: {0}'.format(index))
+        node_index = bisect_right(self.offsets, index) - 1
+        instance = self.nodelist[node_index]
+        segments, counts = self.cases[instance.type]
+        local = index - self.offsets[node_index]
+        seg = bisect_right(counts, local) - 1
+        injection_rule, injection_case, dims = segments[seg]
+        inj_code = get_injection_case_code(instance, injection_rule, injection_case, self.fconfig)
+        if len(dims) == 0:
+            return (instance.name, injection_case.label, inj_code, None)
+        local -= counts[seg]
+        if len(dims) > 1:
+            dim = '({0})({1})'.format(dims[0][0] + local // dims[1][1], dims[1][0] + local % dims[1][1])
+        else:
+            dim = '({0})'.format(dims[0][0] + local)
+        return (instance.name, injection_case.label + dim, inj_code.replace('#DIM', dim), None)
 
 
 def get_injection_code_all(instance, faultdict, fconfig, scale_factor, PresimRes=None):
@@ -534,14 +768,7 @@ def get_injection_code_all(instance, faultdict, fconfig, scale_factor, PresimRes
                         else:
                             indset.append(('(' + str(index_high) + ')', None))
 
-                # replace placeholders
-                inj_code = injection_rule.code_pattern.replace('#PATH', instance.name).replace('#FORCEDVALUE', fconfig.forced_value)
-                for node in injection_case.nodes:
-                    inj_code = inj_code.replace(node.placeholder, node.nodename_pattern)
-
-                if len(fconfig.CCF) > 0:
-                    inj_code = '\n\n'.join([inj_code.replace(fconfig.CCF[0], fconfig.CCF[ind]) for ind in range(0, len(fconfig.CCF))])
-
+                inj_code = get_injection_case_code(instance, injection_rule, injection_case, fconfig)
                 if len(indset) == 0:
                     res.append((instance.name, injection_case.label, inj_code, None))
                 else:
@@ -56,12 +56,10 @@ def InitializeHDLModels(config, toolconf, c):
         observable_macrocells = ObservableMacrocellDict(
             ET.parse(os.path.join(config.call_dir, config.SBFI.fault_dictionary)).getroot().findall('observation_spec')[0])
         observable_macrocell_names = observable_macrocells.get_macrocells_names()
-        nodename_regexp = re.compile('(.+)\s\S')
         nodetype_regexp = re.compile('\((.+)\)')
     elif c.design_type == 'rtl':
         prim_list = ['signal']
         observable_macrocell_names = ['signal']
-        nodename_regexp = re.compile('\{(.+)\}')
 
     if os.path.exists(os.path.join(c.work_dir, toolconf.injnode_list)) and not config.SBFI.clean_run:
         print('{0}: Using existing list of fault targets'.format(c.label))
@@ -85,28 +83,11 @@ def InitializeHDLModels(config, toolconf, c):
             proc = subprocess.Popen(runscript, shell=True)
             proc.wait()
             print 'Appending nodes'
-            with open(os.path.join(c.work_dir, f_inj_instances), 'r') as f:
-                for s in f.readlines():
-                    x = DesignNode()
-                    if c.design_type == 'netlist':
-                        wt = re.findall('(.*)\s\((.*?)\)$', s)
-                        if len(wt) > 0:
-                            x.type = wt[0][-1].lower()
-                            x.name = wt[0][0]
-                        else:  # string does not match the pattern for netlist
-                            continue
-                    elif c.design_type == 'rtl':
-                        x.name = re.findall(nodename_regexp, s)[0]
-                        x.type = 'signal'
-                    full_path = x.name.split('/')
-                    x.name = full_path[-1]
-                    x.unit_path = '/'.join(full_path[:-1])
-                    if not x.unit_path.endswith('/'):  x.unit_path += '/'
-                    if x.type in prim_list:
-                        if cdata.find_node_by_type_and_name_and_unit(x.type, x.name, x.unit_path) == None:
-                            x.group = i.unit_path
-                            cdata.all_nodes.append(x)
-                            ent_types.add(x.type)
+            for x in parse_instance_log(os.path.join(c.work_dir, f_inj_instances), c.design_type):
+                if x.type in prim_list:
+                    x.group = i.unit_path
+                    if cdata.add_node(x):
+                        ent_types.add(x.type)
 
         for ent in ent_types:
             print('\tNodes of type [{0}] : {1}'.format(ent, len(cdata.get_nodes_by_type(cdata.all_nodes, ent))))
@@ -156,29 +137,11 @@ def InitializeHDLModels(config, toolconf, c):
             proc = subprocess.Popen(runscript, shell=True)
             proc.wait()
             print 'Appending nodes'
-            with open(os.path.join(c.work_dir, f_observ_instances), 'r') as f:
-                for s in f.readlines():
-                    x = DesignNode()
-                    if c.design_type == 'netlist':
-                        wt = re.findall('(.*)\s\((.*?)\)$', s)
-                        if len(wt) > 0:
-                            x.type = wt[0][-1].lower()
-                            x.name = wt[0][0]
-                        else:  # string does not match the pattern for netlist
-                            continue
-                    elif c.design_type == 'rtl':
-                        x.name = re.findall(nodename_regexp, s)[0]
-                        if x.name.endswith(')'): x.name = re.findall('(.*)\([0-9]+\)$', x.name)[0]
-                        if x.name.endswith(']'): x.name = re.findall('(.*)\[[0-9]+\]$', x.name)[0]
-                        x.type = 'signal'
-                        full_path = x.name.split('/')
-                        x.name = full_path[-1]
-                        x.unit_path = '/'.join(full_path[:-1])
-                        if not x.unit_path.endswith('/'):  x.unit_path += '/'
-                        if x.type in observable_macrocell_names:
-                            if cdata.find_node_by_type_and_name_and_unit(x.type, x.name, x.unit_path) is None:
-                                cdata.all_nodes.append(x)
-                                ent_types.add(x.type)
+            if c.design_type == 'rtl':
+                for x in parse_instance_log(os.path.join(c.work_dir, f_observ_instances), c.design_type, strip_index=True):
+                    if x.type in observable_macrocell_names:
+                        if cdata.add_node(x):
+                            ent_types.add(x.type)
 
             trace = "\n\n# Signals in scope: {0}\nenv {0}\n".format(i.unit_path)
             if c.design_type == 'rtl':
@@ -20,63 +20,422 @@ import datetime
 import time
 import random
 import glob
+import shlex
+import threading
+import Queue
 from Davos_Generic import *
 from Datamanager import *
 
 
-def execute_injection_scripts(config, toolconf, conf):
+# listener (optional): streaming analyzer (SBFI_Analyzer.StreamingAnalysis) notified about completed dumps
+def execute_injection_scripts(config, toolconf, conf, listener=None):
     if config.platform == Platforms.Grid or config.platform == Platforms.GridLight:
-        execute_injection_scripts_sge(config, toolconf, conf)
+        execute_injection_scripts_sge(config, toolconf, conf, listener)
     elif config.platform == Platforms.Multicore:
-        execute_injection_scripts_Multicore(config, toolconf, conf)
+        execute_injection_scripts_Multicore(config, toolconf, conf, listener)
 
 
-def execute_injection_scripts_sge(config, toolconf, conf):
+def load_completion_manifest(toolconf, conf):
+    """Returns the completion manifest of the faultload at conf.work_dir with the completion records read,
+       a faultload generated without manifest is scanned once (scripts and result dir) to build it"""
+    manifest = CompletionManifest(conf.work_dir, toolconf)
+    if not manifest.load():
+        print "Building completion manifest: " + manifest.manifest_file
+        mapping = []
+        fscriptlist = sorted([i for i in os.listdir(os.path.join(conf.work_dir, toolconf.script_dir)) if i.endswith('.do') and (i.startswith('fault_') or i.startswith('areference_'))])
+        for s in fscriptlist:
+            for i in range(0, 100):
+                try:
+                    with open(os.path.join(conf.work_dir, toolconf.script_dir, s), 'r') as ds:
+                        sr = ds.read()
+                except Exception as e:
+                    print 'read injection scripts exception [' + str(e) + '] on file read: ' + s + ', retrying [attempt ' + str(i) + ']'
+                    time.sleep(0.001)
+                    continue
+                break
+            mapping.append((s, re.findall('[a-zA-Z0-9_]+\.lst', sr)[0]))
+        manifest.write(mapping)
+        manifest.sync_results()
+    manifest.update()
+    print "Init scripts: {0}, Completed: {1}".format(manifest.size(), len(manifest.completed))
+    return manifest
+
+
+def notify_completed_dumps(running, listener, manifest=None):
+    """Passes the dumps of finished simulator processes to the listener and records them in the completion manifest,
+       returns the list of (proc, dumpname) still running"""
+    if listener is None and manifest is None:
+        return running
+    res, completed = [], []
+    for proc, dumpname in running:
+        if proc.poll() is None:
+            res.append((proc, dumpname))
+        else:
+            completed.append(dumpname)
+            if listener is not None:
+                listener.dump_completed(dumpname)
+    if manifest is not None:
+        manifest.record([d for d in completed if os.path.exists(os.path.join(manifest.work_dir, manifest.toolconf.result_dir, d))])
+    return res
+
+
+class CheckpointSchedule:
+    """Distributes fault scripts among workers grouped by checkpoint, minimizing the number of checkpoint restores
+       (one per checkpoint group of a worker) under the load bound: no worker exceeds the mean load by more than imbalance.
+       Groups are placed whole (largest first, best fit) while they fit into some worker, a group that does not fit
+       is split over the workers with the largest spare capacity, each piece filling its worker up to the bound,
+       so every split closes a worker: at most checkpoints + workers - 1 restores.
+       Load of a script is its simulation time (workload_time - checkpoint)"""
+
+    def __init__(self, scripts, workload_time, workers, imbalance=0.1):
+        self.size = len(scripts)
+        self.workload_time = float(workload_time)
+        groups = dict()
+        for s in scripts:
+            groups.setdefault(re.findall("checkpoint_[0-9]+", s)[0] + ".sim", []).append(s)
+        self.cost = dict((cp, max(self.workload_time - float(re.findall("[0-9]+", cp)[0]), 1.0)) for cp in groups)
+        # plan[worker] = [(checkpoint, [scripts]), ...], one entry (restore) per checkpoint of a worker
+        self.plan = [[] for i in range(workers)]
+        self.load = [0.0] * workers
+        total = sum(self.cost[cp] * len(lst) for cp, lst in groups.iteritems())
+        bound = max([total * (1.0 + imbalance) / workers] + self.cost.values())
+        for cp in sorted(groups, key=lambda k: (self.cost[k] * len(groups[k]), k), reverse=True):
+            lst, group_load = groups[cp], self.cost[cp] * len(groups[cp])
+            fit = [w for w in range(workers) if self.load[w] + group_load <= bound]
+            if len(fit) > 0:
+                self.assign(max(fit, key=lambda w: self.load[w]), cp, lst)
+                continue
+            while len(lst) > 0:
+                w = self.load.index(min(self.load))
+                n = int((bound - self.load[w]) / self.cost[cp])
+                if n <= 0:
+                    # all workers are full up to the bound (rounding): the rest goes to the least loaded one
+                    n = len(lst)
+                self.assign(w, cp, lst[:n])
+                lst = lst[n:]
+        # round-robin distribution by index (ind % workers), for comparison
+        self.roundrobin_restores, self.roundrobin_load = 0, [0.0] * workers
+        for w in range(workers):
+            cps = [re.findall("checkpoint_[0-9]+", s)[0] + ".sim" for s in scripts[w::workers]]
+            self.roundrobin_restores += len(set(cps))
+            self.roundrobin_load[w] = sum(self.cost[cp] for cp in cps)
+
+    def assign(self, worker, checkpoint, scripts):
+        if len(self.plan[worker]) > 0 and self.plan[worker][-1][0] == checkpoint:
+            self.plan[worker][-1][1].extend(scripts)
+        else:
+            self.plan[worker].append((checkpoint, list(scripts)))
+        self.load[worker] += self.cost[checkpoint] * len(scripts)
+
+    def restores(self):
+        return sum(len(p) for p in self.plan)
+
+    def checkpoint_speedup(self):
+        return self.size * self.workload_time / max(sum(self.load), 1.0)
+
+    def expected_speedup(self):
+        """Simulation of all faults from time 0 on a single worker vs. the most loaded worker"""
+        return self.size * self.workload_time / max(max(self.load), 1.0)
+
+    def achieved_speedup(self, busy_time, wall_time):
+        """busy_time: sum of simulation time [s] measured over all workers; scaled to the simulation from time 0"""
+        if busy_time <= 0 or wall_time <= 0:
+            return 0.0
+        return busy_time * self.checkpoint_speedup() / wall_time
+
+    @staticmethod
+    def imbalance(load):
+        mean = sum(load) / max(len(load), 1)
+        return max(load) / mean if mean > 0 else 1.0
+
+    def report(self):
+        print('CHECKPOINT SCHEDULE: {0} scripts, {1} checkpoints, {2} workers, checkpoint restores: {3}, load imbalance: {4:0.3f} (round-robin: {5} restores, load imbalance {6:0.3f})'.format(
+            self.size, len(self.cost), len(self.plan), self.restores(), CheckpointSchedule.imbalance(self.load),
+            self.roundrobin_restores, CheckpointSchedule.imbalance(self.roundrobin_load)))
+        print('EXPECTED SPEED-UP: checkpoint {0:0.3f}, checkpoint x parallel {1:0.3f}'.format(self.checkpoint_speedup(), self.expected_speedup()))
+
+    def report_achieved(self, busy_time, wall_time):
+        print('ACHIEVED SPEED-UP: {0:0.3f} (expected {1:0.3f}), busy time {2:0.1f} s, wall time {3:0.1f} s'.format(
+            self.achieved_speedup(busy_time, wall_time), self.expected_speedup(), busy_time, wall_time))
+
+
+class SimulatorWorker:
+    """Long-lived simulator session (vsim -c) driven through stdin, runs fault scripts one after another.
+       Between the runs the session is restored to the checkpoint of the next script (as in WarmRestore),
+       completion of each script is detected by a marker printed after it"""
+    DoneMarker = 'DAVOS_SIM_DONE'
+
+    def __init__(self, index, toolconf, timeout=0):
+        self.index = index
+        self.toolconf = toolconf
+        self.timeout = timeout
+        self.proc = None
+        self.checkpoint = None
+        self.fresh = False
+        self.markers = None
+        self.marker_cnt = 0
+        self.runs = 0
+        self.restarts = 0
+        self.failures = 0
+        self.busy = 0.0
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self, checkpoint):
+        self.stop()
+        cmd = "{0} -c -restore {1}/{2}".format(self.toolconf.simulator, self.toolconf.checkpoint_dir, checkpoint)
+        self.proc = subprocess.Popen(shlex.split(cmd), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.markers = Queue.Queue()
+        reader = threading.Thread(target=self.read_output, args=(self.proc, self.markers, os.path.join(self.toolconf.log_dir, 'pool_{0:03d}.log'.format(self.index))))
+        reader.daemon = True
+        reader.start()
+        # session-level checkpoint, restored before every next run (as in WarmRestore)
+        self.send("checkpoint {0}/pool_{1:03d}.sim".format(self.toolconf.dataset_dir, self.index))
+        self.checkpoint = checkpoint
+        self.fresh = True
+        self.restarts += 1
+
+    def read_output(self, proc, markers, logfile):
+        with open(logfile, 'a') as log:
+            for line in iter(proc.stdout.readline, ''):
+                log.write(line)
+                log.flush()
+                match = re.search(SimulatorWorker.DoneMarker + ' ([0-9]+)', line)
+                if match:
+                    markers.put(int(match.group(1)))
+        markers.put(None)
+
+    def send(self, cmd):
+        self.proc.stdin.write(cmd + '\n')
+        self.proc.stdin.flush()
+
+    def run(self, script, checkpoint, content):
+        """Runs one fault script (content), returns True if the session completed it within the timeout"""
+        time_start = time.time()
+        try:
+            res = self.execute(script, checkpoint, content)
+        finally:
+            self.busy += time.time() - time_start
+        return res
+
+    def execute(self, script, checkpoint, content):
+        try:
+            if not self.alive() or self.checkpoint != checkpoint:
+                self.start(checkpoint)
+            # the session outlives the script: drop quit from the copy it executes
+            content = '\n'.join(l for l in content.split('\n') if not l.strip().startswith('quit'))
+            pooldofile = '{0}/pool_{1:03d}.do'.format(self.toolconf.script_dir, self.index)
+            robust_file_write(pooldofile, content + '\n')
+            if not self.fresh:
+                self.send("restore {0}/pool_{1:03d}.sim".format(self.toolconf.dataset_dir, self.index))
+                self.send("if { [catch {nowhen *} err] } {}")
+                self.send("catch {delete list *}")
+            self.fresh = False
+            self.marker_cnt += 1
+            self.send("do {0}".format(pooldofile))
+            # marker is matched in upper case, the echo of this command does not match
+            self.send("puts \"[string toupper {0}] {1}\"; flush stdout".format(SimulatorWorker.DoneMarker.lower(), self.marker_cnt))
+        except (IOError, OSError):
+            self.failures += 1
+            self.kill()
+            return False
+        time_start = time.time()
+        while True:
+            try:
+                marker = self.markers.get(timeout=1.0)
+            except Queue.Empty:
+                if self.timeout > 0 and time.time() - time_start > self.timeout:
+                    self.failures += 1
+                    self.kill()
+                    return False
+                continue
+            if marker is None:
+                # simulator crashed/exited during the run
+                self.failures += 1
+                self.kill()
+                return False
+            if marker == self.marker_cnt:
+                self.runs += 1
+                return True
+
+    def stop(self):
+        if self.alive():
+            try:
+                self.send('quit -f')
+                for i in range(50):
+                    if self.proc.poll() is not None:
+                        break
+                    time.sleep(0.1)
+            except (IOError, OSError):
+                pass
+        self.kill()
+
+    def kill(self):
+        if self.alive():
+            try:
+                self.proc.kill()
+            except OSError:
+                pass
+        if self.proc is not None:
+            self.proc.wait()
+        self.proc = None
+        self.checkpoint = None
+
+
+class SimulatorPool:
+    """Persistent simulator sessions (one per worker of the CheckpointSchedule plan), each runs the fault scripts
+       of its plan checkpoint by checkpoint. A worker that has completed its plan takes the scripts from the tail
+       of the longest remaining queue (preferring its current checkpoint), which balances the actual run times.
+       Failed scripts (crash/timeout) are re-queued up to retries times, the session is restarted"""
+
+    def __init__(self, config, toolconf, conf, plan, dumpnames, retries=2, manifest=None):
+        self.toolconf = toolconf
+        self.conf = conf
+        self.dumpnames = dumpnames
+        self.manifest = manifest
+        self.retries = retries
+        # queues[worker] = [(script, checkpoint), ...] in reverse order of the plan (next task at the end)
+        self.queues = []
+        for worker_plan in plan:
+            self.queues.append([(s, checkpoint) for checkpoint, lst in reversed(worker_plan) for s in reversed(lst)])
+        self.attempts = dict()
+        self.lock = threading.Lock()
+        self.completed = Queue.Queue()
+        self.failed = []
+        self.workers = [SimulatorWorker(i, toolconf, config.SBFI.sim_timeout) for i in range(len(plan))]
+        self.threads = []
+
+    def next_task(self, worker):
+        with self.lock:
+            queue = self.queues[worker.index]
+            if len(queue) > 0:
+                return queue.pop()
+            # own plan completed: take over the last script of a queue at the current checkpoint,
+            # or of the longest queue if it has more than one script left (a restore is not worth the last one)
+            same = [q for q in self.queues if len(q) > 0 and q[0][1] == worker.checkpoint]
+            longest = max(same if len(same) > 0 else self.queues, key=len)
+            if len(longest) == 0 or (len(same) == 0 and len(longest) < 2):
+                return None
+            return longest.pop(0)
+
+    def task_failed(self, worker, script, checkpoint):
+        dumpfile = os.path.join(self.conf.work_dir, self.toolconf.result_dir, self.dumpnames[script])
+        if os.path.exists(dumpfile):
+            os.remove(dumpfile)
+        with self.lock:
+            self.attempts[script] = self.attempts.get(script, 0) + 1
+            if self.attempts[script] <= self.retries:
+                self.queues[worker.index].append((script, checkpoint))
+            else:
+                self.failed.append(script)
+
+    def worker_loop(self, worker):
+        while True:
+            task = self.next_task(worker)
+            if task is None:
+                break
+            script, checkpoint = task
+            try:
+                content = self.script_content(script)
+            except (IOError, OSError):
+                self.task_failed(worker, script, checkpoint)
+                continue
+            if worker.run(script, checkpoint, content):
+                self.completed.put(self.dumpnames[script])
+            else:
+                self.task_failed(worker, script, checkpoint)
+        worker.stop()
+
+    def script_content(self, script):
+        if self.manifest is not None:
+            return self.manifest.script_content(script)
+        with open(os.path.join(self.conf.work_dir, self.toolconf.script_dir, script), 'r') as src:
+            return src.read()
+
+    def start(self):
+        for w in self.workers:
+            t = threading.Thread(target=self.worker_loop, args=(w,))
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def active(self):
+        return len([t for t in self.threads if t.is_alive()])
+
+    def collect(self):
+        """Returns the dumps completed since the last call"""
+        res = []
+        while True:
+            try:
+                res.append(self.completed.get_nowait())
+            except Queue.Empty:
+                return res
+
+    def stop(self):
+        with self.lock:
+            for v in self.queues:
+                del v[:]
+        for t in self.threads:
+            t.join()
+
+    def busy_time(self):
+        return sum(w.busy for w in self.workers)
+
+    def summary(self):
+        res = "Simulator pool: {0} sessions, {1} runs, {2} (re)starts, {3} failed runs, {4} scripts given up".format(
+            len(self.workers), sum(w.runs for w in self.workers), sum(w.restarts for w in self.workers),
+            sum(w.failures for w in self.workers), len(self.failed))
+        for script in self.failed:
+            res += "\n\tFailed: {0}".format(script)
+        return res
+
+
+def pool_completed_dumps(pool, listener, manifest):
+    res = pool.collect()
+    for dumpname in res:
+        if listener is not None:
+            listener.dump_completed(dumpname)
+    if manifest is not None:
+        manifest.record([d for d in res if os.path.exists(os.path.join(manifest.work_dir, manifest.toolconf.result_dir, d))])
+    return len(res)
+
+
+def run_simulator_pool(config, toolconf, conf, schedule, dumpnames, listener=None, manifest=None):
+    pool = SimulatorPool(config, toolconf, conf, schedule.plan, dumpnames, manifest=manifest)
+    pool.start()
+    tasksize, tracenum = schedule.size, 0
+    TME_Start = time.time()
+    try:
+        while pool.active() > 0:
+            tracenum += pool_completed_dumps(pool, listener, manifest)
+            if listener is not None:
+                listener.poll()
+            console_message("Progress: {0:5d}/{1:5d}, Pooled sessions: {2:5d}, Remaining time: {3:.2f} minutes{4}".format(
+                tracenum, tasksize, pool.active(),
+                (float(time.time()) - float(TME_Start)) * (float(tasksize - tracenum) / float(tracenum + 1)) / float(60),
+                (', ' + listener.status()) if listener is not None else ''), ConsoleColors.Green, True)
+            time.sleep(0.2)
+    finally:
+        pool.stop()
+    pool_completed_dumps(pool, listener, manifest)
+    print "\n" + pool.summary()
+    return pool
+
+
+def execute_injection_scripts_sge(config, toolconf, conf, listener=None):
     # raw_input("RUNNING execute_injection_scripts_SGE....any key to continue...")
     task_run_at = 0
     time_start = datetime.datetime.now().replace(microsecond=0)
     remaining_jobs = True
+    manifest = load_completion_manifest(toolconf, conf)
     while remaining_jobs:
         task_run_at += 1
         work_label = conf.label + '_sm_atmpt_' + str(task_run_at) + '_'
-        # Get the list of injection script files in ./iscripts directory
-        fscriptlist = []
-        print "\n\nReading the list of fault injection scripts: " + conf.work_dir
-        os.chdir(os.path.join(conf.work_dir, toolconf.script_dir))
-        dolist = glob.glob('*.do')
-        for i in dolist:
-            if i.startswith('fault_') or i.startswith('areference_'):
-                fscriptlist.append(i)
-        fscriptlist.sort()
-        compl_simdumps = os.listdir(os.path.join(conf.work_dir, toolconf.result_dir))
-        print "Init scripts: {0}, Existing ResFiles: {1}".format(str(len(fscriptlist)), str(len(compl_simdumps)))
-        checked_list = []
-        if len(compl_simdumps) < 3:
-            checked_list.extend(fscriptlist)
-        else:
-            for s in fscriptlist:
-                for i in range(0, 100):
-                    try:
-                        with open(s, 'r') as ds:
-                            sr = ds.read()
-                    except Exception as e:
-                        print 'read injection scripts exception [' + str(e) + '] on file write: ' + s + ', retrying [attempt ' + str(i) + ']'
-                        time.sleep(0.001)
-                        continue
-                    break
-                dumpname = re.findall('[a-zA-Z0-9_]+\.lst', sr)[0]
-                # if not os.path.exists(os.path.join(conf.work_dir, toolconf.result_dir, dumpname)):
-                if dumpname not in compl_simdumps:
-                    checked_list.append(s)
-                    sys.stdout.write('Appending to run queue [{0}]: {1}\r'.format(str(len(checked_list)), s))
-                    sys.stdout.flush()
-                # elif config.SBFI.reference_check_pattern != '':
-                #     with open(os.path.join(conf.work_dir, toolconf.result_dir, dumpname), 'r') as dmpfile:
-                #         buf = dmpfile.read()
-                #         if buf.find(config.SBFI.reference_check_pattern) < 0:
-                #             checked_list.append(s)
+        manifest.update()
+        checked_list = manifest.pending()
         # if grid IO error occur (no dump file after script completion) - let 0.1% of scripts to be bypassed (0.1% error margin)
-        if len(checked_list) < int(0.001 * len(fscriptlist)):
+        if len(checked_list) < int(0.001 * manifest.size()):
             break
 
         print "Scripts to Execute [" + str(len(checked_list)) + "] "
@@ -89,43 +448,25 @@ def execute_injection_scripts_sge(config, toolconf, conf):
             if tasksize < config.maxproc:
                 taskproc = tasksize
             print "TASKPROC = " + str(taskproc)
+            # scripts grouped by checkpoint: each job copies/restores only the checkpoints of its batches
+            schedule = CheckpointSchedule(checked_list, conf.workload_time, taskproc)
+            schedule.report()
             shell_script_list = []
             if config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore:
-                checkpoint_set = []
                 for ind in range(0, taskproc, 1):
                     shell_script_list.append("")
-                    checkpoint_set.append(set())
-                for ibase in range(0, tasksize, taskproc):
-                    for ind in range(ibase, ibase + taskproc, 1):
-                        if (ind < tasksize):
-                            sim_script = ""
-                            checkpoint = re.findall("checkpoint_[0-9]+", checked_list[ind])[0] + ".sim"
-                            if not checkpoint in checkpoint_set[ind - ibase]:
-                                sim_script += "\ncp {0}/{1} $TMP/{2}".format(toolconf.checkpoint_dir, checkpoint, checkpoint)
-                                checkpoint_set[ind - ibase].add(checkpoint)
-                            sim_script += "\nvsim -c -restore $TMP/{0}".format(checkpoint)
-                            sim_script += " -do \"do " + toolconf.script_dir + "/" + checked_list[ind] + "\""
-                            sim_script += " > " + toolconf.log_dir + '/log_' + checked_list[ind].replace('.do', '.log')
-                            # sim_script += " > $TMP/log_{0}".format(checked_list[ind].replace('.do', '.log'))
-                            # sim_script += "\nrm " + './idatasets/WLFSET_{0}.wlf'.format(re.findall('[0-9]+',checked_list[ind])[0])
-                            shell_script_list[ind - ibase] += sim_script
+                    for checkpoint, lst in schedule.plan[ind]:
+                        sim_script = "\ncp {0}/{1} $TMP/{2}".format(toolconf.checkpoint_dir, checkpoint, checkpoint)
+                        for s in lst:
+                            sim_script += "\n{0} -c -restore $TMP/{1}".format(toolconf.simulator, checkpoint)
+                            sim_script += " -do \"{0}\"".format(manifest.script_command(s))
+                            sim_script += " > " + toolconf.log_dir + '/log_' + s.replace('.do', '.log')
+                            sim_script += "\n" + manifest.record_shell(manifest.dumpnames[s], work_label + str("%03d" % ind))
+                        shell_script_list[ind] += sim_script
             elif config.SBFI.checkpoint_mode == CheckpointModes.WarmRestore:
-                checkpoint_dict = []
                 for ind in range(0, taskproc, 1):
                     shell_script_list.append("")
-                    checkpoint_dict.append(dict())
-                for ibase in range(0, tasksize, taskproc):
-                    for ind in range(ibase, ibase + taskproc, 1):
-                        if (ind < tasksize):
-                            checkpoint = re.findall("checkpoint_[0-9]+", checked_list[ind])[0] + ".sim"
-                            if checkpoint in checkpoint_dict[ind - ibase]:
-                                lst = checkpoint_dict[ind - ibase][checkpoint]
-                            else:
-                                lst = []
-                                checkpoint_dict[ind - ibase][checkpoint] = lst
-                            lst.append(checked_list[ind])
-                for ind in range(0, taskproc, 1):
-                    for cp, lst in checkpoint_dict[ind].iteritems():
+                    for cp, lst in schedule.plan[ind]:
                         globaldofile = toolconf.script_dir + '/sim_' + str(ind) + '_' + cp.replace('.sim', '.do')
                         with open(globaldofile, 'w') as dofile:
                             dofile.write("set PTH $::env(TMP)\nset WLFFilename ${{PTH}}/WLFSET_{0}.wlf\nset WLFDeleteOnQuit 1".format(ind))
@@ -135,13 +476,16 @@ def execute_injection_scripts_sge(config, toolconf, conf):
                             for l in lst:
                                 dofile.write("\n\nrestore $::env(TMP)/cpoint_{0}.sim".format(str(ind)))
                                 dofile.write("\nif { [catch {nowhen *} err] } {}")
-                                dofile.write("\ndo " + toolconf.script_dir + "/" + l)
+                                dofile.write("\n" + manifest.script_command(l))
+                                dofile.write("\n" + manifest.record_tcl(manifest.dumpnames[l], work_label + str("%03d" % ind)))
                             dofile.write("\nquit\n")
-                        shell_script_list[ind] += "\nvsim -c -restore {0}/{1} -do \"do {2}\" > {3}/log_{4}.log".format(toolconf.checkpoint_dir, cp, globaldofile, toolconf.log_dir, str(ind))
+                        shell_script_list[ind] += "\n{0} -c -restore {1}/{2} -do \"do {3}\" > {4}/log_{5}.log".format(toolconf.simulator, toolconf.checkpoint_dir, cp, globaldofile, toolconf.log_dir, str(ind))
 
             # Run the simulation (Submit the jobs)
             create_restricted_file('vsim.wlf')
             for ind in range(0, taskproc, 1):
+                if shell_script_list[ind] == "":
+                    continue
                 # normalize the script
                 shell_script_list[ind] = shell_script_list[ind][1:]
                 robust_file_write("./ilogs/shfile_" + str(ind) + ".sh", shell_script_list[ind])
@@ -167,9 +511,8 @@ def execute_injection_scripts_sge(config, toolconf, conf):
         #     joblst = get_queue_state_by_job_prefix(work_label)
         #     remaining_jobs = True
         joblst_prev = joblst
-        resdir = os.path.join(conf.work_dir, toolconf.result_dir)
-        prev_resdirstate = Dirstate(resdir)
-        full_jobset_size = len(fscriptlist)
+        # progress is tracked by the completion records appended by the jobs (no listing of the result dir)
+        prev_completed, prev_completed_time = len(manifest.completed), time.time()
 
         while joblst.total_len() > 0:
             time.sleep(30)
@@ -177,17 +520,20 @@ def execute_injection_scripts_sge(config, toolconf, conf):
             if (len(joblst.running) != len(joblst_prev.running) or len(joblst.pending) != len(joblst_prev.pending)):
                 joblst_prev = joblst
             t_queue_not_changed = joblst.time_difference_to_sec(joblst_prev)
-            current_resdirstate = Dirstate(resdir)
-            if current_resdirstate.nfiles >= full_jobset_size + 1:
+            manifest.update()
+            if len(manifest.completed) >= manifest.size():
                 if (len(joblst.running) > 0) or (len(joblst.pending) > 0):
                     print commands.getoutput('qdel -f -u tuil')
                 remaining_jobs = True
                 break
 
-            if (current_resdirstate.nfiles > prev_resdirstate.nfiles):
-                prev_resdirstate = current_resdirstate
-            t_resdir_not_changed = current_resdirstate.time_difference_to_sec(prev_resdirstate)
-            print "Running: " + str(len(joblst.running)) + ",\tPending: " + str(len(joblst.pending)) + ", \tQueue not changed since: " + str(t_queue_not_changed) + " [sec] / Max: " + str(simtime_max_sec) + ", \tRes_Files: " + str(current_resdirstate.nfiles) + " / " + str(full_jobset_size) + " not changed since: " + str(t_resdir_not_changed) + " [sec]"
+            if len(manifest.completed) > prev_completed:
+                prev_completed, prev_completed_time = len(manifest.completed), time.time()
+            t_resdir_not_changed = int(time.time() - prev_completed_time)
+            print "Running: " + str(len(joblst.running)) + ",\tPending: " + str(len(joblst.pending)) + ", \tQueue not changed since: " + str(t_queue_not_changed) + " [sec] / Max: " + str(simtime_max_sec) + ", \tCompleted: " + str(len(manifest.completed)) + " / " + str(manifest.size()) + " not changed since: " + str(t_resdir_not_changed) + " [sec]"
+            if listener is not None:
+                listener.poll()
+                print listener.status()
             if t_resdir_not_changed > 500:  # queue hang - remove remaining jobs and restart
                 print 'Clearing the Queue...'
                 res = commands.getoutput('qdel -f -u tuil')
@@ -210,8 +556,8 @@ def execute_injection_scripts_sge(config, toolconf, conf):
             #        otd_wlf_cnt += 1
             #        if(tmodif < otd_wlf_mod_time_min): otd_wlf_mod_time_min = tmodif
             # print "Removed " + str(otd_wlf_cnt) + " *wlft files, not modified since: " + str(otd_wlf_mod_time_min)
-        current_resdirstate = Dirstate(resdir)
-        if (current_resdirstate.nfiles < full_jobset_size):
+        manifest.update()
+        if len(manifest.completed) < manifest.size():
             remaining_jobs = True
         if (remaining_jobs == False):
             print "FINISHED SIMULATION FOR: " + conf.work_dir
@@ -240,59 +586,48 @@ def execute_injection_scripts_sge(config, toolconf, conf):
             #    sys.exit()
 
 
-def execute_injection_scripts_Multicore(config, toolconf, conf):
+def execute_injection_scripts_Multicore(config, toolconf, conf, listener=None):
     print "\n\nStarting fault injection: " + conf.work_dir
-    os.chdir(os.path.join(conf.work_dir, toolconf.script_dir))
-    fscriptlist = sorted([i for i in glob.glob('*.do') if i.startswith('fault_') or i.startswith('areference_')])
-    print "Init scripts: {0}".format(len(fscriptlist))
-    checked_list = []
-    for s in fscriptlist:
-        with open(s, 'r') as ds:
-            dumpname = re.findall('[a-zA-Z0-9_]+\.lst', ds.read())[0]
-            if not os.path.exists(os.path.join(conf.work_dir, toolconf.result_dir, dumpname)):
-                checked_list.append(s)
+    manifest = load_completion_manifest(toolconf, conf)
+    checked_list = manifest.pending()
+    dumpnames = manifest.dumpnames
     print("Scripts to Execute: {0}".format(len(checked_list)))
 
     tasksize = len(checked_list)
     os.chdir(conf.work_dir)
     create_restricted_file('vsim.wlf')
     proclist = []
+    running = []
     time_start = datetime.datetime.now().replace(microsecond=0)
 
     TME_Start = time.time()
-    if config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore:
+    busy_time = 0.0
+    schedule = CheckpointSchedule(checked_list, conf.workload_time, config.maxproc)
+    schedule.report()
+    if config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore and config.SBFI.simulator_pool:
+        busy_time = run_simulator_pool(config, toolconf, conf, schedule, dumpnames, listener, manifest).busy_time()
+
+    elif config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore:
         for ind in range(0, tasksize, 1):
             checkpoint = re.findall("checkpoint_[0-9]+", checked_list[ind])[0] + ".sim"
-            sim_script = "vsim -c -restore {0}/{1} -do \"do {2}/{3}\" > {4}/log_{5:06d}.log".format(toolconf.checkpoint_dir, checkpoint,
-                                                                                                    toolconf.script_dir, checked_list[ind],
-                                                                                                    toolconf.log_dir, ind)
+            sim_script = "{0} -c -restore {1}/{2} -do \"{3}\" > {4}/log_{5:06d}.log".format(toolconf.simulator, toolconf.checkpoint_dir, checkpoint,
+                                                                                            manifest.script_command(checked_list[ind]), toolconf.log_dir, ind)
             while get_active_proc_number(proclist) >= config.maxproc:
+                running = notify_completed_dumps(running, listener, manifest)
                 time.sleep(0.2)
             proc = subprocess.Popen(sim_script, shell=True)
             proclist.append(proc)
-            console_message("Progress: {0:5d}/{1:5d}, Running proc: {2:5d}, Remaining time: {3:.2f} minutes".format(
+            running.append((proc, dumpnames[checked_list[ind]]))
+            console_message("Progress: {0:5d}/{1:5d}, Running proc: {2:5d}, Remaining time: {3:.2f} minutes{4}".format(
                 ind, tasksize, get_active_proc_number(proclist),
-                (float(time.time()) - float(TME_Start)) * (float(tasksize - ind) / float(ind + 1)) / float(60)), ConsoleColors.Green, True)
+                (float(time.time()) - float(TME_Start)) * (float(tasksize - ind) / float(ind + 1)) / float(60),
+                (', ' + listener.status()) if listener is not None else ''), ConsoleColors.Green, True)
 
     elif config.SBFI.checkpoint_mode == CheckpointModes.WarmRestore:
         shell_script_list = []
-        checkpoint_dict = []
-        taskproc = config.maxproc
-        for ind in range(0, taskproc, 1):
+        for ind in range(len(schedule.plan)):
             shell_script_list.append("")
-            checkpoint_dict.append(dict())
-        for ibase in range(0, tasksize, taskproc):
-            for ind in range(ibase, ibase + taskproc, 1):
-                if (ind < tasksize):
-                    checkpoint = re.findall("checkpoint_[0-9]+", checked_list[ind])[0] + ".sim"
-                    if checkpoint in checkpoint_dict[ind - ibase]:
-                        lst = checkpoint_dict[ind - ibase][checkpoint]
-                    else:
-                        lst = []
-                        checkpoint_dict[ind - ibase][checkpoint] = lst
-                    lst.append(checked_list[ind])
-        for ind in range(0, taskproc, 1):
-            for cp, lst in checkpoint_dict[ind].iteritems():
+            for cp, lst in schedule.plan[ind]:
                 globaldofile = toolconf.script_dir + '/sim_' + str(ind) + '_' + cp.replace('.sim', '.do')
                 with open(globaldofile, 'w') as dofile:
                     dofile.write("catch {{ set WLFFilename {0}/WLFSET_{1}.wlf}}\nset WLFDeleteOnQuit 1".format(toolconf.dataset_dir, ind))
@@ -302,28 +637,48 @@ def execute_injection_scripts_Multicore(config, toolconf, conf):
                     for l in lst:
                         dofile.write("\n\nrestore {0}/cpoint_{1}.sim".format(toolconf.dataset_dir, str(ind)))
                         dofile.write("\nif { [catch {nowhen *} err] } {}")
-                        dofile.write("\ndo {0}/{1}".format(toolconf.script_dir, l))
+                        dofile.write("\n" + manifest.script_command(l))
+                        dofile.write("\n" + manifest.record_tcl(dumpnames[l], 'multicore_{0:03d}'.format(ind)))
                     dofile.write("\nquit\n")
-                shell_script_list[ind] += "\nvsim -c -restore {0}/{1} -do \"do {2}\" > {3}/log_{4:d}.log".format(toolconf.checkpoint_dir, cp, globaldofile, toolconf.log_dir, ind)
+                shell_script_list[ind] += "\n{0} -c -restore {1}/{2} -do \"do {3}\" > {4}/log_{5:d}.log".format(toolconf.simulator, toolconf.checkpoint_dir, cp, globaldofile, toolconf.log_dir, ind)
         for ind in range(len(shell_script_list)):
+            if shell_script_list[ind] == "":
+                continue
             script_file = "{0}/shfile_{1}.sh".format(toolconf.script_dir, str(ind))
             robust_file_write(script_file, shell_script_list[ind][1:])
             #if not script_file.startswith('./'): script_file = './{0}'.format(script_file)
             proc = subprocess.Popen('./{0}'.format(script_file), shell=True)
             proclist.append(proc)
             print 'Simulation started: ' + script_file
+    proc_finished = dict()
     while get_active_proc_number(proclist) > 0:
-        tracenum = len(os.listdir(os.path.join(conf.work_dir, toolconf.result_dir))) - 2
+        for p in proclist:
+            if p.poll() is not None and p not in proc_finished:
+                proc_finished[p] = time.time()
+        running = notify_completed_dumps(running, listener, manifest)
+        if listener is not None:
+            # WarmRestore: several dumps per simulator process, picked up from the result dir
+            listener.poll()
+            tracenum = len(checked_list) - len(running) if config.SBFI.checkpoint_mode == CheckpointModes.ColdRestore else len(listener.injsummary)
+        else:
+            manifest.update()
+            tracenum = len(manifest.completed) - (manifest.size() - tasksize)
         try:
-            console_message("Active simulations: {0}, Traces stored: {1}/{2}, Remaining time: {3:.2f} minutes\r".format(
+            console_message("Active simulations: {0}, Traces stored: {1}/{2}, Remaining time: {3:.2f} minutes{4}\r".format(
                 len(get_active_proc_indexes(proclist)), tracenum, tasksize,
-                (float(time.time()) - float(TME_Start)) * (float(tasksize - tracenum) / float(tracenum + 1)) / float(60)), ConsoleColors.Green, True)
+                (float(time.time()) - float(TME_Start)) * (float(tasksize - tracenum) / float(tracenum + 1)) / float(60),
+                (', ' + listener.status()) if listener is not None else ''), ConsoleColors.Green, True)
         except:
             pass
         time.sleep(5)
+    running = notify_completed_dumps(running, listener, manifest)
     time_stop = datetime.datetime.now().replace(microsecond=0)
     time_taken = time_stop - time_start
     print "\n\tTotal Simulation Time: " + str(time_taken)
+    if config.SBFI.checkpoint_mode == CheckpointModes.WarmRestore:
+        busy_time = sum(proc_finished.get(p, time.time()) - TME_Start for p in proclist)
+    if busy_time > 0:
+        schedule.report_achieved(busy_time, time.time() - TME_Start)
     os.chdir(conf.work_dir)
     for w in glob.glob('wlft*'):
         try:
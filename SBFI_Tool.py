@@ -24,6 +24,7 @@ import time
 import random
 import glob
 import copy
+import hashlib
 from Davos_Generic import *
 from Datamanager import *
 from SBFI.SBFI_Initializer import *
@@ -120,7 +121,14 @@ def golden_run(config, toolconfig, c):
     """
     os.chdir(c.work_dir)
     fscript = os.path.join(c.work_dir, toolconfig.script_dir, "areference__checkpoint_0.do")
-    if not os.path.exists(os.path.join(c.work_dir, toolconfig.result_dir, toolconfig.reference_file)):
+    # early stop: golden-run state snapshots at the clustering checkpoints
+    snapshots = get_state_snapshots(config, c, toolconfig) if config.SBFI.early_stop else []
+    run_cmd = "run $ExecTime"
+    if len(snapshots) > 0:
+        run_cmd = "do {0}\n        davos_run_snapshots [concat $davos_state_signals $davos_target_signals] {{{1}}} {2}".format(
+            write_early_stop_script(config, c, toolconfig), ' '.join('{0} {1}'.format(t, f) for t, f in snapshots), c.workload_time)
+    if not os.path.exists(os.path.join(c.work_dir, toolconfig.result_dir, toolconfig.reference_file)) or \
+            not all(os.path.exists(os.path.join(c.work_dir, f)) for t, f in snapshots):
         reference_script = """
         catch {{set WLFFilename ./idatasets/WLFSET_REFERENCE.wlf}}
         set WLFFileLock 0
@@ -128,11 +136,11 @@ def golden_run(config, toolconfig, c):
         transcript file {0}/log_reference.txt
         set ExecTime {1}ns
         do {2}
-        run $ExecTime
+        {5}
         config list -strobeperiod 1ns -strobestart [expr $now/1000] -usestrobe 1; run 1ns;
         write list -events {3}/{4}
         quit
-        """.format(toolconfig.log_dir, c.workload_time, toolconfig.list_init_file, toolconfig.result_dir, toolconfig.reference_file)
+        """.format(toolconfig.log_dir, c.workload_time, toolconfig.list_init_file, toolconfig.result_dir, toolconfig.reference_file, run_cmd)
         with open(fscript, "w") as f:
             f.write(reference_script)
         runscript = "vsim -c -restore {0} -do \"do {1}\" > ./{2}/golden_run.txt".format(os.path.join(c.work_dir, c.checkpoint),
@@ -184,6 +192,7 @@ def launch_analysis(config, toolconf, conf, datamodel):
                     # one more copy just in case
                     # shutil.copy(config.get_DBfilepath(False), config.get_DBfilepath(False).replace('.db', datetime.datetime.strftime(datetime.datetime.now(), '%Y-%m-%d_%H-%M-%S') + '.db'))
                     # Recover DB
+                    if datamodel is not None: datamodel.dbhelper.checkpoint()
                     shutil.copy(config.get_DBfilepath(True), config.get_DBfilepath(False))
                 except Exception as e:
                     pass
@@ -194,10 +203,48 @@ def launch_analysis(config, toolconf, conf, datamodel):
                          os.path.join(conf.work_dir, toolconf.log_dir))
                 remaining_jobs = True
             print "Analysis: " + str(len(joblst.running)) + ",\tPending: " + str(len(joblst.pending))
+        if datamodel is not None: datamodel.dbhelper.checkpoint()
         shutil.copy(config.get_DBfilepath(False), config.get_DBfilepath(True))
     print 'Analysis completed'
 
 
+def sequential_sampling(config, toolconf, conf, datamodel):
+    """Sequential sampling: the faultload is generated, simulated and analyzed in batches (batch_size per faultload),
+    until the failure rate of each (macrocell type, fault model) meets the error margin at the given confidence level,
+    or sample_size of each faultload is reached. Converged groups are excluded from the next batches.
+
+    Returns:
+        StreamingAnalysis: analyzer of the campaign, to be finalized (export of results)
+    """
+    faultdict = FaultDict(os.path.join(config.call_dir, config.SBFI.fault_dictionary))
+    stoprule = SequentialStopRule(config.SBFI.confidence_level, config.SBFI.error_margin)
+    sampled = [0] * len(config.SBFI.fault_model)
+    streaming = None
+    index = 0
+    while True:
+        sizes = [max(0, min(config.SBFI.batch_size, config.SBFI.fault_model[i].sample_size - sampled[i])) for i in range(len(sampled))]
+        if sum(sizes) == 0:
+            print('{0}: sequential sampling stopped, sample_size reached'.format(conf.label))
+            break
+        scripts = sample_fault_generator(config, conf, toolconf, faultdict, SamplingBatch(index, sizes, stoprule.converged()))
+        if scripts == 0:
+            break
+        sampled = [sampled[i] + sizes[i] for i in range(len(sampled))]
+        if streaming is None:
+            streaming = StreamingAnalysis(config, toolconf, conf, datamodel)
+        else:
+            streaming.extend()
+        execute_injection_scripts(config, toolconf, conf, streaming)
+        streaming.drain()
+        stoprule.update(streaming.injsummary, datamodel)
+        print('\n{0}: batch {1}, {2}\n{3}'.format(conf.label, index, streaming.status(), stoprule.report()))
+        if stoprule.done():
+            print('{0}: sequential sampling stopped, error margin reached'.format(conf.label))
+            break
+        index += 1
+    return streaming
+
+
 # True - terminate, False - continue with modified configuration
 def tweak_config_and_check_termination(config):
     for f in config.injector.fault_model:
@@ -211,37 +258,151 @@ def tweak_config_and_check_termination(config):
 
 
 
+def zip_results(toolconf, conf):
+    os.chdir(conf.work_dir)
+    dumppack = "SBFIRESULT_({0}).zip".format(conf.label)
+    for d in [toolconf.result_dir, toolconf.log_dir, toolconf.script_dir, toolconf.code_dir]:
+        zip_folder(d, dumppack)
+
+
+def add_pipeline_phases(scheduler, datamodel, config, toolconf, conf, state, clean, clean_phases, backup_label, deps):
+    """Adds the SBFI phases of one configuration to the pipeline scheduler (chain of tasks after deps)
+    Args:
+        clean (bool): cleanup with backup of the previous results in work_dir
+        clean_phases (bool): value of config.SBFI.clean_run for the phases of this configuration
+
+    Returns:
+        list: tasks of the configuration
+    """
+    tasks = []
+
+    def phase(key, func, slots=0, isolated=True):
+        def action(granted):
+            # the phase gets its own copy of config with the granted slots and clean flag:
+            # non-isolated phases run in a thread, the shared config is not modified
+            task_config = copy.copy(config)
+            task_config.SBFI = copy.copy(config.SBFI)
+            task_config.SBFI.clean_run = clean_phases
+            task_config.maxproc = max(1, granted)
+            func(task_config)
+        tasks.append(scheduler.add(PipelineTask('{0}:{1}'.format(conf.label, key), action, [tasks[-1]] if len(tasks) > 0 else deps,
+                                                slots, isolated, conf.label, state, key)))
+
+    def injection_streaming(cfg):
+        datamodel.dbhelper.BackupDB(False)
+        if cfg.SBFI.sequential_sampling and cfg.SBFI.faultload_mode == FaultloadModes.Sampling:
+            streaming = sequential_sampling(cfg, toolconf, conf, datamodel)
+        else:
+            streaming = StreamingAnalysis(cfg, toolconf, conf, datamodel)
+            execute_injection_scripts(cfg, toolconf, conf, streaming)
+        if streaming is not None:
+            streaming.finalize()
+        else:
+            launch_analysis(cfg, toolconf, conf, datamodel)
+
+    phase('cleanup', lambda cfg: cleanup(clean, cfg, toolconf, conf, True, backup_label))
+    if config.SBFI.initializer_phase:
+        phase('initializer', lambda cfg: InitializeHDLModels(cfg, toolconf, conf), 1)
+    analysis = config.SBFI.analyzer_phase
+    if config.SBFI.injector_phase:
+        phase('checkpoints', lambda cfg: generate_clustering_checkpoints(cfg, toolconf, conf), 1)
+        phase('golden_run', lambda cfg: golden_run(cfg, toolconf, conf), 1)
+        analysis_online = config.SBFI.analyzer_phase and datamodel is not None
+        sequential = config.SBFI.sequential_sampling and config.SBFI.faultload_mode == FaultloadModes.Sampling and analysis_online
+        if not sequential:
+            phase('faultload', lambda cfg: generate_faultload(cfg.SBFI.faultload_mode, cfg, conf, toolconf))
+        if sequential or (analysis_online and config.SBFI.analyzer.streaming):
+            # injection with the analysis of the dumps in this process (database)
+            phase('injection', injection_streaming, -1, False)
+            analysis = False
+        else:
+            phase('injection', lambda cfg: execute_injection_scripts(cfg, toolconf, conf, None), -1)
+    if analysis:
+        phase('analysis', lambda cfg: launch_analysis(cfg, toolconf, conf, datamodel), 0, False)
+    if config.SBFI.injector_phase:
+        phase('zip', lambda cfg: zip_results(toolconf, conf))
+    return tasks
+
+
+def run_pipeline(datamodel, config, toolconf):
+    """SBFI phases of all configurations as a dependency graph (SBFI attribute pipeline = on, Multicore platform):
+    configurations run concurrently sharing config.maxproc simulator slots (initializer, checkpoints, golden run: one slot,
+    injection: the free slots), configurations that share a work_dir run one after another.
+    Completed phases are recorded in work_dir/pipeline_<label>.state, and skipped when the campaign is resumed (clean_run = off).
+
+    Returns:
+        list: failed and cancelled tasks
+    """
+    signature = ''
+    if os.path.exists(getattr(config, 'file', '')):
+        with open(config.file, 'r') as f:
+            signature = hashlib.md5(f.read()).hexdigest()
+    scheduler = PipelineScheduler(config.maxproc)
+    previous = dict()  # work_dir -> (label, tasks, all completed in the previous run) of the last configuration there
+    for conf in config.parconf:
+        work_dir = os.path.normpath(conf.work_dir)
+        state = PipelineState(os.path.join(conf.work_dir, 'pipeline_{0}.state'.format(conf.label)), signature + ':' + conf.label)
+        shared = work_dir in previous
+        if config.SBFI.clean_run or (shared and not previous[work_dir][2]):
+            state.reset()
+        else:
+            state.load()
+        backup_label, deps = (previous[work_dir][0], previous[work_dir][1][-1:]) if shared else ('', [])
+        tasks = add_pipeline_phases(scheduler, datamodel, config, toolconf, conf, state, config.SBFI.clean_run or shared,
+                                    config.SBFI.clean_run and not shared, backup_label, deps)
+        previous[work_dir] = (conf.label, tasks, all(t.key in state for t in tasks))
+    failed = scheduler.run()
+    config.SBFI.clean_run = False
+    for t in failed:
+        print('Pipeline: {0} not completed'.format(t.label))
+    return failed
+
+
 def RunSBFI(datamodel, config, toolconf):
-    backup_label = ''
-    for i in range(len(config.parconf)):
-        conf = config.parconf[i]
-        cleanup(config.SBFI.clean_run or (i>0), config, toolconf, conf, True, backup_label)
-        if config.SBFI.initializer_phase:
-            InitializeHDLModels(config, toolconf, conf)
-
-        #if config.SBFI.profiler_phase:
-        #    estimate_RTL_switching_activity(config, toolconf, conf)
-
-        if config.SBFI.injector_phase:
-            generate_clustering_checkpoints(config, toolconf, conf)
-            golden_run(config, toolconf, conf)
-            # Generate SBFI scripts for the given model and faultload configuration
-            generate_faultload(config.SBFI.faultload_mode, config, conf, toolconf)
-            # Execute injection scripts (simulate - on Selected platform)
-            execute_injection_scripts(config, toolconf, conf)
-
-        # Analyze observation traces and save the results to the database
-        if config.SBFI.analyzer_phase:
-            launch_analysis(config, toolconf, conf, datamodel)
-
-        if config.SBFI.injector_phase:
-            os.chdir(conf.work_dir)                            
-            dumppack = "SBFIRESULT_({0}).zip".format(conf.label)
-            for d in [toolconf.result_dir, toolconf.log_dir, toolconf.script_dir,  toolconf.code_dir]:
-                zip_folder(d, dumppack)        
-
-        backup_label = conf.label
-        config.SBFI.clean_run = False
+    if config.SBFI.pipeline and config.platform == Platforms.Multicore:
+        run_pipeline(datamodel, config, toolconf)
+    else:
+        backup_label = ''
+        for i in range(len(config.parconf)):
+            conf = config.parconf[i]
+            cleanup(config.SBFI.clean_run or (i>0), config, toolconf, conf, True, backup_label)
+            if config.SBFI.initializer_phase:
+                InitializeHDLModels(config, toolconf, conf)
+
+            #if config.SBFI.profiler_phase:
+            #    estimate_RTL_switching_activity(config, toolconf, conf)
+
+            streaming = None
+            if config.SBFI.injector_phase:
+                generate_clustering_checkpoints(config, toolconf, conf)
+                golden_run(config, toolconf, conf)
+                analysis_online = config.SBFI.analyzer_phase and datamodel is not None and \
+                    (config.platform == Platforms.Multicore or config.platform == Platforms.Grid)
+                if config.SBFI.sequential_sampling and config.SBFI.faultload_mode == FaultloadModes.Sampling and analysis_online:
+                    # Generate, simulate and analyze the faultload in batches, until the target error margin
+                    datamodel.dbhelper.BackupDB(False)
+                    streaming = sequential_sampling(config, toolconf, conf, datamodel)
+                else:
+                    # Generate SBFI scripts for the given model and faultload configuration
+                    generate_faultload(config.SBFI.faultload_mode, config, conf, toolconf)
+                    # Analyze the dumps while injection scripts are running
+                    if analysis_online and config.SBFI.analyzer.streaming:
+                        datamodel.dbhelper.BackupDB(False)
+                        streaming = StreamingAnalysis(config, toolconf, conf, datamodel)
+                    # Execute injection scripts (simulate - on Selected platform)
+                    execute_injection_scripts(config, toolconf, conf, streaming)
+
+            # Analyze observation traces and save the results to the database
+            if streaming is not None:
+                streaming.finalize()
+            elif config.SBFI.analyzer_phase:
+                launch_analysis(config, toolconf, conf, datamodel)
+
+            if config.SBFI.injector_phase:
+                zip_results(toolconf, conf)
+
+            backup_label = conf.label
+            config.SBFI.clean_run = False
     # Build SBFI report on the basis of results collected in the database
     build_report(config, toolconf, datamodel)
     if datamodel is not None:
@@ -25,6 +25,11 @@ import sqlite3
 import copy
 import threading
 import ast
+import hashlib
+import cPickle
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import ne
 from Davos_Generic import *
 __metaclass__ = type
 
@@ -53,6 +58,137 @@ def find_between( s, first, last ):
     except ValueError:
         return ""
 
+
+#characters skipped before the time field of a data line: equivalent of vect_start_ptn on the line without curly brackets
+data_line_lead = ' \t\r\n\f\v{}'
+
+
+class DumpTokenizer:
+    """Single-pass tokenizer of ModelSim list dumps: list format (*.lst) and event format (*.evt)
+
+    Streams the file in buffered chunks, recognizes data lines by their leading characters instead of per-line regexes,
+    and interns repeated value strings (optionally).
+    The first data line is kept after open(), so array columns can be detected without re-reading the file.
+    Usage: t = DumpTokenizer(file); if t.open() is not None: for rec in t.records(): ...
+        lst records: list of tokens [time, delta, values...]
+        evt records: (time token, delta token, list of [label, value] changes)
+    """
+    def __init__(self, file, intern_values=False, chunk_size=4*1024*1024):
+        self.file = file
+        self.intern_values = intern_values
+        self.chunk_size = chunk_size
+        self.handle = None
+        self.lines = None
+        self.trace_type = None
+        self.timeunit = None
+        self.first_data_line = None
+        self.pending_line = None
+
+    #splits the stream into items separated by sep (lines, or time steps of evt dumps), head - data already read
+    def iter_items(self, head, sep='\n'):
+        buf, tail = head, ''
+        while buf:
+            items = (tail + buf).split(sep)
+            tail = items.pop()
+            for l in items:
+                yield l
+            buf = self.handle.read(self.chunk_size)
+        if tail != '':
+            yield tail
+
+    def open(self):
+        """Reads the header, returns None if file does not exist or its format is not recognized"""
+        if isinstance(self.file, str):
+            if not os.path.exists(self.file):
+                return(None)
+            self.handle = open(self.file, 'r')
+        else:
+            self.handle = self.file
+        head = self.handle.read(self.chunk_size)
+        try:
+            items = head.split('\n', 1)[0].split()
+            if head.lstrip().startswith('@') and items[0][1:2].isdigit():
+                self.trace_type = 'evt'
+                self.timeunit = 'ns' if '.' in items[0] else 'ps'
+                # evt: one item per time step: '@time +delta\nlabel value\nlabel value...'
+                self.lines = self.iter_items(head.lstrip(), '\n@')
+            else:
+                self.trace_type = 'lst'
+                self.timeunit = items[0]
+                self.lines = self.iter_items(head)
+                next(self.lines)
+                for l in self.lines:
+                    if l.lstrip(data_line_lead)[:1].isdigit():
+                        self.first_data_line = self.pending_line = l
+                        break
+        except (StopIteration, IndexError):
+            self.close()
+            return(None)
+        return(self)
+
+    def close(self):
+        if isinstance(self.file, str) and self.handle is not None:
+            self.handle.close()
+        self.handle = None
+
+    def tail_records(self, block_size=64*1024):
+        """lst only: records of the last time step, read backwards from the end of the dump"""
+        handle = open(self.file, 'rb') if isinstance(self.file, str) else self.handle
+        try:
+            handle.seek(0, 2)
+            pos, buf, data = handle.tell(), '', []
+            while pos > 0:
+                step = min(block_size, pos)
+                pos -= step
+                handle.seek(pos)
+                buf = handle.read(step) + buf
+                lines = buf.split('\n')
+                if pos > 0:
+                    lines = lines[1:]   # may be incomplete
+                data = [l.split() for l in lines if l.lstrip(data_line_lead)[:1].isdigit()]
+                # complete when an earlier time step is reached
+                if len(data) > 0 and data[0][0] != data[-1][0]:
+                    break
+        finally:
+            if isinstance(self.file, str):
+                handle.close()
+        return [clm for clm in data if clm[0] == data[-1][0]]
+
+    def time_value(self, token):
+        t = float(token)
+        if self.timeunit == 'ps': return t/1000.0
+        elif self.timeunit == 'fs': return t/1000000.0
+        return t
+
+    def records(self):
+        try:
+            if self.trace_type == 'lst':
+                if self.pending_line is not None:
+                    clm = self.pending_line.split()
+                    yield map(intern, clm) if self.intern_values else clm
+                for l in self.lines:
+                    if l.lstrip(data_line_lead)[:1].isdigit():
+                        clm = l.split()
+                        yield map(intern, clm) if self.intern_values else clm
+            elif self.trace_type == 'evt':
+                for step in self.lines:
+                    items = step.split()
+                    if len(items) < 2:
+                        continue
+                    if self.intern_values:
+                        items = map(intern, items)
+                    nchanges = (len(items) - 2) / 2
+                    if len(items) % 2 == 0 and step.rstrip().count('\n') == nchanges:
+                        changes = zip(items[2::2], items[3::2])
+                    else:
+                        # irregular lines within the time step: keep only 'label value' pairs
+                        changes = [c for c in (l.split() for l in step.split('\n')[1:]) if len(c) == 2]
+                        if self.intern_values:
+                            changes = [map(intern, c) for c in changes]
+                    yield (items[0].lstrip('@'), items[1].lstrip('+'), changes)
+        finally:
+            self.close()
+
 class VectorField:
     internal, output = range(2)
 
@@ -181,117 +317,99 @@ class simDump:
         
 
     def normalize_array_labels(self, file):
-        if isinstance(file, str):
-            if not os.path.exists(file):
-                return(None)
-            with open(file, 'r') as dumpfile:
-                lines = dumpfile.readlines()
-        else:
-            lines = file.readlines()
-        for l in lines:
-            if re.match('^\s*?[0-9]+', l):
-                clm = re.findall("[0-9a-zA-Z\.\+\-\*{}\?]+", l)
-                data_ind = 2
-                normalized_internal_labels = []
-                for label_i in range(len(self.internal_labels)):
-                    if (clm[data_ind]).find('{') >= 0 :
-                        arr_max_ind = 0
-                        while (clm[data_ind + arr_max_ind]).find('}') < 0:
-                            arr_max_ind += 1
-                        for c in range(0,arr_max_ind+1, 1):
-                            normalized_internal_labels.append('{0}[{1}]'.format(self.internal_labels[label_i], str(c)))
-                            data_ind += 1
-                    else:
-                        normalized_internal_labels.append(self.internal_labels[label_i])
-                        data_ind += 1
-                normalized_output_labels = []
-                for label_i in range(len(self.output_labels)):
-                    if (clm[data_ind]).find('{') >= 0 :
-                        arr_max_ind = 0
-                        while (clm[data_ind + arr_max_ind]).find('}') < 0:
-                            arr_max_ind += 1
-                        for c in range(0,arr_max_ind+1, 1):
-                            normalized_output_labels.append('{0}.format({1})'.format(self.output_labels[label_i], str(c)))
-                            data_ind += 1
-                    else:
-                        normalized_output_labels.append(self.output_labels[label_i])
-                        data_ind += 1
-                self.internal_labels = normalized_internal_labels
-                self.output_labels = normalized_output_labels
-                return     
-            
-             
-    #input - dump file *.lst
+        tokenizer = DumpTokenizer(file)
+        if tokenizer.open() is None:
+            return(None)
+        tokenizer.close()
+        if tokenizer.first_data_line is not None:
+            self.normalize_array_labels_from_line(tokenizer.first_data_line)
+
+    #expands labels of array columns ({v0 v1 ...} values) into per-item labels, line - first data line of the dump
+    def normalize_array_labels_from_line(self, l):
+        clm = re.findall("[0-9a-zA-Z\.\+\-\*{}\?]+", l)
+        data_ind = 2
+        normalized_internal_labels = []
+        for label_i in range(len(self.internal_labels)):
+            if (clm[data_ind]).find('{') >= 0 :
+                arr_max_ind = 0
+                while (clm[data_ind + arr_max_ind]).find('}') < 0:
+                    arr_max_ind += 1
+                for c in range(0,arr_max_ind+1, 1):
+                    normalized_internal_labels.append('{0}[{1}]'.format(self.internal_labels[label_i], str(c)))
+                    data_ind += 1
+            else:
+                normalized_internal_labels.append(self.internal_labels[label_i])
+                data_ind += 1
+        normalized_output_labels = []
+        for label_i in range(len(self.output_labels)):
+            if (clm[data_ind]).find('{') >= 0 :
+                arr_max_ind = 0
+                while (clm[data_ind + arr_max_ind]).find('}') < 0:
+                    arr_max_ind += 1
+                for c in range(0,arr_max_ind+1, 1):
+                    normalized_output_labels.append('{0}.format({1})'.format(self.output_labels[label_i], str(c)))
+                    data_ind += 1
+            else:
+                normalized_output_labels.append(self.output_labels[label_i])
+                data_ind += 1
+        self.internal_labels = normalized_internal_labels
+        self.output_labels = normalized_output_labels
+
+
+    #input - dump file *.lst (list or event format)
+    #normalize_labels - expand array labels from the first data line (see normalize_array_labels)
     #result - self.vectors
-    def build_vectors_from_file(self, file, filter_deltas = False):
+    def build_vectors_from_file(self, file, filter_deltas = False, normalize_labels = False):
+        tokenizer = DumpTokenizer(file, True)
+        if tokenizer.open() is None:
+            if not isinstance(file, str) or os.path.exists(file):
+                print('Skipping corrupted sim dump')
+            return(None)
         if isinstance(file, str):
-            if not os.path.exists(file):
-                return(None)
             self.caption = file
-            with open(file, 'r') as dumpfile:
-                lines = dumpfile.readlines()
-        else:
-            lines = file.readlines()
-        try:
-            k = re.match('\s*@([0-9\.]+)', lines[0])
-            if k is not None:
-                trace_type = 'evt'
-                timeunit = 'ns' if '.' in k.group(1) else 'ps'
-            else:
-                trace_type = 'lst'
-                timeunit = re.findall('\s*(.*?)\s+',lines[0])[0]
-        except:
-            print('Skipping corrupted sim dump')
-            return(None)
+        if normalize_labels and tokenizer.first_data_line is not None:
+            self.normalize_array_labels_from_line(tokenizer.first_data_line)
+        intern_num, output_num = len(self.internal_labels), len(self.output_labels)
 
-        if trace_type == 'evt':
+        if tokenizer.trace_type == 'evt':
             internal_indexes = {self.internal_labels[i]:i for i in range(len(self.internal_labels))}
             output_indexes = {self.output_labels[i]:i for i in range(len(self.output_labels))}
-
-            for i in range(len(lines)):
-                k = re.match('\s*@([0-9\.]+)\s+\+([0-9]+)', lines[i])
-                if k is not None:
-                    v = SimVector()
-                    if len(self.vectors) == 0:
-                        v.internals = ['?']*len(self.internal_labels)
-                        v.outputs = ['?']*len(self.output_labels)
-                    else:
-                        v.internals = self.vectors[-1].internals[:]
-                        v.outputs = self.vectors[-1].outputs[:]
-                    v.time = float(k.group(1))/1000.0 if timeunit == 'ps' else float(k.group(1))
-                    v.delta = float(k.group(2))
-                    if filter_deltas and len(self.vectors)>0:
-                        if self.vectors[-1].time == v.time:
-                            self.vectors[-1] = v
-                        else:
-                            self.vectors.append(v)
-                    else:
-                        self.vectors.append(v)
-
+            for itime, idelta, changes in tokenizer.records():
+                v = SimVector()
+                if len(self.vectors) == 0:
+                    v.internals = ['?']*intern_num
+                    v.outputs = ['?']*output_num
+                else:
+                    v.internals = self.vectors[-1].internals[:]
+                    v.outputs = self.vectors[-1].outputs[:]
+                v.time = tokenizer.time_value(itime)
+                v.delta = float(idelta)
+                if filter_deltas and len(self.vectors)>0 and self.vectors[-1].time == v.time:
+                    self.vectors[-1] = v
                 else:
-                    label, value = lines[i].split()
+                    self.vectors.append(v)
+                for label, value in changes:
                     if label in internal_indexes:
                         v.internals[internal_indexes[label]] = value
                     elif label in output_indexes:
                         v.outputs[output_indexes[label]] = value
-        elif trace_type == 'lst':
-            for l in lines:
-                if re.match(vect_start_ptn, l.replace('{','').replace('}','')):
-                    v = SimVector()
-                    if v.build_from_string(len(self.internal_labels), len(self.output_labels), l) == None:
-                        return(None)
-                    if   timeunit=='ps': v.time = v.time/1000.0
-                    elif timeunit=='fs': v.time = v.time/1000000.0
-                    if filter_deltas and len(self.vectors)>0:
-                        if self.vectors[-1].time == v.time:
-                            self.vectors[-1] = v
-                        else:
-                            self.vectors.append(v)
-                    else:
-                        self.vectors.append(v)
+        elif tokenizer.trace_type == 'lst':
+            for clm in tokenizer.records():
+                if len(clm) < intern_num + output_num + 2:
+                    print "build_from_string err: line is not complete: Dumped {0}, Expected_intern {1}, Expected_outputs {2}, C(0)={3}, C(-1)={4}".format(len(clm), intern_num, output_num, clm[0], clm[-1])
+                    return(None)
+                v = SimVector()
+                v.time = tokenizer.time_value(clm[0])
+                v.delta = int(clm[1])
+                v.internals = clm[2:2+intern_num]
+                v.outputs = clm[2+intern_num:2+intern_num+output_num]
+                if filter_deltas and len(self.vectors)>0 and self.vectors[-1].time == v.time:
+                    self.vectors[-1] = v
+                else:
+                    self.vectors.append(v)
             if len(self.vectors) == 0:
                 with open('error_log.txt','a') as err_log:
-                    err_log.write('\nEmpty list file: '+ file)
+                    err_log.write('\nEmpty list file: '+ str(file))
                 return(None)
         self.vector_dict = dict()
         for v in self.vectors:
@@ -677,6 +795,478 @@ class simDump:
         return(res)
 
 
+
+#---------------------------------------
+# Columnar trace store
+#---------------------------------------
+
+class ValueTable:
+    """Interns trace values (strings) into integer codes
+
+    Traces that share the same table can be compared by codes instead of strings
+    """
+    def __init__(self):
+        self.values = []
+        self.codes = dict()
+        self.lock = threading.Lock()
+
+    def code(self, value):
+        c = self.codes.get(value)
+        if c is None:
+            with self.lock:
+                c = self.codes.get(value)
+                if c is None:
+                    c = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = c
+        return c
+
+    def __getstate__(self):
+        return (self.values,)
+
+    def __setstate__(self, state):
+        self.values = state[0]
+        self.codes = dict((v, i) for i, v in enumerate(self.values))
+        self.lock = threading.Lock()
+
+
+class TraceTimeIndex:
+    """Read-only replacement of simDump.vector_dict: time -> last vector at that time"""
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __contains__(self, itime):
+        return bisect_right(self.trace.times, itime) > bisect_left(self.trace.times, itime)
+
+    def __getitem__(self, itime):
+        row = bisect_right(self.trace.times, itime) - 1
+        if row < 0 or self.trace.times[row] != itime:
+            raise KeyError(itime)
+        return self.trace.get_vector(row)
+
+    def __len__(self):
+        return len(set(self.trace.times))
+
+
+class simTrace(simDump):
+    """Columnar representation of a simulation trace
+
+    Instead of one SimVector per time step, keeps the array of time steps (rows) and,
+    for each column (internals followed by outputs), the rows where its value changes
+    along with the interned codes of the new values.
+    Exposes the query interface of simDump, self.vectors is materialized on request (legacy procedures only).
+    """
+    def __init__(self, fname="", values=None):
+        self.values = values if values is not None else ValueTable()
+        self.times = array('d')
+        self.deltas = array('l')
+        self.change_rows = []
+        self.change_codes = []
+        self.field_rows = {}
+        simDump.__init__(self, fname)
+
+    @property
+    def vectors(self):
+        return list(self.iter_vectors())
+
+    @vectors.setter
+    def vectors(self, vlist):
+        self.build_from_vectors(vlist)
+
+    @property
+    def vector_dict(self):
+        return TraceTimeIndex(self)
+
+    @vector_dict.setter
+    def vector_dict(self, idict):
+        # derived from self.times, nothing to store
+        pass
+
+    def column_count(self):
+        return len(self.internal_labels) + len(self.output_labels)
+
+    def vector_count(self):
+        return len(self.times)
+
+    def get_column_by_label(self, label):
+        vname, c_index = self.get_index_by_label(label)
+        return c_index + len(self.internal_labels) if vname == 'outputs' else c_index
+
+    def reset_columns(self):
+        ncols = len(getattr(self, 'internal_labels', [])) + len(getattr(self, 'output_labels', []))
+        self.times = array('d')
+        self.deltas = array('l')
+        self.change_rows = [array('l') for i in range(ncols)]
+        self.change_codes = [array('l') for i in range(ncols)]
+        self.field_rows = {}
+
+    def append_row(self, itime, idelta, filter_deltas=False):
+        if filter_deltas and len(self.times) > 0 and self.times[-1] == itime:
+            self.deltas[-1] = idelta
+        else:
+            self.times.append(itime)
+            self.deltas.append(idelta)
+        return len(self.times) - 1
+
+    def set_code(self, row, col, code):
+        rows, codes = self.change_rows[col], self.change_codes[col]
+        if len(rows) > 0:
+            if rows[-1] == row:
+                codes[-1] = code
+                # value restored within the same row: drop the redundant event
+                if len(codes) > 1 and codes[-2] == code:
+                    rows.pop()
+                    codes.pop()
+                return
+            if codes[-1] == code:
+                return
+        rows.append(row)
+        codes.append(code)
+
+    def build_from_vectors(self, vlist):
+        self.reset_columns()
+        for v in vlist:
+            row = self.append_row(v.time, v.delta)
+            for col, val in enumerate(v.internals + v.outputs):
+                self.set_code(row, col, self.values.code(val))
+        return self
+
+    #input - dump file *.lst (list or event format)
+    #result - self.times, self.change_rows, self.change_codes
+    def build_vectors_from_file(self, file, filter_deltas = False, normalize_labels = False):
+        tokenizer = DumpTokenizer(file)
+        if tokenizer.open() is None:
+            if not isinstance(file, str) or os.path.exists(file):
+                print('Skipping corrupted sim dump')
+            return(None)
+        if isinstance(file, str):
+            self.caption = file
+        if normalize_labels and tokenizer.first_data_line is not None:
+            self.normalize_array_labels_from_line(tokenizer.first_data_line)
+
+        self.reset_columns()
+        ncols = self.column_count()
+        code = self.values.code
+        if tokenizer.trace_type == 'evt':
+            col_indexes = dict((self.output_labels[i], len(self.internal_labels) + i) for i in range(len(self.output_labels)))
+            col_indexes.update((self.internal_labels[i], i) for i in range(len(self.internal_labels)))
+            unknown = code('?')
+            for col in range(ncols):
+                self.set_code(0, col, unknown)
+            for itime, idelta, changes in tokenizer.records():
+                row = self.append_row(tokenizer.time_value(itime), int(idelta), filter_deltas)
+                for label, value in changes:
+                    if label in col_indexes:
+                        self.set_code(row, col_indexes[label], code(value))
+        elif tokenizer.trace_type == 'lst':
+            prev = [None]*(ncols + 2)
+            for clm in tokenizer.records():
+                if len(clm) < ncols + 2:
+                    print "build_vectors_from_file err: line is not complete: Dumped {0}, Expected {1}, C(0)={2}, C(-1)={3}".format(len(clm), ncols + 2, clm[0], clm[-1])
+                    return(None)
+                row = self.append_row(tokenizer.time_value(clm[0]), int(clm[1]), filter_deltas)
+                # only the cells that differ from the previous line produce change events
+                diff = map(ne, clm, prev)
+                i = 2
+                try:
+                    while True:
+                        i = diff.index(True, i, ncols + 2)
+                        self.set_code(row, i - 2, code(clm[i]))
+                        i += 1
+                except ValueError:
+                    pass
+                prev = clm
+            if len(self.times) == 0:
+                with open('error_log.txt','a') as err_log:
+                    err_log.write('\nEmpty list file: '+ str(file))
+                return(None)
+        return self
+
+    #input - dump file *.lst
+    #result - single-row trace: first vector of the last time step (final state, as seen by get_vector_by_time)
+    #event dumps do not store complete vectors, they are parsed entirely
+    def build_last_vector_from_file(self, file):
+        tokenizer = DumpTokenizer(file, chunk_size=64*1024)
+        if tokenizer.open() is None:
+            if not isinstance(file, str) or os.path.exists(file):
+                print('Skipping corrupted sim dump')
+            return(None)
+        if tokenizer.trace_type == 'evt':
+            tokenizer.close()
+            return self.build_vectors_from_file(file)
+        if isinstance(file, str):
+            self.caption = file
+        tail = tokenizer.tail_records()
+        tokenizer.close()
+        self.reset_columns()
+        ncols = self.column_count()
+        if len(tail) == 0:
+            with open('error_log.txt','a') as err_log:
+                err_log.write('\nEmpty list file: '+ str(file))
+            return(None)
+        clm = tail[0]
+        if len(clm) < ncols + 2:
+            print "build_last_vector_from_file err: line is not complete: Dumped {0}, Expected {1}, C(0)={2}, C(-1)={3}".format(len(clm), ncols + 2, clm[0], clm[-1])
+            return(None)
+        row = self.append_row(tokenizer.time_value(clm[0]), int(clm[1]))
+        for col in range(ncols):
+            self.set_code(row, col, self.values.code(clm[2+col]))
+        return self
+
+    #completes a truncated trace with the rows of trace (same columns and value table) after time itime
+    def append_tail(self, trace, itime):
+        first = bisect_right(trace.times, itime)
+        if first >= len(trace.times):
+            return self
+        base = len(self.times) - first
+        for r in range(first, len(trace.times)):
+            self.append_row(trace.times[r], trace.deltas[r])
+        for col in range(self.column_count()):
+            rows, codes = trace.change_rows[col], trace.change_codes[col]
+            code = trace.get_code(first, col)
+            if code is not None:
+                self.set_code(base + first, col, code)
+            for i in range(bisect_right(rows, first), len(rows)):
+                self.set_code(base + rows[i], col, codes[i])
+        return self
+
+    def get_code(self, row, col):
+        i = bisect_right(self.change_rows[col], row) - 1
+        return self.change_codes[col][i] if i >= 0 else None
+
+    def get_value(self, row, col):
+        code = self.get_code(row, col)
+        return self.values.values[code] if code is not None else None
+
+    def get_vector(self, row):
+        if row < 0 or row >= len(self.times):
+            return None
+        v = SimVector()
+        v.time, v.delta = self.times[row], self.deltas[row]
+        ni = len(self.internal_labels)
+        v.internals = [self.get_value(row, col) for col in range(ni)]
+        v.outputs = [self.get_value(row, col) for col in range(ni, self.column_count())]
+        return v
+
+    #materializes SimVectors in a single pass over the change events
+    def iter_vectors(self):
+        ncols, ni = self.column_count(), len(self.internal_labels)
+        ptr, current = [0]*ncols, [None]*ncols
+        for row in range(len(self.times)):
+            for col in range(ncols):
+                p = ptr[col]
+                if p < len(self.change_rows[col]) and self.change_rows[col][p] == row:
+                    current[col] = self.values.values[self.change_codes[col][p]]
+                    ptr[col] = p + 1
+            v = SimVector()
+            v.time, v.delta = self.times[row], self.deltas[row]
+            v.internals, v.outputs = current[:ni], current[ni:]
+            yield v
+
+    #index of the vector at itime (first delta), or of the vector just previous to itime, -1 if none
+    def get_row_by_time(self, itime, idelta=None):
+        left, right = bisect_left(self.times, itime), bisect_right(self.times, itime)
+        if right > left:
+            if idelta is None:
+                return left
+            for row in range(left, right):
+                if self.deltas[row] == idelta:
+                    return row
+        return left - 1
+
+    def get_vector_by_time(self, itime, idelta=None):
+        return self.get_vector(self.get_row_by_time(itime, idelta))
+
+    #rows where any column of the field changes its value (equivalent of v_int_filtered / v_out_filtered)
+    def get_field_rows(self, field):
+        if field not in self.field_rows:
+            ni = len(self.internal_labels)
+            cols = range(ni) if field == VectorField.internal else range(ni, self.column_count())
+            rows = set([0]) if len(self.times) > 0 else set()
+            for col in cols:
+                rows.update(self.change_rows[col])
+            rows = array('l', sorted(rows))
+            self.field_rows[field] = (rows, array('d', [self.times[r] for r in rows]))
+        return self.field_rows[field]
+
+    def get_closest_forward(self, itime, field = None):
+        if field == None:
+            return self.get_vector(bisect_left(self.times, itime))
+        rows, times = self.get_field_rows(field)
+        i = bisect_left(times, itime)
+        return self.get_vector(rows[i]) if i < len(rows) else None
+
+    def get_closest_backward(self, itime, field = None):
+        if field == None:
+            return self.get_vector(bisect_right(self.times, itime) - 1)
+        rows, times = self.get_field_rows(field)
+        i = bisect_right(times, itime) - 1
+        return self.get_vector(rows[i]) if i >= 0 else None
+
+    def remove_vector(self, index):
+        vlist = self.vectors
+        del vlist[index]
+        self.vectors = vlist
+
+    def join_output_columns(self, join_group_list):
+        if(len(join_group_list.group_list) == 0):
+            return(1)
+        ni = len(self.internal_labels)
+        new_output_label_list, new_rows, new_codes = [], [], []
+        for jn in join_group_list.group_list:
+            jn.src_indexes = []
+            for i in jn.src_labels:
+                jn.src_indexes.append(self.output_labels.index(i))
+            if(jn.join_label != '-'):
+                new_output_label_list.append(jn.join_label)
+                cols = [ni + i for i in jn.src_indexes]
+                rows, codes = array('l'), array('l')
+                for row in sorted(set(r for c in cols for r in self.change_rows[c])):
+                    code = self.values.code(''.join([self.get_value(row, c) for c in cols]))
+                    if len(codes) == 0 or codes[-1] != code:
+                        rows.append(row)
+                        codes.append(code)
+                new_rows.append(rows)
+                new_codes.append(codes)
+        self.change_rows = self.change_rows[:ni] + new_rows
+        self.change_codes = self.change_codes[:ni] + new_codes
+        self.output_labels = new_output_label_list
+        self.field_rows = {}
+        return(0)
+
+    def replaceval(self, key = "FinishFlag", oldval = "X", newval="1"):
+        vname, col = self.get_index_by_label(key)
+        if vname != 'internals' or oldval not in self.values.codes:
+            return
+        oldcode, newcode = self.values.code(oldval), self.values.code(newval)
+        rows, codes = array('l'), array('l')
+        cnt = 0
+        for i in range(len(self.change_rows[col])):
+            code = self.change_codes[col][i]
+            if code == oldcode:
+                end = self.change_rows[col][i+1] if i + 1 < len(self.change_rows[col]) else len(self.times)
+                cnt += end - self.change_rows[col][i]
+                code = newcode
+            if len(codes) == 0 or codes[-1] != code:
+                rows.append(self.change_rows[col][i])
+                codes.append(code)
+        self.change_rows[col], self.change_codes[col] = rows, codes
+        self.field_rows = {}
+        if(cnt>0): print('Fixed {}: {}'.format(self.fname, str(cnt)))
+
+    def get_first_vector_by_key (self, key = "FinishFlag", val = "1"):
+        vname, c_index = self.get_index_by_label(key)
+        code = self.values.codes.get(val)
+        if vname in ['internals', 'outputs'] and code is not None:
+            col = self.get_column_by_label(key)
+            for i in range(len(self.change_codes[col])):
+                if self.change_codes[col][i] == code:
+                    row = self.change_rows[col][i]
+                    return(self.get_vector(row), row)
+        return(None, None)
+
+    def get_value_range(self, keylist):
+        self.value_range = {}
+        for key in keylist:
+            col = self.get_column_by_label(key)
+            vlist = []
+            if col < self.column_count():
+                for code in set(self.change_codes[col]):
+                    try:
+                        vlist.append(int(self.values.values[code], 16))
+                    except ValueError:
+                        pass
+            if len(vlist) != 0:
+                self.value_range[key] = (min(vlist), max(vlist))
+        return self.value_range
+
+    #list of row ranges (start, end) where column 'key' holds 'value'
+    def select_row_ranges(self, key, value):
+        vname, c_index = self.get_index_by_label(key)
+        code = self.values.codes.get(value)
+        if vname not in ['internals', 'outputs'] or code is None:
+            return []
+        col = self.get_column_by_label(key)
+        rows, codes = self.change_rows[col], self.change_codes[col]
+        return [(rows[i], rows[i+1] if i + 1 < len(rows) else len(self.times)) for i in range(len(rows)) if codes[i] == code]
+
+    def select_vectors(self, key, value):
+        return [self.get_vector(row) for r in self.select_row_ranges(key, value) for row in range(r[0], r[1])]
+
+    def select_vectors_multiple_filters(self, filters):
+        selected = None
+        for k, v in filters.iteritems():
+            rows = set(row for r in self.select_row_ranges(k, v) for row in range(r[0], r[1]))
+            selected = rows if selected is None else selected.intersection(rows)
+        if selected is None:
+            return self.vectors
+        return [self.get_vector(row) for row in sorted(selected)]
+
+
+class ReferenceTraceCache:
+    """Persistent cache of the prepared reference (golden run) trace of a model configuration:
+    labels from the list init file, vectors of the reference dump, joined output columns and value ranges.
+    Stored as a binary pickle in CacheDir (next to the result directory), keyed by the hash of the
+    source files (list init file, reference dump; paths or open file objects) and of the join/rename configuration.
+    label distinguishes the trace representations (one entry per label is kept).
+    Usage: cache = ReferenceTraceCache(dir, label, files, config_items); res = cache.load(); if res is None: ...; cache.store(res)
+    """
+    CacheDir = 'irefcache'
+    Version = 1
+
+    def __init__(self, cache_dir, label, files, config_items):
+        self.cache_dir = cache_dir
+        self.label = label
+        digest = hashlib.md5(str(ReferenceTraceCache.Version))
+        for f in files:
+            src = open(f, 'rb') if isinstance(f, str) else f
+            try:
+                for chunk in iter(lambda: src.read(4*1024*1024), ''):
+                    digest.update(chunk)
+            finally:
+                if isinstance(f, str):
+                    src.close()
+            digest.update('\0')
+        for c in config_items:
+            digest.update(str(c) + '\0')
+        self.key = digest.hexdigest()
+        self.fname = os.path.join(cache_dir, 'reference_{0}_{1}.pickle'.format(label, self.key))
+
+    @staticmethod
+    def analyzer_items(analyzer):
+        """Configuration items of the reference preparation (SBFI Analyzer tag): rename list, join groups, checked value ranges"""
+        return [';'.join(r.to_string() for r in analyzer.rename_list), analyzer.join_group_list.to_str(), ','.join(analyzer.check_range_columns)]
+
+    def load(self):
+        """Returns the cached item, None if not cached (or unreadable)"""
+        if not os.path.exists(self.fname):
+            return(None)
+        try:
+            with open(self.fname, 'rb') as f:
+                return(cPickle.load(f))
+        except Exception as e:
+            print('Reference cache {0} not loaded: {1}'.format(self.fname, str(e)))
+            return(None)
+
+    def store(self, item):
+        """Stores the item (atomic replace: concurrent workers may store the same key), removes stale entries"""
+        if not os.path.exists(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                pass
+        tmpname = '{0}.{1}.tmp'.format(self.fname, os.getpid())
+        with open(tmpname, 'wb') as f:
+            cPickle.dump(item, f, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmpname, self.fname)
+        for fname in glob.glob(os.path.join(self.cache_dir, 'reference_{0}_*.pickle'.format(self.label))):
+            if fname != self.fname:
+                try:
+                    os.remove(fname)
+                except OSError:
+                    pass
+
+
 if __name__=="__main__":
     inj_dump = simDump()
     combining = False
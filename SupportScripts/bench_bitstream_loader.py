@@ -0,0 +1,213 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of ConfigMemory.load_bitstream on a synthetic Ultrascale+ device:
+#       a debug bitstream (frame by frame) registers the FAR list, then a regular bitstream is parsed
+#       by the legacy procedure (byte-wise header, per-word unpacking and scanning) and by the bulk loader (frame arrays),
+#       the frame contents and layouts are compared
+#       Launch format: DAVOS/> python SupportScripts/bench_bitstream_loader.py [slrs] [rows] [columns]
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import random
+import struct
+import re
+import tempfile
+import shutil
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from Parsers.BitstreamParser import *
+
+PART = 'xcvu9p-bench-2L-e'
+MINORS = [76, 16, 16, 6, 16, 16, 8, 16]
+
+
+def make_farlist(rows, columns):
+    res = []
+    for row in range(rows):
+        for major in range(columns):
+            for minor in range(MINORS[major % len(MINORS)]):
+                res.append((0 << 24) | (row << 18) | (major << 8) | minor)
+    return res
+
+
+def header():
+    return '\x00\x09\x0f\xf0\x0f\xf0\x0f\xf0\x0f\xf0\x00\x00\x01a\x00\x2dtop;UserID=0XFFFFFFFF;Version=2020.2\x00b\x00{0:s}{1:s}\x00c\x00\x0b2020/01/01\x00e\x00\x00\x00\x00{2:s}'.format(
+        chr(len(PART) + 1), PART, '\xff' * 16)
+
+
+def frame_bytes(density):
+    return os.urandom(FrameSizeDict[FPGASeries.USP] * 4) if random.random() < density else '\x00' * (FrameSizeDict[FPGASeries.USP] * 4)
+
+
+def write_debug_bitstream(fname, slr_ids, farlist, density):
+    FS = FrameSizeDict[FPGASeries.USP]
+    with open(fname, 'wb') as f:
+        f.write(header())
+        for slr in slr_ids:
+            f.write(struct.pack('>9I', 0x000000BB, 0x11220044, 0xFFFFFFFF, 0xFFFFFFFF, 0xAA995566, 0x20000000, 0x30018001, slr, 0x20000000))
+            for FAR in farlist:
+                f.write(struct.pack('>I', 0x30004000 | FS) + frame_bytes(density) + struct.pack('>4I', 0x30002001, FAR, 0x30000001, 0x0))
+            f.write(struct.pack('>4I', 0x30008001, 0x0000000D, 0x20000000, 0x20000000))
+
+
+def write_regular_bitstream(fname, slr_ids, farlist, density):
+    FS = FrameSizeDict[FPGASeries.USP]
+    fragment = SuperLogicRegion(0, FPGASeries.USP)
+    fragment.FarList = farlist
+    breaks = fragment.get_row_breaks()
+    with open(fname, 'wb') as f:
+        f.write(header())
+        for slr in slr_ids:
+            frames = []
+            for idx in range(len(farlist)):
+                frames.append(frame_bytes(density))
+                if idx + 1 < len(farlist) - 1 and breaks[idx + 1]:
+                    frames.append('\x00' * (FS * 8))
+            data = ''.join(frames)
+            f.write(struct.pack('>15I', 0x000000BB, 0x11220044, 0xFFFFFFFF, 0xFFFFFFFF, 0xAA995566, 0x20000000, 0x30018001, slr,
+                                0x30002001, farlist[0], 0x30008001, 0x00000001, 0x20000000, 0x30004000, 0x50000000 | (len(data) / 4)))
+            f.write(data)
+            f.write(struct.pack('>4I', 0x30008001, 0x0000000D, 0x20000000, 0x20000000))
+
+
+class LegacyConfigMemory(ConfigMemory):
+    """Original load_bitstream (regular bitstream): byte-wise header, per-word unpacking, word-by-word scanning,
+    one list of words per frame"""
+
+    def load_bitstream(self, fname, filetype=BitfileType.Regular):
+        self.BitstreamFile = fname
+        header = []
+        bus_width_detect = 0x0
+        with open(fname, 'rb') as f:
+            while bus_width_detect != 0x000000BB11220044:
+                data = f.read(1)
+                header.append(struct.unpack('>c', data)[0])
+                bus_width_detect = ((bus_width_detect << 8) | struct.unpack('>B', data)[0] & 0xFF) & 0xFFFFFFFFFFFFFFFF
+            matchDesc = re.search("Version=([0-9]+.*?[0-9]+.*?[a-zA-Z]+).*?([0-9a-zA-Z\\-]+)", ''.join(header))
+            self.VivadoVersion, self.DevicePart = matchDesc.group(1), matchDesc.group(2)
+            self.DeviceDetails = DevicePartDetails(self.DevicePart)
+            self.set_series(self.DeviceDetails.series)
+            bitstream = [0x000000BB, 0x11220044]
+            data = f.read()
+            for i in range(0, len(data), 4):
+                bitstream.append(struct.unpack('>I', data[i:i+4])[0])
+        with open(os.path.join(DAVOSPATH, 'Parsers', 'DeviceSupport', 'FARLIST_{0}.txt'.format(self.DevicePart)), 'r') as f:
+            for line in f:
+                t = line.split(' ')
+                SLR_ID, FAR = int(t[0], 16), int(t[1], 16)
+                if SLR_ID not in self.FragmentDict.keys():
+                    self.FragmentDict[SLR_ID] = SuperLogicRegion(SLR_ID, self.Series)
+                    self.SLR_ID_LIST.append(SLR_ID)
+                self.FragmentDict[SLR_ID].FarList.append(FAR)
+        i, FrameIndex, fragment = 0, 0, None
+        fragment_found = False
+        while i < len(bitstream)-5:
+            if [bitstream[i], bitstream[i+1], bitstream[i+2], bitstream[i+3], bitstream[i+4]] == SyncSequence:
+                while(bitstream[i] != 0x30018001): i += 1
+                IDcode = bitstream[i+1]
+                fragment = self.FragmentDict[IDcode]
+                FrameIndex = 0
+                fragment_found = True
+            if fragment_found and bitstream[i] == 0x30002001:
+                i += 1
+                FAR = bitstream[i]
+                while FrameIndex < len(fragment.FarList) and fragment.FarList[FrameIndex] != FAR:
+                    FrameIndex += 1
+                while i < len(bitstream) and not (bitstream[i] == 0x30008001 and bitstream[i+1] == 0x00000001):
+                    i += 1
+                while i < len(bitstream) and (bitstream[i] & 0xFFFFF800 != 0x30004000):
+                    i += 1
+                WordCount = bitstream[i] & 0x7FF
+                if WordCount == 0:
+                    i += 1
+                    WordCount = bitstream[i] & 0x7FFFFFF
+                i += 1
+                FrameCnt, PadIndex = 0, 0
+                while FrameCnt < (WordCount / self.FrameSize):
+                    if FrameIndex + FrameCnt - PadIndex < len(fragment.FarList):
+                        FAR = fragment.FarList[FrameIndex + FrameCnt - PadIndex]
+                        frame = FrameDesc(FAR, self.Series, IDcode)
+                        frame.data = bitstream[i:i + self.FrameSize]
+                        fragment.Frames[frame.FAR] = frame
+                    i += self.FrameSize
+                    FrameCnt += 1
+                    if FrameIndex+FrameCnt-PadIndex < len(fragment.FarList)-1:
+                        f1 = FarFields.from_FAR(fragment.FarList[FrameIndex+FrameCnt-PadIndex], self.Series)
+                        f2 = FarFields.from_FAR(fragment.FarList[FrameIndex+FrameCnt-PadIndex+1], self.Series)
+                        if (f1.Row != f2.Row) or (f1.Top != f2.Top):
+                            PadIndex += 2
+                            FrameCnt += 2
+                            i += self.FrameSize * 2
+                FrameIndex += (FrameCnt - PadIndex)
+                fragment_found = False
+            else:
+                i += 1
+        self.update_stat()
+        for id in self.SLR_ID_LIST:
+            fragment = self.FragmentDict[id]
+            for far in range(len(fragment.FarList)):
+                f = FarFields.from_FAR(fragment.FarList[far], self.Series)
+                if (f.Top == 0) and (f.Row >= fragment.layout.TopRows):
+                    fragment.layout.TopRows = f.Row+1
+                if f.Major >= fragment.layout.Columns:
+                    fragment.layout.Columns = f.Major + 1
+            for i in range(len(fragment.FarList)-1):
+                x1, x2 = FarFields.from_FAR(fragment.FarList[i], self.Series), FarFields.from_FAR(fragment.FarList[i+1], self.Series)
+                if x1.Major != x2.Major:
+                    fragment.layout.ColumnDescriptors.append(ConfColumnDescriptor(id, x1.BlockType, x1.Top, x1.Row, x1.Major, x1.Minor+1, 'UNKNOWN'))
+
+
+def frame_table(CM):
+    return dict(((slr, FAR), list(frame.data)) for slr in CM.SLR_ID_LIST for FAR, frame in CM.FragmentDict[slr].Frames.iteritems())
+
+
+if __name__ == "__main__":
+    slrs = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    columns = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    random.seed(1)
+    slr_ids = [0x04B31093 + (k << 28) for k in range(slrs)]
+    farlist = make_farlist(rows, columns)
+    workdir = tempfile.mkdtemp(prefix='davos_bench_')
+    support_dir = os.path.join(DAVOSPATH, 'Parsers', 'DeviceSupport')
+    created_support_dir = not os.path.exists(support_dir)
+    if created_support_dir:
+        os.makedirs(support_dir)
+    call_dir = os.getcwd()
+    try:
+        debug_file, regular_file = os.path.join(workdir, 'debug.bit'), os.path.join(workdir, 'regular.bit')
+        write_debug_bitstream(debug_file, slr_ids, farlist, 0.3)
+        write_regular_bitstream(regular_file, slr_ids, farlist, 0.3)
+        t0 = time.time()
+        CM = ConfigMemory()
+        CM.load_bitstream(debug_file, BitfileType.Debug)
+        t1 = time.time()
+        CM = ConfigMemory()
+        CM.load_bitstream(regular_file, BitfileType.Regular)
+        t2 = time.time()
+        ref = LegacyConfigMemory()
+        ref.load_bitstream(regular_file, BitfileType.Regular)
+        t3 = time.time()
+        match = frame_table(CM) == frame_table(ref) and all(
+            len(CM.FragmentDict[slr].layout.ColumnDescriptors) == len(ref.FragmentDict[slr].layout.ColumnDescriptors) and
+            CM.FragmentDict[slr].stat.UtilizedFrames == ref.FragmentDict[slr].stat.UtilizedFrames for slr in slr_ids)
+        words = os.path.getsize(regular_file) / 4
+        print('\n{0} SLRs x {1} frames, {2} words ({3:.1f} MB)'.format(slrs, len(farlist), words, words * 4 / 1e6))
+        print('debug bitstream (bulk loader):   {0:8.2f} s'.format(t1 - t0))
+        print('regular bitstream, legacy:       {0:8.2f} s'.format(t3 - t2))
+        print('regular bitstream, bulk loader:  {0:8.2f} s'.format(t2 - t1))
+        print('speed-up: {0:6.1f}x, frames and layout match: {1}'.format((t3 - t2) / max(t2 - t1, 1e-6), match))
+    finally:
+        os.chdir(call_dir)
+        os.remove(os.path.join(support_dir, 'FARLIST_{0}.txt'.format(PART)))
+        if created_support_dir:
+            os.rmdir(support_dir)
+        shutil.rmtree(workdir)
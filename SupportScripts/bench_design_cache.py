@@ -0,0 +1,164 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of the FFI host cold start on a synthetic Ultrascale+ design (layout, CELLS.csv, LL file, bitstream, EBC/EBD):
+#       VivadoDesignModel.initialize from the source files vs. the pickled model (former hashing mode)
+#       vs. the binary design model cache (DesignModelCache); the restored models are compared with the initialized one
+#       Launch format: DAVOS/> python SupportScripts/bench_design_cache.py [slrs] [rows] [columns]
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import random
+import tempfile
+import shutil
+import pickle
+import gc
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from Parsers.DesignParser import *
+from bench_bitstream_loader import PART, make_farlist, write_regular_bitstream
+from bench_essential_bits import write_ascii_file
+
+CR_HEIGHT = 60
+LUTS, FFS = ['A6LUT', 'E6LUT'], ['AFF', 'EFF2']
+
+
+def write_layout(fname, slrs, rows, tile_columns):
+    with open(fname, 'w') as f:
+        f.write('<Layout part="{0:s}">\n'.format(PART))
+        for slr in range(slrs):
+            f.write('<Slr name="SLR{0:d}" config_order_index="{0:d}">\n'.format(slr))
+            for row in range(rows):
+                f.write('<ClockRegion name="X0Y{0:d}">\n'.format(slr * rows + row))
+                for y in range((slr * rows + row) * CR_HEIGHT, (slr * rows + row + 1) * CR_HEIGHT):
+                    for x in range(tile_columns):
+                        f.write('<Tile name="INT_X{0:d}Y{1:d}" type="INT" column="{2:d}"></Tile>\n'.format(x, y, 3*x + 1))
+                        f.write('<Tile name="CLEL_R_X{0:d}Y{1:d}" type="CLEL_R" column="{2:d}">'.format(x, y, 3*x + 2))
+                        f.write('<Slice name="SLICE_X{0:d}Y{1:d}" type="SLICEL"/></Tile>\n'.format(x, y))
+                f.write('</ClockRegion>\n')
+            f.write('</Slr>\n')
+        f.write('</Layout>\n')
+
+
+def write_cells(cells_file, ll_file, slrs, rows, tile_columns):
+    with open(cells_file, 'w') as f, open(ll_file, 'w') as ll:
+        f.write('sep=;\nNode;CellType;CellLocation;BEL;BellType;INIT;CellConnections\n')
+        ll.write('Revision 3\n; Created by bitgen\n')
+        cnt = 0
+        for y in range(slrs * rows * CR_HEIGHT):
+            for x in range(tile_columns):
+                for label in LUTS:
+                    f.write("top/dut/u{0:d}/lut_{1:d};CLB.LUT.LUT6;SLICE_X{2:d}Y{3:d};SLICEL.{4:s};{4:s};64'h{5:016x};I0:A1 I1:A2 I5:A6\n".format(
+                        x, cnt, x, y, label, random.getrandbits(64)))
+                    cnt += 1
+                for label in FFS:
+                    f.write("top/dut/u{0:d}/ff_{1:d};REGISTER.SDR.FDRE;SLICE_X{2:d}Y{3:d};SLICEL.{4:s};{4:s};1'h{5:d};C:CLK D:D\n".format(
+                        x, cnt, x, y, label, random.getrandbits(1)))
+                    ll.write('Bit {0:8d} 0x{1:08x} {2:5d} SLR0 0 Block=SLICE_X{3:d}Y{4:d} Latch={5:s} Net=top/dut/u{6:d}/ff_{7:d}\n'.format(
+                        cnt * 7, ((y / CR_HEIGHT) % rows << 18) | ((3*x + 2) << 8) | 12, (y % CR_HEIGHT) * 48 + 3,
+                        x, y, label.replace('FF', 'Q'), x, cnt))
+                    cnt += 1
+
+
+def write_design(target_dir, support_dir, slrs, rows, columns):
+    gen_dir = os.path.join(target_dir, 'DavosGenerated')
+    os.makedirs(gen_dir)
+    slr_ids = [0x04B31093 + (k << 28) for k in range(slrs)]
+    farlist = make_farlist(rows, columns)
+    with open(os.path.join(support_dir, 'FARLIST_{0:s}.txt'.format(PART)), 'w') as f:
+        for slr in slr_ids:
+            f.write(''.join('0x{0:08x} 0x{1:08x}\n'.format(slr, FAR) for FAR in farlist))
+    write_regular_bitstream(os.path.join(gen_dir, 'Bitstream.bit'), slr_ids, farlist, 0.3)
+    fragment = SuperLogicRegion(0, FPGASeries.USP)
+    fragment.FarList = farlist
+    fragment.stat.Type0Frames = len(farlist)
+    for k in range(slrs):
+        write_ascii_file(os.path.join(gen_dir, 'Bitstream_{0:d}.ebc'.format(k)), fragment, 0.3)
+        write_ascii_file(os.path.join(gen_dir, 'Bitstream_{0:d}.ebd'.format(k)), fragment, 0.3)
+    write_layout(os.path.join(support_dir, 'LAYOUT_{0:s}.xml'.format(PART)), slrs, rows, columns / 3)
+    write_cells(os.path.join(gen_dir, 'CELLS.csv'), os.path.join(gen_dir, 'Bitstream.ll'), slrs, rows, columns / 3)
+
+
+def model_table(design):
+    """Content of the design model: frames, layout, netlist cells"""
+    res = {}
+    for slr in design.CM.SLR_ID_LIST:
+        fragment = design.CM.FragmentDict[slr]
+        res['frames', slr] = [(FAR, list(frame.data), list(frame.mask), list(frame.ebc_data), frame.stat.EssentialBitsCount, frame.stat.Empty)
+                              for FAR, frame in sorted(fragment.Frames.iteritems())]
+        res['fragment', slr] = (fragment.FarList, fragment.stat.__dict__, fragment.layout.to_string(True).split('\n')[0],
+                                fragment.layout.TileColumnIndexes, [d.to_string() for d in fragment.layout.ColumnDescriptors])
+    res['slices'] = sorted((s.Name, s.X, s.Y, s.Type, s.Tile.Name, s.Tile.Type, s.Tile.Column, getattr(s.Tile, 'Offset', None),
+                            s.Tile.ClockRegion.Name) for s in design.dev_layout.slice_by_name_dict.values())
+    res['slrs'] = sorted((s.Name, s.layout_index, s.config_index, s.TileYmin, s.TileYmax, s.ID, len(s.ClockRegionDict))
+                         for s in design.dev_layout.slr_by_config_index.values())
+    res['cells'] = [(group, type(c).__name__, c.name, c.celltype, c.beltype, c.label, c.slice.Name, getattr(c, 'init', None),
+                     sorted(c.connections.items()), sorted(c.bitmap.items())) for group, cells in sorted(design.netlist.CellsDict.iteritems()) for c in cells]
+    return res
+
+
+if __name__ == "__main__":
+    slrs = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    columns = int(sys.argv[3]) if len(sys.argv) > 3 else 120
+    random.seed(1)
+    workdir = tempfile.mkdtemp(prefix='davos_bench_')
+    support_dir = os.path.join(DAVOSPATH, 'Parsers', 'DeviceSupport')
+    created_support_dir = not os.path.exists(support_dir)
+    if created_support_dir:
+        os.makedirs(support_dir)
+    call_dir = os.getcwd()
+    try:
+        write_design(workdir, support_dir, slrs, rows, columns)
+        t0 = time.time()
+        design = VivadoDesignModel(workdir, PART)
+        design.initialize(False, '', None, True)
+        t1 = time.time()
+        cache = DesignModelCache(design, ('', '', True))
+        cache.store(design)
+        t2 = time.time()
+        with open(os.path.join(workdir, 'design.pickle'), 'wb') as f:
+            pickle.dump(design, f)
+        dump_time = time.time() - t2
+        reference = model_table(design)
+        frames = sum(len(design.CM.FragmentDict[slr].FarList) for slr in design.CM.SLR_ID_LIST)
+        slices, cells = len(design.dev_layout.slice_by_name_dict), sum(len(v) for v in design.netlist.CellsDict.values())
+        #restore into a heap without the initialized model, as at the start of the FFI host
+        del design
+        gc.collect()
+        t3 = time.time()
+        with open(os.path.join(workdir, 'design.pickle'), 'rb') as f:
+            pickled = pickle.load(f)
+        load_time = time.time() - t3
+        del pickled
+        gc.collect()
+        t4 = time.time()
+        restored = VivadoDesignModel(workdir, PART)
+        hit = DesignModelCache(restored, ('', '', True)).load(restored)
+        t5 = time.time()
+        match = hit and model_table(restored) == reference
+        os.utime(restored.files['CELLS'][0], (time.time(), time.time() + 10))
+        outdated = VivadoDesignModel(workdir, PART)
+        invalidated = not DesignModelCache(outdated, ('', '', True)).load(outdated)
+        print('\n{0} SLRs, {1} frames, {2} layout slices, {3} netlist cells'.format(slrs, frames, slices, cells))
+        print('initialize from source files:  {0:8.2f} s'.format(t1 - t0))
+        print('pickled model, load:           {0:8.2f} s  (dump {1:.2f} s, {2:.1f} MB)'.format(
+            load_time, dump_time, os.path.getsize(os.path.join(workdir, 'design.pickle')) / 1e6))
+        print('design model cache, load:      {0:8.2f} s  (store {1:.2f} s, {2:.1f} MB)'.format(
+            t5 - t4, t2 - t1, os.path.getsize(cache.fname) / 1e6))
+        print('restored model matches: {0}, cache invalidated by source change: {1}'.format(match, invalidated))
+    finally:
+        os.chdir(call_dir)
+        for fname in ['FARLIST_{0:s}.txt'.format(PART), 'LAYOUT_{0:s}.xml'.format(PART)]:
+            if os.path.exists(os.path.join(support_dir, fname)):
+                os.remove(os.path.join(support_dir, fname))
+        if created_support_dir:
+            os.rmdir(support_dir)
+        shutil.rmtree(workdir)
@@ -0,0 +1,268 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of ModelSim dump parsing on synthetic list (*.lst) and event (*.evt) dumps of a given size:
+#       simDump and simTrace build_vectors_from_file before DumpTokenizer (LegacyDump, LegacyTrace: the former code)
+#       vs. the current ones, parsed traces are compared
+#       Launch format: DAVOS/> python SupportScripts/bench_dump_parser.py [size_MB] [columns] [workdir] [skip_legacy]
+#       e.g. python SupportScripts/bench_dump_parser.py 4096 300 /scratch/bench skip_legacy
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import re
+import time
+import random
+import tempfile
+import shutil
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from SimDumpModel import *
+
+HEX_VALUES = ['0', '1', '3', 'a3', 'ff', '1c', 'X', 'U']
+
+
+def generate_lst(fname, size_mb, columns, change_rate=0.02):
+    random.seed(1)
+    values = [random.choice(HEX_VALUES) for i in range(columns)]
+    limit, written, t = size_mb * 1024 * 1024, 0, 0
+    with open(fname, 'w', 1024 * 1024) as f:
+        f.write('     ps  delta  ' + ' '.join('/tb/s{0}'.format(i) for i in range(columns)) + '\n')
+        while written < limit:
+            buf = []
+            for i in range(1000):
+                for c in random.sample(range(columns), int(columns * change_rate) + 1):
+                    values[c] = random.choice(HEX_VALUES)
+                t += 1000
+                buf.append('{0:12d} {1:5d} {2}\n'.format(t, 0, ' '.join(values)))
+            data = ''.join(buf)
+            f.write(data)
+            written += len(data)
+    return ['{{s{0}}}'.format(i) for i in range(columns)]
+
+
+def generate_evt(fname, size_mb, columns, change_rate=0.02):
+    random.seed(1)
+    labels = ['{{s{0}}}'.format(i) for i in range(columns)]
+    limit, written, t = size_mb * 1024 * 1024, 0, 0
+    with open(fname, 'w', 1024 * 1024) as f:
+        while written < limit:
+            buf = []
+            for i in range(1000):
+                buf.append('@{0:d} +0\n'.format(t))
+                cols = range(columns) if t == 0 else random.sample(range(columns), int(columns * change_rate) + 1)
+                for c in cols:
+                    buf.append('{0} {1}\n'.format(labels[c], random.choice(HEX_VALUES)))
+                t += 1000
+            data = ''.join(buf)
+            f.write(data)
+            written += len(data)
+    return labels
+
+
+class LegacyDump(simDump):
+    """simDump parser before DumpTokenizer: readlines, per-line regex match and SimVector.build_from_string"""
+
+    def build_vectors_from_file(self, file, filter_deltas = False):
+        if isinstance(file, str):
+            if not os.path.exists(file):
+                return(None)
+            self.caption = file
+            with open(file, 'r') as dumpfile:
+                lines = dumpfile.readlines()
+        else:
+            lines = file.readlines()
+        try:
+            k = re.match('\s*@([0-9\.]+)', lines[0])
+            if k is not None:
+                trace_type = 'evt'
+                timeunit = 'ns' if '.' in k.group(1) else 'ps'
+            else:
+                trace_type = 'lst'
+                timeunit = re.findall('\s*(.*?)\s+',lines[0])[0]
+        except:
+            print('Skipping corrupted sim dump')
+            return(None)
+
+        if trace_type == 'evt':
+            internal_indexes = {self.internal_labels[i]:i for i in range(len(self.internal_labels))}
+            output_indexes = {self.output_labels[i]:i for i in range(len(self.output_labels))}
+
+            for i in range(len(lines)):
+                k = re.match('\s*@([0-9\.]+)\s+\+([0-9]+)', lines[i])
+                if k is not None:
+                    v = SimVector()
+                    if len(self.vectors) == 0:
+                        v.internals = ['?']*len(self.internal_labels)
+                        v.outputs = ['?']*len(self.output_labels)
+                    else:
+                        v.internals = self.vectors[-1].internals[:]
+                        v.outputs = self.vectors[-1].outputs[:]
+                    v.time = float(k.group(1))/1000.0 if timeunit == 'ps' else float(k.group(1))
+                    v.delta = float(k.group(2))
+                    if filter_deltas and len(self.vectors)>0:
+                        if self.vectors[-1].time == v.time:
+                            self.vectors[-1] = v
+                        else:
+                            self.vectors.append(v)
+                    else:
+                        self.vectors.append(v)
+
+                else:
+                    label, value = lines[i].split()
+                    if label in internal_indexes:
+                        v.internals[internal_indexes[label]] = value
+                    elif label in output_indexes:
+                        v.outputs[output_indexes[label]] = value
+        elif trace_type == 'lst':
+            for l in lines:
+                if re.match(vect_start_ptn, l.replace('{','').replace('}','')):
+                    v = SimVector()
+                    if v.build_from_string(len(self.internal_labels), len(self.output_labels), l) == None:
+                        return(None)
+                    if   timeunit=='ps': v.time = v.time/1000.0
+                    elif timeunit=='fs': v.time = v.time/1000000.0
+                    if filter_deltas and len(self.vectors)>0:
+                        if self.vectors[-1].time == v.time:
+                            self.vectors[-1] = v
+                        else:
+                            self.vectors.append(v)
+                    else:
+                        self.vectors.append(v)
+            if len(self.vectors) == 0:
+                with open('error_log.txt','a') as err_log:
+                    err_log.write('\nEmpty list file: '+ file)
+                return(None)
+        self.vector_dict = dict()
+        for v in self.vectors:
+            self.vector_dict[v.time] = v
+        return self
+
+
+class LegacyTrace(simTrace):
+    """simTrace parser before DumpTokenizer: readlines, per-line regex match, per-column comparison"""
+
+    def build_vectors_from_file(self, file, filter_deltas = False):
+        if isinstance(file, str):
+            if not os.path.exists(file):
+                return(None)
+            self.caption = file
+            with open(file, 'r') as dumpfile:
+                lines = dumpfile.readlines()
+        else:
+            lines = file.readlines()
+        try:
+            k = re.match('\s*@([0-9\.]+)', lines[0])
+            if k is not None:
+                trace_type = 'evt'
+                timeunit = 'ns' if '.' in k.group(1) else 'ps'
+            else:
+                trace_type = 'lst'
+                timeunit = re.findall('\s*(.*?)\s+',lines[0])[0]
+        except:
+            print('Skipping corrupted sim dump')
+            return(None)
+
+        self.reset_columns()
+        ncols = self.column_count()
+        if trace_type == 'evt':
+            col_indexes = dict((self.output_labels[i], len(self.internal_labels) + i) for i in range(len(self.output_labels)))
+            col_indexes.update((self.internal_labels[i], i) for i in range(len(self.internal_labels)))
+            unknown = self.values.code('?')
+            row = None
+            for l in lines:
+                k = re.match('\s*@([0-9\.]+)\s+\+([0-9]+)', l)
+                if k is not None:
+                    itime = float(k.group(1))/1000.0 if timeunit == 'ps' else float(k.group(1))
+                    if row is None:
+                        for col in range(ncols):
+                            self.set_code(0, col, unknown)
+                    row = self.append_row(itime, int(k.group(2)), filter_deltas)
+                elif row is not None:
+                    item = l.split()
+                    if len(item) == 2 and item[0] in col_indexes:
+                        self.set_code(row, col_indexes[item[0]], self.values.code(item[1]))
+        elif trace_type == 'lst':
+            prev = [None]*(ncols + 2)
+            for l in lines:
+                if re.match(vect_start_ptn, l.replace('{','').replace('}','')):
+                    clm = l.split()
+                    if len(clm) < ncols + 2:
+                        print "build_vectors_from_file err: line is not complete: Dumped {0}, Expected {1}, C(0)={2}, C(-1)={3}".format(len(clm), ncols + 2, clm[0], clm[-1])
+                        return(None)
+                    itime = float(clm[0])
+                    if   timeunit=='ps': itime = itime/1000.0
+                    elif timeunit=='fs': itime = itime/1000000.0
+                    row = self.append_row(itime, int(clm[1]), filter_deltas)
+                    # only the cells that differ from the previous line produce change events
+                    for col in range(ncols):
+                        if clm[2+col] != prev[2+col]:
+                            self.set_code(row, col, self.values.code(clm[2+col]))
+                    prev = clm
+            if len(self.times) == 0:
+                with open('error_log.txt','a') as err_log:
+                    err_log.write('\nEmpty list file: '+ str(file))
+                return(None)
+        return self
+
+
+def dump_summary(dump):
+    """Vector count and hash of all vectors (time, delta, values) of a simDump/simTrace"""
+    res, cnt = 0, 0
+    for v in (dump.iter_vectors() if isinstance(dump, simTrace) else dump.vectors):
+        res = hash((res, v.time, int(v.delta), tuple(v.internals), tuple(v.outputs)))
+        cnt += 1
+    return cnt, res
+
+
+def tokenizer_loop(fname):
+    tokenizer = DumpTokenizer(fname)
+    tokenizer.open()
+    cnt = 0
+    for rec in tokenizer.records():
+        cnt += 1
+    return cnt
+
+
+def measure(label, size, func, *args):
+    t0 = time.time()
+    res = func(*args)
+    dt = max(time.time() - t0, 1e-6)
+    print('\t{0:42s}: {1:9.2f} s, {2:9.1f} MB/s'.format(label, dt, size / dt / (1024 * 1024)))
+    return res
+
+
+if __name__ == "__main__":
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    workdir = tempfile.mkdtemp(prefix='davos_bench_', dir=sys.argv[3] if len(sys.argv) > 3 else None)
+    skip_legacy = len(sys.argv) > 4 and sys.argv[4] == 'skip_legacy'
+    try:
+        for fmt, generator in [('lst', generate_lst), ('evt', generate_evt)]:
+            fname = os.path.join(workdir, 'dump.' + fmt)
+            labels = generator(fname, size_mb, columns)
+            size = os.path.getsize(fname)
+            print('{0}: {1:.1f} MB, {2} columns'.format(fmt, size / (1024.0 * 1024.0), columns))
+            measure('DumpTokenizer', size, tokenizer_loop, fname)
+            match = True
+            # skip_legacy: simTrace only (multi-GB dumps do not fit as simDump vectors)
+            for label, legacy_cls, cls in [('simTrace', LegacyTrace, simTrace), ('simDump', LegacyDump, simDump)][:1 if skip_legacy else 2]:
+                summary = []
+                for impl in ([legacy_cls] if not skip_legacy else []) + [cls]:
+                    trace = impl()
+                    trace.internal_labels = labels
+                    measure('{0}.build_vectors_from_file{1}'.format(label, ' (former)' if impl is legacy_cls else ''), size, trace.build_vectors_from_file, fname)
+                    summary.append(dump_summary(trace))
+                    del trace
+                print('\t{0:42s}: {1} vectors'.format(label, summary[-1][0]))
+                match = match and len(set(summary)) == 1
+            if not skip_legacy:
+                print('\t{0:42s}: {1}'.format('former and current traces match', match))
+            os.remove(fname)
+    finally:
+        shutil.rmtree(workdir)
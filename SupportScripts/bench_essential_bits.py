@@ -0,0 +1,163 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of ConfigMemory.load_essential_bits and the essential bit statistics on a synthetic Ultrascale+ device:
+#       EBC/EBD files (ASCII-binary, pad frames between clock rows) are loaded by the legacy procedure
+#       (int(line, 2) per line, frame-by-frame walk, per-frame popcount) and by the bulk loader (aligned mask arrays),
+#       frame masks, essential bit counts and per-column totals are compared
+#       Launch format: DAVOS/> python SupportScripts/bench_essential_bits.py [slrs] [rows] [columns]
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import random
+import tempfile
+import shutil
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from Parsers.BitstreamParser import *
+
+PART = 'xcvu9p-bench-2L-e'
+MINORS = [76, 16, 16, 6, 16, 16, 8, 16]
+
+
+def make_farlist(rows, columns):
+    res = []
+    for block in range(2):
+        for row in range(rows):
+            for major in range(columns if block == 0 else columns / 8):
+                for minor in range(MINORS[major % len(MINORS)] if block == 0 else 128):
+                    res.append((block << 24) | (row << 18) | (major << 8) | minor)
+    return res
+
+
+def build_config_memory(CM, slr_ids, farlist):
+    """Configuration memory of the given layout (empty frames), as after load_bitstream"""
+    CM.set_series(FPGASeries.USP)
+    CM.DevicePart = PART
+    for slr in slr_ids:
+        fragment = SuperLogicRegion(slr, FPGASeries.USP)
+        fragment.FarList = list(farlist)
+        fragment.allocate_frames()
+        coords = fragment.get_coords()
+        for idx in range(len(farlist)):
+            fragment.Frames[farlist[idx]] = FrameDesc(farlist[idx], FPGASeries.USP, slr, fragment.frame_view(idx), coords[idx])
+        CM.FragmentDict[slr] = fragment
+        CM.SLR_ID_LIST.append(slr)
+    CM.update_stat()
+    return CM
+
+
+def random_words(count, density):
+    res = array(WordType, [0]) * count
+    for i in range(count):
+        if random.random() < density:
+            res[i] = random.getrandbits(32) & random.getrandbits(32)
+    return res
+
+
+def write_ascii_file(fname, fragment, density):
+    FS = fragment.FrameSize
+    breaks = fragment.get_row_breaks()
+    words = random_words(FS + 25, 0.5)
+    for idx in range(fragment.stat.Type0Frames):
+        words.extend(random_words(FS, density if idx % 3 == 0 else 0.0))
+        if breaks[idx]:
+            words.extend(random_words(FS * 2, 0.5))
+    words.extend(random_words(FS * 10, 0.5))
+    with open(fname, 'w') as f:
+        f.write('Xilinx ASCII Bitstream\nCreated by Bitstream 2020.2\nDesign name: \ttop\nArchitecture:\tvirtexuplus\n')
+        f.write('Part:        \t{0:s}\nDate:        \tSat Jan  1 00:00:00 2020\nBits:        \t{1:d}\n'.format(PART, 32 * len(words)))
+        f.write('\n'.join(['{0:032b}'.format(i) for i in words]) + '\n')
+
+
+class LegacyConfigMemory(ConfigMemory):
+    """Original load_essential_bits: int(line, 2) per line, one list of words per frame (popcount per frame in update_stat)"""
+
+    def load_essential_bits(self, filename, file_type, slr_id):
+        fragment = self.FragmentDict[slr_id]
+        header_parsed = False
+        words = []
+        with open(filename, 'r') as f:
+            for line in f:
+                if not header_parsed:
+                    buf = re.findall("Part:\s*?([0-9a-zA-Z\\-]+)", line)
+                    if len(buf) > 0:
+                        self.DevicePart = buf[0]
+                        continue
+                    buf = re.findall("Bits:\s*?([0-9]+)", line)
+                    if len(buf) > 0:
+                        header_parsed = True
+                        continue
+                else:
+                    words.append(int(line, 2))
+        w = self.FrameSize+25
+        for frame_id in range(fragment.stat.Type0Frames):
+            frame = fragment.get_frame_by_index(frame_id)
+            if file_type == FileTypes.EBC:
+                frame.ebc_data = words[w:w+self.FrameSize]
+            elif file_type == FileTypes.EBD:
+                frame.mask = words[w:w+self.FrameSize]
+            w += self.FrameSize
+            next_frame = fragment.get_frame_by_index(frame_id+1)
+            if (frame.coord.Row != next_frame.coord.Row) or (frame.coord.Top != next_frame.coord.Top):
+                w += self.FrameSize * 2
+
+
+def load(CM, files):
+    for slr_idx in range(len(CM.SLR_ID_LIST)):
+        CM.load_essential_bits(files[slr_idx][0], FileTypes.EBC, CM.SLR_ID_LIST[slr_idx])
+        CM.load_essential_bits(files[slr_idx][1], FileTypes.EBD, CM.SLR_ID_LIST[slr_idx])
+    CM.update_stat()
+
+
+def column_heads(CM):
+    """Type-0 columns (those covered by Pblocks)"""
+    return [(slr_idx, CM.FragmentDict[slr].FarList[head]) for slr_idx, slr in enumerate(CM.SLR_ID_LIST)
+            for head, end in CM.FragmentDict[slr].get_column_bounds() if CM.FragmentDict[slr].Coords[head].BlockType == 0]
+
+
+def frame_table(CM):
+    return dict(((slr, FAR), (list(frame.mask), list(frame.ebc_data), frame.stat.EssentialBitsCount))
+                for slr in CM.SLR_ID_LIST for FAR, frame in CM.FragmentDict[slr].Frames.iteritems())
+
+
+if __name__ == "__main__":
+    slrs = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    columns = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    random.seed(1)
+    slr_ids = [0x04B31093 + (k << 28) for k in range(slrs)]
+    farlist = make_farlist(rows, columns)
+    workdir = tempfile.mkdtemp(prefix='davos_bench_')
+    try:
+        new, ref = build_config_memory(ConfigMemory(), slr_ids, farlist), build_config_memory(LegacyConfigMemory(), slr_ids, farlist)
+        files = []
+        for slr in slr_ids:
+            files.append((os.path.join(workdir, '{0:08x}.ebc'.format(slr)), os.path.join(workdir, '{0:08x}.ebd'.format(slr))))
+            write_ascii_file(files[-1][0], new.FragmentDict[slr], 0.2)
+            write_ascii_file(files[-1][1], new.FragmentDict[slr], 0.2)
+        heads = column_heads(new)
+        t0 = time.time()
+        load(ref, files)
+        ref_population = sum(frame.stat.EssentialBitsCount for slr_idx, FAR in heads for frame in ref.get_frames_of_column(slr_idx, FAR))
+        t1 = time.time()
+        load(new, files)
+        new_population = sum(new.get_essential_bits_of_column(slr_idx, FAR) for slr_idx, FAR in heads)
+        t2 = time.time()
+        match = new_population == ref_population and frame_table(new) == frame_table(ref) and all(
+            new.FragmentDict[slr].stat.EssentialBitsCount == ref.FragmentDict[slr].stat.EssentialBitsCount for slr in slr_ids)
+        words = sum(os.path.getsize(f) for pair in files for f in pair) / 33
+        print('\n{0} SLRs x {1} frames, EBC+EBD: {2} lines, {3} columns, population: {4} essential bits'.format(
+            slrs, len(farlist), words, len(heads), new_population))
+        print('legacy (per line, per frame popcount): {0:8.2f} s'.format(t1 - t0))
+        print('bulk loader (mask arrays, popcount):   {0:8.2f} s'.format(t2 - t1))
+        print('speed-up: {0:6.1f}x, masks and counts match: {1}'.format((t1 - t0) / max(t2 - t1, 1e-6), match))
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,169 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of the fault list export/restore of the FFI host on a synthetic fault list:
+#       binary fault lists (per-part and full, 13 words per SEU) written word by word (struct.pack) vs. SeuRecords (one write),
+#       Faultlist.csv built through the Table class vs. streamed, restore through Table.build_from_csv vs. in-place row split;
+#       output files and restored fault lists are compared
+#       Launch format: DAVOS/> python SupportScripts/bench_fault_list_export.py [faults] [multiplicity]
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import random
+import tempfile
+import shutil
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from FFI.FFI_Host_Base import *
+
+
+class LegacyHost(FFIHostBase):
+    """Original export_fault_list_bin/full, export_fault_list_csv and load_fault_list_csv"""
+
+    def export_fault_list_bin(self, part_size=1000):
+        specificator = '<L'
+        nparts = int(math.ceil(float(len(self.fault_list))/part_size))
+        for part_idx in range(nparts):
+            fname = os.path.join(self.generatedFilesDir, 'Faultlist_{0:d}.bin'.format(part_idx))
+            self.faultload_files.append(fname)
+            offset = 0
+            with open(fname, 'wb') as f:
+                for i in range(part_size):
+                    if part_idx*part_size+i >= len(self.fault_list):
+                        break
+                    fdesc = self.fault_list[part_idx*part_size+i]
+                    fdesc.PartIdx = part_idx
+                    for seu in fdesc.SeuItems:
+                        seu.Offset = offset
+                        offset += 1
+                        for atr in [fdesc.Id, seu.Offset, fdesc.CellType, fdesc.FaultModel, seu.CellY, seu.CellLabel,
+                                    seu.SLR, seu.FAR, seu.Word, seu.Mask, seu.Time, seu.Duration, seu.ReferenceWord]:
+                            f.write(struct.pack(specificator, atr))
+
+    def export_fault_list_full(self):
+        specificator = '<L'
+        fname = os.path.join(self.generatedFilesDir, 'Faultlist_0.bin')
+        self.faultload_files.append(fname)
+        with open(fname, 'wb') as f:
+            for atr in [0xFA01FA01, len(self.fault_list), 0x1] + [0x0] * 13:
+                f.write(struct.pack(specificator, atr))
+            offset = 0
+            for i in range(len(self.fault_list)):
+                fdesc = self.fault_list[i]
+                fdesc.PartIdx = 0
+                for seu in fdesc.SeuItems:
+                    seu.Offset = offset
+                    for atr in [fdesc.Id, seu.Offset, fdesc.CellType, fdesc.FaultModel, seu.CellY, seu.CellLabel,
+                                seu.SLR, seu.FAR, seu.Word, seu.Mask, seu.Time, seu.Duration, seu.ReferenceWord]:
+                        f.write(struct.pack(specificator, atr))
+
+    def export_fault_list_csv(self):
+        self.FdescFile = os.path.join(self.generatedFilesDir, 'Faultlist.csv')
+        FdescTable = Table('Faultlist', self.get_fdesc_labels())
+        for idx in range(len(self.fault_list)):
+            for row in self.faultdesc_format_str(idx):
+                FdescTable.add_row(row)
+        FdescTable.to_csv(';', True, self.FdescFile)
+
+    def load_fault_list_csv(self, infile):
+        Fdesctab = Table('Fdesc')
+        Fdesctab.build_from_csv(infile)
+        i, MaxRows = 0, Fdesctab.rownum()
+        while i < MaxRows:
+            fdesc = FaultDescriptor(int(Fdesctab.getByLabel('Id', i)), int(Fdesctab.getByLabel('CellType', i)),
+                                    int(Fdesctab.getByLabel('FaultModel', i)), int(Fdesctab.getByLabel('Multiplicity', i)))
+            fdesc.PartIdx = int(Fdesctab.getByLabel('PartIdx', i))
+            fdesc.FailureMode = Fdesctab.getByLabel('FailureMode', i)
+            for seu_idx in range(fdesc.Multiplicity):
+                seu = SEU_item()
+                seu.Offset = int(Fdesctab.getByLabel('Offset', i))
+                seu.DesignNode = Fdesctab.getByLabel('DesignNode', i)
+                seu.SLR = int(Fdesctab.getByLabel('SLR', i), 16)
+                seu.FAR = int(Fdesctab.getByLabel('FAR', i), 16)
+                seu.Word = int(Fdesctab.getByLabel('Word', i))
+                seu.Bit = int(Fdesctab.getByLabel('Bit', i))
+                seu.Mask = int(Fdesctab.getByLabel('Mask', i), 16)
+                seu.Time = int(Fdesctab.getByLabel('Time', i))
+                seu.Duration = int(Fdesctab.getByLabel('Duration', i))
+                fdesc.SeuItems.append(seu)
+                i += 1
+            self.fault_list.append(fdesc)
+
+
+def build_fault_list(host, faults, multiplicity):
+    random.seed(1)
+    for i in range(faults):
+        fdesc = FaultDescriptor(i, random.choice([CellTypes.EssentialBits, CellTypes.LUT, CellTypes.FF]), FaultModels.TransientSBU, multiplicity)
+        fdesc.FailureMode = random.choice(['-', 'masked', 'sdc', 'hang'])
+        for j in range(multiplicity):
+            seu = SEU_item()
+            seu.DesignNode = 'top/u{0}/cell_{1}'.format(i % 97, i)
+            seu.CellY, seu.CellLabel = random.randint(0, 300), random.randint(0, 15)
+            seu.SLR, seu.FAR = random.randint(0, 3), random.getrandbits(26)
+            seu.Word, seu.Bit = random.randint(0, 92), random.randint(0, 31)
+            seu.Mask = 0x1 << seu.Bit
+            seu.Time, seu.Duration = random.randint(0, 100000), random.randint(0, 100)
+            seu.ReferenceWord = random.getrandbits(32)
+            seu.Slice, seu.Bel = 'SLICE_X{0}Y{1}'.format(i % 150, seu.CellY), 'AFF'
+            fdesc.SeuItems.append(seu)
+        host.fault_list.append(fdesc)
+
+
+def read_files(host):
+    res = []
+    for fname in host.faultload_files:
+        with open(fname, 'rb') as f:
+            res.append(f.read())
+    return res
+
+
+def restored_table(fault_list):
+    return [(fdesc.Id, fdesc.PartIdx, fdesc.CellType, fdesc.FaultModel, fdesc.Multiplicity, fdesc.FailureMode,
+             [(seu.Offset, seu.DesignNode, seu.SLR, seu.FAR, seu.Word, seu.Bit, seu.Mask, seu.Time, seu.Duration) for seu in fdesc.SeuItems])
+            for fdesc in fault_list]
+
+
+def timed(host, method, *args):
+    host.faultload_files = []
+    t0 = time.time()
+    getattr(host, method)(*args)
+    return time.time() - t0
+
+
+if __name__ == "__main__":
+    faults = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    multiplicity = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    workdir = tempfile.mkdtemp(prefix='davos_bench_')
+    try:
+        hosts = []
+        for cls, name in [(LegacyHost, 'legacy'), (FFIHostBase, 'bulk')]:
+            host = cls(os.path.join(workdir, name), 'xcvu9p')
+            if not os.path.exists(host.generatedFilesDir):
+                os.makedirs(host.generatedFilesDir)
+            build_fault_list(host, faults, multiplicity)
+            hosts.append(host)
+        print('\n{0} faults x {1} SEUs'.format(faults, multiplicity))
+        print('{0:30s} {1:>10s} {2:>10s} {3:>10s}'.format('', 'legacy, s', 'bulk, s', 'speed-up'))
+        match = True
+        for label, method, args, output in [('binary parts (1000 faults)', 'export_fault_list_bin', (1000,), read_files),
+                                            ('binary full', 'export_fault_list_full', (), read_files),
+                                            ('csv export', 'export_fault_list_csv', (), lambda h: open(h.FdescFile, 'r').read())]:
+            t = [timed(host, method, *args) for host in hosts]
+            match = match and output(hosts[0]) == output(hosts[1])
+            print('{0:30s} {1:10.2f} {2:10.2f} {3:9.1f}x'.format(label, t[0], t[1], t[0] / max(t[1], 1e-6)))
+        csv_file = hosts[1].FdescFile
+        for host in hosts:
+            host.fault_list = []
+        t = [timed(host, 'load_fault_list_csv', csv_file) for host in hosts]
+        match = match and restored_table(hosts[0].fault_list) == restored_table(hosts[1].fault_list) and len(hosts[1].fault_list) == faults
+        print('{0:30s} {1:10.2f} {2:10.2f} {3:9.1f}x'.format('csv restore', t[0], t[1], t[0] / max(t[1], 1e-6)))
+        print('binary files, csv and restored fault lists match: {0}'.format(match))
+    finally:
+        shutil.rmtree(workdir)
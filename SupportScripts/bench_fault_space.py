@@ -0,0 +1,64 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of the fault sampling over a synthetic netlist (faultload_mode 0):
+#       materialized list of injection items (get_injection_code_all for each node) vs. indexed fault space (FaultSpace),
+#       both draw the same sample (same random seed), the selected items are compared
+#       Launch format: DAVOS/> python SupportScripts/bench_fault_space.py [nodes] [sample_size] [macrocell] [fault_model]
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import random
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from SBFI.SBFI_FaultloadGenerator import *
+
+
+def make_nodes(count, macrocell):
+    res = []
+    for i in range(count):
+        node = InjectionNode()
+        node.type, node.name = macrocell, '/testbench/dut/inst_{0}'.format(i)
+        res.append(node)
+    return res
+
+
+def sample_materialized(nodelist, faultdict, fconfig, sample_size):
+    random.seed(fconfig.rand_seed)
+    inj_code_items = []
+    for instance in nodelist:
+        inj_code_items = inj_code_items + get_injection_code_all(instance, faultdict, fconfig, 1.0, None)
+    return [inj_code_items[i] for i in random.sample(range(len(inj_code_items)), sample_size)]
+
+
+def sample_indexed(nodelist, faultdict, fconfig, sample_size):
+    random.seed(fconfig.rand_seed)
+    inj_space = FaultSpace(nodelist, faultdict, fconfig)
+    return [inj_space.get(i) for i in random.sample(xrange(len(inj_space)), sample_size)]
+
+
+if __name__ == "__main__":
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sample_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    macrocell = sys.argv[3].lower() if len(sys.argv) > 3 else 'ramb18e1'
+    fconfig = FaultModelConfig(None)
+    fconfig.model = sys.argv[4] if len(sys.argv) > 4 else 'BitFlip'
+    fconfig.CCF, fconfig.rand_seed = [], 1
+    faultdict = FaultDict(os.path.join(DAVOSPATH, 'FaultDictionaries', 'Xilinx_Unisim_Ver.xml'))
+    nodelist = make_nodes(nodes, macrocell)
+    t0 = time.time()
+    indexed = sample_indexed(nodelist, faultdict, fconfig, sample_size)
+    t1 = time.time()
+    materialized = sample_materialized(nodelist, faultdict, fconfig, sample_size)
+    t2 = time.time()
+    print('{0} nodes ({1}), fault model {2}, sample size {3}'.format(nodes, macrocell, fconfig.model, sample_size))
+    print('materialized items: {0:8.2f} s'.format(t2 - t1))
+    print('fault space index:  {0:8.2f} s'.format(t1 - t0))
+    print('speed-up: {0:6.1f}x, same sample: {1}'.format((t2 - t1) / max(t1 - t0, 1e-6), indexed == materialized))
@@ -0,0 +1,93 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of the fault target discovery (SBFI_Initializer): parsing of the 'find instances' log
+#       and removal of duplicate nodes by linear search over all_nodes vs. hashed node registry (ConfigInitNodes.add_node)
+#       The synthetic netlist log contains the given share of repeated instances (overlapping injection scopes)
+#       Launch format: DAVOS/> python SupportScripts/bench_init_nodes.py [sizes] [duplicate_share]
+#       Example: python SupportScripts/bench_init_nodes.py 2000,4000,8000,16000 0.2
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import re
+import time
+import random
+import tempfile
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from Davos_Generic import *
+
+PRIMITIVES = ['fdre', 'fdce', 'fdse', 'lut4', 'lut6', 'srl16e', 'ramb36e1', 'dsp48e1']
+
+
+def generate_log(fname, size, duplicate_share):
+    random.seed(size)
+    unique = max(1, int(size * (1.0 - duplicate_share)))
+    items = ['/tb/dut/u{0}/sub{1}/inst_{2} ({3})'.format(i % 17, i % 5, i, PRIMITIVES[i % len(PRIMITIVES)].upper()) for i in range(unique)]
+    items += [random.choice(items) for i in range(size - unique)]
+    random.shuffle(items)
+    with open(fname, 'w') as f:
+        f.write('# find instances -recursive /tb/dut/*\n')
+        f.write('\n'.join(items) + '\n')
+
+
+def linear_search(fname, prim_list):
+    """Reference: line parsing and duplicate search as in the original InitializeHDLModels"""
+    cdata = ConfigInitNodes('bench')
+    with open(fname, 'r') as f:
+        for s in f.readlines():
+            x = DesignNode()
+            wt = re.findall('(.*)\s\((.*?)\)$', s)
+            if len(wt) > 0:
+                x.type = wt[0][-1].lower()
+                x.name = wt[0][0]
+            else:
+                continue
+            full_path = x.name.split('/')
+            x.name = full_path[-1]
+            x.unit_path = '/'.join(full_path[:-1])
+            if not x.unit_path.endswith('/'):  x.unit_path += '/'
+            if x.type in prim_list:
+                found = None
+                for c in cdata.all_nodes:
+                    if (c.type == x.type and c.name == x.name and c.unit_path == x.unit_path):
+                        found = c
+                        break
+                if found is None:
+                    cdata.all_nodes.append(x)
+    return cdata
+
+
+def registry(fname, prim_list):
+    cdata = ConfigInitNodes('bench')
+    for x in parse_instance_log(fname, 'netlist'):
+        if x.type in prim_list:
+            cdata.add_node(x)
+    return cdata
+
+
+if __name__ == "__main__":
+    sizes = [int(i) for i in sys.argv[1].split(',')] if len(sys.argv) > 1 else [2000, 4000, 8000, 16000]
+    duplicate_share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    prim_list = PRIMITIVES
+    fname = os.path.join(tempfile.mkdtemp(prefix='davos_bench_'), 'inj_instances_log.txt')
+    print('{0:>10s} {1:>10s} {2:>14s} {3:>14s} {4:>10s}'.format('lines', 'nodes', 'linear, s', 'registry, s', 'speed-up'))
+    for size in sizes:
+        generate_log(fname, size, duplicate_share)
+        t0 = time.time()
+        ref = linear_search(fname, prim_list)
+        t1 = time.time()
+        res = registry(fname, prim_list)
+        t2 = time.time()
+        if [(c.type, c.name, c.unit_path) for c in ref.all_nodes] != [(c.type, c.name, c.unit_path) for c in res.all_nodes]:
+            print('Error: node lists do not match at size {0}'.format(size))
+            sys.exit(1)
+        print('{0:10d} {1:10d} {2:14.3f} {3:14.3f} {4:9.1f}x'.format(size, len(res.all_nodes), t1 - t0, t2 - t1, (t1 - t0) / max(t2 - t1, 1e-6)))
+    os.remove(fname)
+    os.rmdir(os.path.dirname(fname))
@@ -0,0 +1,110 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of the essential bit sampling (sample_SEU, TYPE0 cells) on a synthetic Ultrascale+ device with sparse masks:
+#       legacy rejection sampling (random frame, word, bit until the bit is essential) vs. EssentialBitSampler
+#       (index of essential bit positions), checks that every sampled bit is essential, that samples without replacement
+#       are unique, that stratified samples follow the strata sizes, and that samples are reproducible for a given seed
+#       The legacy loop is timed on a subset of samples (legacy_samples) and extrapolated
+#       Launch format: DAVOS/> python SupportScripts/bench_seu_sampler.py [samples] [rows] [columns] [density] [legacy_samples]
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import random
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from FFI.FFI_Host_Base import *
+from bench_essential_bits import make_farlist, build_config_memory, random_words, MINORS
+
+COLUMN_TYPES = ['CLB', 'CLB', 'BRAM', 'DSP', 'CLB', 'CLB', 'IO', 'CLB']
+
+
+def build_design(rows, columns, density):
+    CM = build_config_memory(ConfigMemory(), [0x04B31093], make_farlist(rows, columns))
+    for fragment in CM.FragmentDict.values():
+        for FAR in fragment.FarList:
+            frame = fragment.Frames[FAR]
+            frame.mask = random_words(CM.FrameSize, density) if frame.coord.BlockType == 0 else array(WordType, [0]) * CM.FrameSize
+        for row in range(rows):
+            for major in range(columns):
+                fragment.layout.ColumnDescriptors.append(ConfColumnDescriptor(
+                    fragment.SLR_ID, 0, 0, row, major, MINORS[major % len(MINORS)], COLUMN_TYPES[major % len(COLUMN_TYPES)]))
+    CM.update_stat()
+    return CM
+
+
+def legacy_sample(framelist, CM, n):
+    """Original sample_SEU loop: rejection of non-essential bits"""
+    random.seed(12345)
+    res = []
+    for i in range(n):
+        essential_bit_mask, bit = 0x0, 0
+        while (essential_bit_mask >> bit) & 0x1 == 0x0:
+            frame = random.choice(framelist)
+            word = random.randint(0, CM.FrameSize-1)
+            bit = random.randint(0, 31)
+            essential_bit_mask = frame.mask[word]
+        res.append((frame, word, bit))
+    return res
+
+
+def all_essential(bits):
+    return all((frame.mask[word] >> bit) & 0x1 for frame, word, bit in bits)
+
+
+if __name__ == "__main__":
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    columns = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    density = float(sys.argv[4]) if len(sys.argv) > 4 else 0.05
+    legacy_samples = min(samples, int(sys.argv[5]) if len(sys.argv) > 5 else 5000)
+    random.seed(1)
+    CM = build_design(rows, columns, density)
+    framelist = [frame for fragment in CM.FragmentDict.values() for frame in fragment.Frames.values()]
+    total = sum(frame.stat.EssentialBitsCount for frame in framelist)
+    print('\n{0} frames, {1} essential bits ({2:.3f}% of bits)'.format(len(framelist), total, 100.0 * total / (len(framelist) * CM.FrameSize * 32)))
+
+    t0 = time.time()
+    ref = legacy_sample(framelist, CM, legacy_samples)
+    legacy_time = (time.time() - t0) * samples / legacy_samples
+    t1 = time.time()
+    sampler = EssentialBitSampler(framelist, CM)
+    t2 = time.time()
+    res = sampler.sample(samples, True, SamplingStrata.Nostrata, 1)
+    t3 = time.time()
+    print('legacy rejection sampling:       {0:8.2f} s ({1} samples timed)'.format(legacy_time, legacy_samples))
+    print('sampler index build:             {0:8.2f} s'.format(t2 - t1))
+    print('sampler, with replacement:       {0:8.2f} s'.format(t3 - t2))
+    print('speed-up: {0:6.1f}x (including index build)'.format(legacy_time / max(t3 - t1, 1e-6)))
+    ok = sampler.population_size == total and len(res) == samples and all_essential(res) and all_essential(ref)
+
+    t0 = time.time()
+    unique = sampler.sample(min(samples, total), False, SamplingStrata.Nostrata, 2)
+    t1 = time.time()
+    print('sampler, without replacement:    {0:8.2f} s'.format(t1 - t0))
+    ok = ok and len(set((frame.FAR, word, bit) for frame, word, bit in unique)) == len(unique) == min(samples, total)
+
+    for stratify in (SamplingStrata.Column, SamplingStrata.FrameType, SamplingStrata.ColumnType):
+        t0 = time.time()
+        strat = sampler.sample(samples, True, stratify, 3)
+        t1 = time.time()
+        print('sampler, stratified by {0:11s}{1:7.2f} s'.format({SamplingStrata.Column: 'column:', SamplingStrata.FrameType: 'frametype:',
+                                                                   SamplingStrata.ColumnType: 'columntype:'}[stratify], t1 - t0))
+        sizes, counts = {}, {}
+        for frame in framelist:
+            key = sampler.get_stratum(frame, stratify)
+            sizes[key] = sizes.get(key, 0) + frame.stat.EssentialBitsCount
+        for frame, word, bit in strat:
+            key = sampler.get_stratum(frame, stratify)
+            counts[key] = counts.get(key, 0) + 1
+        ok = ok and all_essential(strat) and all(abs(counts.get(key, 0) - 1.0 * samples * sizes[key] / total) < 1.0 for key in sizes)
+
+    ok = ok and sampler.sample(1000, False, SamplingStrata.ColumnType, 7) == sampler.sample(1000, False, SamplingStrata.ColumnType, 7)
+    print('all bits essential, unique without replacement, strata proportional, reproducible: {0}'.format(ok))
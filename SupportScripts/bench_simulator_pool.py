@@ -0,0 +1,77 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of the Multicore SBFI injector (ColdRestore): one simulator process per fault script
+#       vs. persistent simulator pool (simulator_pool = on), both driven by the simulator stand-in (vsim_standin.py)
+#       Synthetic fault scripts are spread over several checkpoints, completeness of the dumps is checked
+#       Launch format: DAVOS/> python SupportScripts/bench_simulator_pool.py [scripts] [checkpoints] [maxproc] [startup_time] [crash_probability]
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import tempfile
+import shutil
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from SBFI.SBFI_Injector import *
+
+
+def generate_scripts(workdir, toolconf, scripts, checkpoints):
+    for d in [toolconf.script_dir, toolconf.checkpoint_dir, toolconf.result_dir, toolconf.log_dir, toolconf.dataset_dir, toolconf.code_dir]:
+        os.makedirs(os.path.join(workdir, d))
+    robust_file_write(os.path.join(workdir, toolconf.list_init_file), 'add list -hex /top/*\n')
+    for i in range(scripts):
+        cp = (i % checkpoints) * 1000
+        robust_file_write(os.path.join(workdir, toolconf.checkpoint_dir, 'checkpoint_{0}.sim'.format(cp)), 'checkpoint {0}ns\n'.format(cp))
+        script = "catch {{ set WLFFilename {0}/WLFSET_{1:06d}.wlf }}\nset WLFFileLock 0\nset WLFDeleteOnQuit 1".format(toolconf.dataset_dir, i)
+        script += "\ntranscript file {0}/log_{1:06d}_nodename.txt".format(toolconf.log_dir, i)
+        script += "\nset ExecTime 5000ns"
+        script += "\n\twhen \"\\$now >= 100ns\" {{\n\t\tputs \"Time: $::now: Injection of BitFlip\"\n\tforce -freeze /top/q 1 -cancel 1ns\n\t}}\n"
+        script += "\n\ndo {0}".format(toolconf.list_init_file)
+        script += "\nrun $ExecTime; config list -strobeperiod 1ns -strobestart [expr $now/1000] -usestrobe 1; run 1ns;"
+        script += "\nwrite list -events {0}/dump_{1:06d}_nodename.lst".format(toolconf.result_dir, i)
+        script += "\nquit\n"
+        robust_file_write(os.path.join(workdir, toolconf.script_dir, 'fault_{0:06d}__checkpoint_{1}.do'.format(i, cp)), script)
+
+
+def run(scripts, checkpoints, maxproc, pooled):
+    workdir = tempfile.mkdtemp(prefix='davos_bench_')
+    try:
+        config = DavosConfiguration(None)
+        config.maxproc = maxproc
+        config.SBFI = SBFIConfiguration(None)
+        config.SBFI.simulator_pool = pooled
+        config.SBFI.sim_timeout = 30
+        toolconf = ToolOptions(None)
+        toolconf.simulator = '{0} {1}'.format(sys.executable, os.path.join(DAVOSPATH, 'SupportScripts', 'vsim_standin.py'))
+        conf = ParConfig(None)
+        conf.work_dir, conf.label, conf.workload_time = workdir, 'bench', checkpoints * 1000
+        generate_scripts(workdir, toolconf, scripts, checkpoints)
+        t0 = time.time()
+        execute_injection_scripts_Multicore(config, toolconf, conf)
+        t1 = time.time()
+        dumps = len([f for f in os.listdir(os.path.join(workdir, toolconf.result_dir)) if f.startswith('dump_')])
+        return t1 - t0, dumps
+    finally:
+        os.chdir(DAVOSPATH)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    scripts = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    checkpoints = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    maxproc = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    os.environ['DAVOS_STANDIN_STARTUP'] = sys.argv[4] if len(sys.argv) > 4 else '1.0'
+    os.environ['DAVOS_STANDIN_CRASH'] = sys.argv[5] if len(sys.argv) > 5 else '0.0'
+    t_cold, d_cold = run(scripts, checkpoints, maxproc, False)
+    t_pool, d_pool = run(scripts, checkpoints, maxproc, True)
+    print('\n{0} scripts, {1} checkpoints, {2} processes, startup {3} s'.format(scripts, checkpoints, maxproc, os.environ['DAVOS_STANDIN_STARTUP']))
+    print('process per script: {0:8.2f} s, dumps {1}/{2}'.format(t_cold, d_cold, scripts))
+    print('simulator pool:     {0:8.2f} s, dumps {1}/{2}'.format(t_pool, d_pool, scripts))
+    print('speed-up: {0:6.1f}x'.format(t_cold / max(t_pool, 1e-6)))
@@ -0,0 +1,120 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Benchmark of the SBFI trace comparison: legacy per-vector functions (check_outputs, check_tmr,
+#       count_latent_errors on simDump) vs. TraceComparator on columnar traces (simTrace)
+#       Traces are synthetic ModelSim lists, results of both implementations are cross-checked
+#       Launch format: DAVOS/> python SupportScripts/bench_trace_compare.py [time_steps] [internals] [outputs_per_domain] [traces]
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import time
+import random
+import tempfile
+import shutil
+DAVOSPATH = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+sys.path.insert(1, DAVOSPATH)
+from SBFI.SBFI_Analyzer import *
+
+HEX_VALUES = ['0', '1', '3', 'a3', 'ff', '1c']
+
+
+def write_list(fname, rows):
+    with open(fname, 'w') as f:
+        f.write('     ns  delta  signals\n')
+        for t, values in rows:
+            f.write('{0:10d} {1:5d} {2}\n'.format(t, 0, ' '.join(values)))
+
+
+def generate_traces(workdir, steps, internals, outputs_per_domain, traces, change_rate=0.02):
+    random.seed(1)
+    ncols = internals + 3 * outputs_per_domain
+    values = [random.choice(HEX_VALUES) for i in range(ncols)]
+    reference = []
+    for t in range(steps):
+        values = [random.choice(HEX_VALUES) if random.random() < change_rate else v for v in values]
+        reference.append((t * 10, values))
+    write_list(os.path.join(workdir, 'reference.lst'), reference)
+    flist = []
+    for k in range(traces):
+        inj_step = random.randint(0, steps - 1)
+        corrupted = random.sample(range(ncols), random.randint(0, 4))
+        rows = [(t, [('ff' if (i in corrupted and s >= inj_step) else v) for i, v in enumerate(values)])
+                for s, (t, values) in enumerate(reference)]
+        fname = os.path.join(workdir, 'dump_{0:06d}.lst'.format(k))
+        write_list(fname, rows)
+        flist.append(fname)
+    return flist
+
+
+def set_labels(trace, internals, outputs_per_domain):
+    trace.internal_labels = ['{{int{0}}}'.format(i) for i in range(internals)]
+    trace.output_labels, trace.output_domain = [], []
+    for d in ['D0', 'D1', 'D2']:
+        for i in range(outputs_per_domain):
+            trace.output_labels.append('{{{0}_out{1}}}'.format(d, i))
+            trace.output_domain.append(d)
+    trace.domain_indices = {}
+    for i, d in enumerate(trace.output_domain):
+        trace.domain_indices.setdefault(d, []).append(i)
+
+
+def run_legacy(reffile, flist, internals, outputs_per_domain, mode):
+    ref = simDump()
+    set_labels(ref, internals, outputs_per_domain)
+    ref.build_vectors_from_file(reffile)
+    tw = (ref.vectors[0].time, ref.vectors[-1].time)
+    res = []
+    for fname in flist:
+        inj = simDump()
+        set_labels(inj, internals, outputs_per_domain)
+        inj.build_vectors_from_file(fname)
+        out = check_outputs(ref, inj, tw, mode, 0)
+        tmr = check_tmr(ref, inj, tw, mode, 0)
+        res.append((dict((k, tuple(v)) for k, v in out.items()), tmr, count_latent_errors(ref, inj, tw)))
+    return res
+
+
+def run_comparator(reffile, flist, internals, outputs_per_domain, mode):
+    ref = simTrace()
+    set_labels(ref, internals, outputs_per_domain)
+    ref.build_vectors_from_file(reffile)
+    comparator = TraceComparator(ref, (ref.times[0], ref.times[-1]))
+    res = []
+    for fname in flist:
+        inj = simTrace(values=ref.values)
+        set_labels(inj, internals, outputs_per_domain)
+        inj.build_vectors_from_file(fname)
+        alignment = comparator.align(inj)
+        out = comparator.check_outputs(alignment, mode)
+        tmr = comparator.check_tmr(alignment)
+        res.append((dict((k, tuple(v)) for k, v in out.items()), tmr, comparator.count_latent_errors(alignment)))
+    return res
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    internals = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    outputs_per_domain = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    traces = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+    workdir = tempfile.mkdtemp(prefix='davos_bench_')
+    try:
+        flist = generate_traces(workdir, steps, internals, outputs_per_domain, traces)
+        reffile = os.path.join(workdir, 'reference.lst')
+        print('Synthetic traces: {0} x {1} time steps, {2} internals, 3x{3} outputs'.format(traces, steps, internals, outputs_per_domain))
+        for mode, label in [(TraceCheckModes.MAV, 'MAV'), (TraceCheckModes.MLV, 'MLV')]:
+            t0 = time.time()
+            legacy = run_legacy(reffile, flist, internals, outputs_per_domain, mode)
+            t1 = time.time()
+            columnar = run_comparator(reffile, flist, internals, outputs_per_domain, mode)
+            t2 = time.time()
+            print('{0}: legacy {1:8.3f} s, comparator {2:8.3f} s, speed-up {3:6.1f}x, results match: {4}'.format(
+                label, t1 - t0, t2 - t1, (t1 - t0) / max(t2 - t1, 1e-6), legacy == columnar))
+    finally:
+        shutil.rmtree(workdir)
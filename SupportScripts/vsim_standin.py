@@ -0,0 +1,111 @@
+# Copyright (c) 2018 by Universitat Politecnica de Valencia.
+# This file is a part of the DAVOS toolkit
+# and is released under the "MIT license agreement".
+# Please check the LICENSE.txt file (that is included as a part of this package) for the license details.
+# ------------------------------------------------------------------------------------------------------
+# Description:
+#       Stand-in for the simulator command (vsim -c) to test the SBFI injector without ModelSim:
+#       interprets the subset of commands used by the fault scripts (restore, do, davos_do_bundle, run, write list, puts, quit),
+#       run costs time, write list stores a fake dump
+#       Usage: set simulator = "python /path/to/DAVOS/SupportScripts/vsim_standin.py" in tool_config.xml
+#       Environment variables:
+#           DAVOS_STANDIN_STARTUP - startup (design load) time [s], default 1.0
+#           DAVOS_STANDIN_RESTORE - restore time [s], default 0.05
+#           DAVOS_STANDIN_RUN     - time of each run command [s], default 0.05
+#           DAVOS_STANDIN_CRASH   - probability to crash at run command, default 0.0
+#           DAVOS_STANDIN_HANG    - probability to hang at run command, default 0.0
+#           DAVOS_STANDIN_DUMP    - file copied as the dump (write list), default: minimal list
+#
+# Author: DAVOS contributors
+# ------------------------------------------------------------------------------------------------------
+
+import sys
+import os
+import re
+import time
+import random
+import shutil
+
+STARTUP = float(os.environ.get('DAVOS_STANDIN_STARTUP', '1.0'))
+RESTORE = float(os.environ.get('DAVOS_STANDIN_RESTORE', '0.05'))
+RUN = float(os.environ.get('DAVOS_STANDIN_RUN', '0.05'))
+CRASH = float(os.environ.get('DAVOS_STANDIN_CRASH', '0.0'))
+HANG = float(os.environ.get('DAVOS_STANDIN_HANG', '0.0'))
+DUMP = os.environ.get('DAVOS_STANDIN_DUMP', '')
+
+
+def say(msg):
+    sys.stdout.write('# {0}\n'.format(msg))
+    sys.stdout.flush()
+
+
+def write_dump(fname):
+    if DUMP != '':
+        shutil.copy(DUMP, fname)
+    else:
+        with open(fname, 'w') as f:
+            f.write('     ns  delta  signals\n         0     0 0 0\n')
+
+
+def execute_script(content):
+    for l in content.split('\n'):
+        for c in l.split(';'):
+            if not execute(c):
+                return False
+    return True
+
+
+def execute(line):
+    """Executes one command, returns False on quit"""
+    line = line.strip()
+    if line == '' or line.startswith('#'):
+        return True
+    words = line.split()
+    cmd = words[0]
+    if cmd == 'quit':
+        return False
+    elif cmd == 'restore':
+        time.sleep(RESTORE)
+    elif cmd == 'do' and len(words) > 1:
+        with open(words[1], 'r') as f:
+            return execute_script(f.read())
+    elif cmd == 'davos_do_bundle' and len(words) > 3:
+        with open(words[1], 'rb') as f:
+            f.seek(int(words[2]))
+            return execute_script(f.read(int(words[3])))
+    elif cmd == 'run':
+        if random.random() < CRASH:
+            say('** Fatal: (vsim-standin) simulated crash')
+            os._exit(1)
+        if random.random() < HANG:
+            while True:
+                time.sleep(1)
+        time.sleep(RUN)
+    elif cmd == 'write' and len(words) > 1 and words[1] == 'list':
+        write_dump(words[-1])
+    elif cmd == 'puts':
+        match = re.match('puts\s+"(.*)"', line)
+        msg = match.group(1) if match else ' '.join(words[1:])
+        msg = re.sub('\[string toupper ([^\]]+)\]', lambda m: m.group(1).upper(), msg)
+        sys.stdout.write(msg + '\n')
+        sys.stdout.flush()
+    return True
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    docmd = args[args.index('-do') + 1] if '-do' in args else None
+    random.seed(os.getpid() + int(time.time() * 1000))
+    time.sleep(STARTUP)
+    say('vsim stand-in loaded: {0}'.format(' '.join(args)))
+    if docmd is not None:
+        for c in docmd.split(';'):
+            if not execute(c):
+                sys.exit(0)
+    while True:
+        line = sys.stdin.readline()
+        if line == '':
+            break
+        say(line.rstrip())
+        if not execute(line):
+            break
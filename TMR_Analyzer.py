@@ -61,13 +61,22 @@ if __name__ == "__main__":
             zp.extractall(conf.work_dir)
 
         print('Processing simulation traces: {0}'.format(conf.label))
-        datamodel.reference.reference_dump = simDump()
-        datamodel.reference.reference_dump.build_labels_from_file(os.path.normpath(os.path.join(conf.work_dir, toolconf.list_init_file)), config.SBFI.analyzer.rename_list)
-        datamodel.reference.reference_dump.normalize_array_labels(os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file)))
-        datamodel.reference.reference_dump.build_vectors_from_file(os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file)))
-        datamodel.reference.initial_internal_labels, datamodel.reference.initial_output_labels = datamodel.reference.reference_dump.get_labels_copy()
+        list_init_file = os.path.normpath(os.path.join(conf.work_dir, toolconf.list_init_file))
+        reference_file = os.path.normpath(os.path.join(conf.work_dir, toolconf.result_dir, toolconf.reference_file))
+        cache = ReferenceTraceCache(os.path.join(conf.work_dir, ReferenceTraceCache.CacheDir), 'simDump', [list_init_file, reference_file],
+                                    ReferenceTraceCache.analyzer_items(config.SBFI.analyzer))
+        reference = cache.load()
+        if reference is None:
+            reference_dump = simDump()
+            reference_dump.build_labels_from_file(list_init_file, config.SBFI.analyzer.rename_list)
+            reference_dump.normalize_array_labels(reference_file)
+            reference_dump.build_vectors_from_file(reference_file)
+            internal_labels, output_labels = reference_dump.get_labels_copy()
+            reference_dump.join_output_columns(config.SBFI.analyzer.join_group_list.copy())
+            reference = (reference_dump, internal_labels, output_labels)
+            cache.store(reference)
+        datamodel.reference.reference_dump, datamodel.reference.initial_internal_labels, datamodel.reference.initial_output_labels = reference
         datamodel.reference.JnGrLst = config.SBFI.analyzer.join_group_list.copy()
-        datamodel.reference.reference_dump.join_output_columns(datamodel.reference.JnGrLst.copy())
 
         tw = config.SBFI.analyzer.time_window if config.SBFI.analyzer.time_window is not None else (datamodel.reference.reference_dump.vectors[0].time, datamodel.reference.reference_dump.vectors[-1].time)
 
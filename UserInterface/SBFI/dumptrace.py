@@ -11,6 +11,7 @@ import cgi
 import cgitb
 import subprocess
 import zipfile as ZF
+from io import BytesIO
 
 
 FilterDumpVectorsByDelta = True
@@ -300,7 +301,7 @@ class simDump:
     #input - simInitModel.do
     #result - self.internal_labels, self.output_labels
     def build_labels_from_file(self, fname="", rename_list=None):
-        initfile = open(fname,'r')
+        initfile = open(fname,'r') if isinstance(fname, str) else fname
         fcontent = initfile.read()
         initfile.close()
         internals_content = find_between(fcontent, "#<INTERNALS>","#</INTERNALS>")
@@ -333,9 +334,9 @@ class simDump:
         
     
     def normalize_array_labels(self, dumpfilename):
-        if not os.path.exists(dumpfilename):
+        if isinstance(dumpfilename, str) and not os.path.exists(dumpfilename):
             return(None)
-        with open(dumpfilename, 'r') as dumpfile:
+        with (open(dumpfilename, 'r') if isinstance(dumpfilename, str) else dumpfilename) as dumpfile:
             lines = dumpfile.readlines()
         for l in lines:
             if re.match('^\s*?[0-9]+', l):
@@ -373,10 +374,10 @@ class simDump:
     #input - dump file *.lst
     #result - self.vectors
     def build_vectors_from_file(self, fname):
-        if not os.path.exists(fname):
+        if isinstance(fname, str) and not os.path.exists(fname):
             return(None)
-        self.caption = fname
-        with open(fname, 'r') as dumpfile:
+        self.caption = str(fname)
+        with (open(fname, 'r') if isinstance(fname, str) else fname) as dumpfile:
             lines = dumpfile.readlines()
         for l in lines:
             if re.match('^\s*?[0-9]+', l.replace('{','').replace('}','')):
@@ -709,21 +710,36 @@ work_dir = os.path.join(call_dir, form.getvalue('config'))
 dump_fname = os.path.join(work_dir, toolconf.result_dir, form.getvalue('dump'))
 ref_fname = os.path.join(work_dir, toolconf.result_dir, toolconf.reference_file)
 dumppack = "RESPACK_{0}.zip".format(form.getvalue('config')) #glob.glob('*{0}.zip'.format(form.getvalue('config')))[0]
-
-#extract dumps from zip
-if not os.path.exists(work_dir):
-    os.mkdir(work_dir)
-s = os.path.join(work_dir, toolconf.result_dir)
-if not os.path.exists(s):
-    os.mkdir(s)
-z = os.getcwd()
-
-with ZF.ZipFile(dumppack, 'r') as zp:
-    zp.extract(os.path.join(toolconf.result_dir.replace('./',''), form.getvalue('dump')).replace('\\', '/'),   work_dir)
-    zp.extract(os.path.join(toolconf.result_dir.replace('./',''), toolconf.reference_file).replace('\\', '/'), work_dir)
-    zp.extract(toolconf.list_init_file.replace('./','').replace('\\', '/'), work_dir)
-
-os.chdir(z)
+tracepack = "RESPACK_{0}.trp".format(form.getvalue('config'))
+init_fname = os.path.join(work_dir, toolconf.list_init_file)
+packed = dict()
+
+def trace_input(fname):
+    #content read from the binary trace pack, or file extracted from zip
+    return BytesIO(packed[fname]) if fname in packed else fname
+
+if os.path.exists(tracepack):
+    #binary trace pack: dump (by experiment ID), reference and list init file are read in memory, nothing is extracted
+    from ResultPack import TracePack
+    with TracePack(tracepack) as tp:
+        packed[dump_fname] = tp.read_trace(int(os.path.splitext(form.getvalue('dump'))[0]))
+        packed[ref_fname] = tp.read(tp.reference_name)
+        packed[init_fname] = tp.read(toolconf.list_init_file.replace('./','').replace('\\', '/'))
+else:
+    #extract dumps from zip
+    if not os.path.exists(work_dir):
+        os.mkdir(work_dir)
+    s = os.path.join(work_dir, toolconf.result_dir)
+    if not os.path.exists(s):
+        os.mkdir(s)
+    z = os.getcwd()
+
+    with ZF.ZipFile(dumppack, 'r') as zp:
+        zp.extract(os.path.join(toolconf.result_dir.replace('./',''), form.getvalue('dump')).replace('\\', '/'),   work_dir)
+        zp.extract(os.path.join(toolconf.result_dir.replace('./',''), toolconf.reference_file).replace('\\', '/'), work_dir)
+        zp.extract(toolconf.list_init_file.replace('./','').replace('\\', '/'), work_dir)
+
+    os.chdir(z)
 
 
 rename_list = []
@@ -736,15 +752,15 @@ join_group_list = JoinGroupList()
 join_group_list.init_from_tag(tree.findall('DAVOS')[0].findall('SBFI')[0].findall('Analyzer')[0].findall('join_groups')[0])
 
 reference_dump = simDump()
-reference_dump.build_labels_from_file(os.path.join(work_dir, toolconf.list_init_file), rename_list)
-reference_dump.normalize_array_labels(ref_fname)
-reference_dump.build_vectors_from_file(ref_fname)
+reference_dump.build_labels_from_file(trace_input(init_fname), rename_list)
+reference_dump.normalize_array_labels(trace_input(ref_fname))
+reference_dump.build_vectors_from_file(trace_input(ref_fname))
 initial_internal_labels, initial_output_labels = reference_dump.get_labels_copy()    
 reference_dump.join_output_columns(join_group_list)
 
 inj_dump = simDump()
 inj_dump.set_labels_copy(initial_internal_labels, initial_output_labels)
-inj_dump.build_vectors_from_file(dump_fname)
+inj_dump.build_vectors_from_file(trace_input(dump_fname))
 inj_dump.join_output_columns(join_group_list.copy())
 inj_dump.caption = form.getvalue('dump')
 